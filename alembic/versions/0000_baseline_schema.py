@@ -0,0 +1,109 @@
+"""baseline schema: tables created by create_all before migrations
+
+Revision ID: 0000
+Revises: 
+Create Date: 2026-10-17 15:40:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0000'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # До перехода на alembic схему создавал create_all при старте. В такой
+    # БД эти таблицы уже есть - ревизия принимает их как есть, и
+    # alembic upgrade head продолжает с 0001 без ручного alembic stamp.
+    # При генерации SQL (--sql) подключения нет - таблицы создаются всегда
+    existing = set() if context.is_offline_mode() else set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'users' not in existing:
+        op.create_table('users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('public_id', sa.String(length=36), nullable=True),
+        sa.Column('email', sa.String(length=255), nullable=False),
+        sa.Column('username', sa.String(length=100), nullable=False),
+        sa.Column('hashed_password', sa.String(length=255), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('is_verified', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('full_name', sa.String(length=200), nullable=True),
+        sa.Column('avatar_url', sa.String(length=500), nullable=True),
+        sa.Column('verification_token', sa.String(length=100), nullable=True),
+        sa.Column('verification_token_expires', sa.DateTime(), nullable=True),
+        sa.Column('reset_token', sa.String(length=100), nullable=True),
+        sa.Column('reset_token_expires', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+        op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+        op.create_index(op.f('ix_users_public_id'), 'users', ['public_id'], unique=True)
+        op.create_index(op.f('ix_users_reset_token'), 'users', ['reset_token'], unique=True)
+        op.create_index(op.f('ix_users_verification_token'), 'users', ['verification_token'], unique=True)
+
+    if 'email_verifications' not in existing:
+        op.create_table('email_verifications',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(length=255), nullable=False),
+        sa.Column('token', sa.String(length=100), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('is_used', sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_email_verifications_email'), 'email_verifications', ['email'], unique=False)
+        op.create_index(op.f('ix_email_verifications_id'), 'email_verifications', ['id'], unique=False)
+        op.create_index(op.f('ix_email_verifications_token'), 'email_verifications', ['token'], unique=True)
+
+    if 'refresh_tokens' not in existing:
+        op.create_table('refresh_tokens',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('token', sa.String(length=500), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('is_revoked', sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_refresh_tokens_id'), 'refresh_tokens', ['id'], unique=False)
+        op.create_index(op.f('ix_refresh_tokens_token'), 'refresh_tokens', ['token'], unique=True)
+
+    if 'video_files' not in existing:
+        op.create_table('video_files',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('object_name', sa.String(length=255), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_video_files_id'), 'video_files', ['id'], unique=False)
+        op.create_index(op.f('ix_video_files_object_name'), 'video_files', ['object_name'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_video_files_object_name'), table_name='video_files')
+    op.drop_index(op.f('ix_video_files_id'), table_name='video_files')
+    op.drop_table('video_files')
+    op.drop_index(op.f('ix_refresh_tokens_token'), table_name='refresh_tokens')
+    op.drop_index(op.f('ix_refresh_tokens_id'), table_name='refresh_tokens')
+    op.drop_table('refresh_tokens')
+    op.drop_index(op.f('ix_email_verifications_token'), table_name='email_verifications')
+    op.drop_index(op.f('ix_email_verifications_id'), table_name='email_verifications')
+    op.drop_index(op.f('ix_email_verifications_email'), table_name='email_verifications')
+    op.drop_table('email_verifications')
+    op.drop_index(op.f('ix_users_verification_token'), table_name='users')
+    op.drop_index(op.f('ix_users_reset_token'), table_name='users')
+    op.drop_index(op.f('ix_users_public_id'), table_name='users')
+    op.drop_index(op.f('ix_users_id'), table_name='users')
+    op.drop_index(op.f('ix_users_email'), table_name='users')
+    op.drop_table('users')
@@ -0,0 +1,106 @@
+"""email outbox, hashed refresh tokens, sweep and catalog indexes, video metadata
+
+Revision ID: 0001
+Revises: 0000
+Create Date: 2026-10-17 15:45:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = '0000'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('email_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('to_email', sa.String(length=255), nullable=False),
+    sa.Column('subject', sa.String(length=255), nullable=False),
+    sa.Column('body_html', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_email_outbox_id'), 'email_outbox', ['id'], unique=False)
+    op.create_index(op.f('ix_email_outbox_next_attempt_at'), 'email_outbox', ['next_attempt_at'], unique=False)
+    op.create_index(op.f('ix_email_outbox_status'), 'email_outbox', ['status'], unique=False)
+
+    op.create_index(op.f('ix_email_verifications_expires_at'), 'email_verifications', ['expires_at'], unique=False)
+
+    # До этой ревизии приложение не записывало refresh токены, таблица
+    # пустая - пересоздаем ее с хэшами вместо самих JWT
+    op.drop_index(op.f('ix_refresh_tokens_token'), table_name='refresh_tokens')
+    op.drop_index(op.f('ix_refresh_tokens_id'), table_name='refresh_tokens')
+    op.drop_table('refresh_tokens')
+    op.create_table('refresh_tokens',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('token_hash', sa.String(length=64), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('is_revoked', sa.Boolean(), nullable=True),
+    sa.Column('revoked_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_refresh_tokens_expires_at'), 'refresh_tokens', ['expires_at'], unique=False)
+    op.create_index(op.f('ix_refresh_tokens_id'), 'refresh_tokens', ['id'], unique=False)
+    op.create_index(op.f('ix_refresh_tokens_revoked_at'), 'refresh_tokens', ['revoked_at'], unique=False)
+    op.create_index(op.f('ix_refresh_tokens_token_hash'), 'refresh_tokens', ['token_hash'], unique=True)
+    op.create_index(op.f('ix_refresh_tokens_user_id'), 'refresh_tokens', ['user_id'], unique=False)
+
+    # Если в старой БД есть одинаковые username, их нужно развести до миграции
+    op.create_index(op.f('ix_users_username'), 'users', ['username'], unique=True)
+    op.create_index('ix_users_reset_token_expires', 'users', ['reset_token_expires'], unique=False, postgresql_where=sa.text('reset_token IS NOT NULL'), sqlite_where=sa.text('reset_token IS NOT NULL'))
+    op.create_index('ix_users_verification_token_expires', 'users', ['verification_token_expires'], unique=False, postgresql_where=sa.text('verification_token IS NOT NULL'), sqlite_where=sa.text('verification_token IS NOT NULL'))
+
+    op.add_column('video_files', sa.Column('content_type', sa.String(length=100), nullable=True))
+    op.add_column('video_files', sa.Column('size', sa.BigInteger(), nullable=True))
+    op.add_column('video_files', sa.Column('etag', sa.String(length=100), nullable=True))
+    op.create_index('ix_video_files_created_at_id', 'video_files', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_video_files_created_at_id', table_name='video_files')
+    op.drop_column('video_files', 'etag')
+    op.drop_column('video_files', 'size')
+    op.drop_column('video_files', 'content_type')
+
+    op.drop_index('ix_users_verification_token_expires', table_name='users', postgresql_where=sa.text('verification_token IS NOT NULL'), sqlite_where=sa.text('verification_token IS NOT NULL'))
+    op.drop_index('ix_users_reset_token_expires', table_name='users', postgresql_where=sa.text('reset_token IS NOT NULL'), sqlite_where=sa.text('reset_token IS NOT NULL'))
+    op.drop_index(op.f('ix_users_username'), table_name='users')
+
+    op.drop_index(op.f('ix_refresh_tokens_user_id'), table_name='refresh_tokens')
+    op.drop_index(op.f('ix_refresh_tokens_token_hash'), table_name='refresh_tokens')
+    op.drop_index(op.f('ix_refresh_tokens_revoked_at'), table_name='refresh_tokens')
+    op.drop_index(op.f('ix_refresh_tokens_id'), table_name='refresh_tokens')
+    op.drop_index(op.f('ix_refresh_tokens_expires_at'), table_name='refresh_tokens')
+    op.drop_table('refresh_tokens')
+    op.create_table('refresh_tokens',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('token', sa.String(length=500), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('is_revoked', sa.Boolean(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_refresh_tokens_id'), 'refresh_tokens', ['id'], unique=False)
+    op.create_index(op.f('ix_refresh_tokens_token'), 'refresh_tokens', ['token'], unique=True)
+
+    op.drop_index(op.f('ix_email_verifications_expires_at'), table_name='email_verifications')
+
+    op.drop_index(op.f('ix_email_outbox_status'), table_name='email_outbox')
+    op.drop_index(op.f('ix_email_outbox_next_attempt_at'), table_name='email_outbox')
+    op.drop_index(op.f('ix_email_outbox_id'), table_name='email_outbox')
+    op.drop_table('email_outbox')
@@ -0,0 +1,48 @@
+"""video probe metadata
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 16:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Существующие записи получают pending - их разбирает python -m app.probe_videos
+    op.add_column('video_files', sa.Column('probe_status', sa.String(length=16), server_default='pending', nullable=False))
+    op.add_column('video_files', sa.Column('container', sa.String(length=16), nullable=True))
+    op.add_column('video_files', sa.Column('duration', sa.Float(), nullable=True))
+    op.add_column('video_files', sa.Column('width', sa.Integer(), nullable=True))
+    op.add_column('video_files', sa.Column('height', sa.Integer(), nullable=True))
+    op.add_column('video_files', sa.Column('frame_rate', sa.Float(), nullable=True))
+    op.add_column('video_files', sa.Column('video_codec', sa.String(length=32), nullable=True))
+    op.add_column('video_files', sa.Column('audio_codec', sa.String(length=32), nullable=True))
+    op.create_index(op.f('ix_video_files_probe_status'), 'video_files', ['probe_status'], unique=False)
+    op.create_index(op.f('ix_video_files_duration'), 'video_files', ['duration'], unique=False)
+    op.create_index('ix_video_files_height_width', 'video_files', ['height', 'width'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_video_files_height_width', table_name='video_files')
+    op.drop_index(op.f('ix_video_files_duration'), table_name='video_files')
+    op.drop_index(op.f('ix_video_files_probe_status'), table_name='video_files')
+    with op.batch_alter_table('video_files') as batch_op:
+        batch_op.drop_column('audio_codec')
+        batch_op.drop_column('video_codec')
+        batch_op.drop_column('frame_rate')
+        batch_op.drop_column('height')
+        batch_op.drop_column('width')
+        batch_op.drop_column('duration')
+        batch_op.drop_column('container')
+        batch_op.drop_column('probe_status')
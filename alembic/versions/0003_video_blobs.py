@@ -0,0 +1,47 @@
+"""video blobs: content-addressed storage with reference counts
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 18:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('video_blobs',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('object_name', sa.String(length=255), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('etag', sa.String(length=100), nullable=True),
+    sa.Column('content_type', sa.String(length=100), nullable=True),
+    sa.Column('refcount', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('sha256'),
+    sa.UniqueConstraint('object_name')
+    )
+    # Старые записи остаются без хэша: у каждой свой объект, удаляется вместе с записью
+    op.add_column('video_files', sa.Column('content_sha256', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_video_files_content_sha256'), 'video_files', ['content_sha256'], unique=False)
+    # Несколько записей могут ссылаться на один объект
+    op.drop_index('ix_video_files_object_name', table_name='video_files')
+    op.create_index(op.f('ix_video_files_object_name'), 'video_files', ['object_name'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_video_files_object_name'), table_name='video_files')
+    op.create_index('ix_video_files_object_name', 'video_files', ['object_name'], unique=True)
+    op.drop_index(op.f('ix_video_files_content_sha256'), table_name='video_files')
+    with op.batch_alter_table('video_files') as batch_op:
+        batch_op.drop_column('content_sha256')
+    op.drop_table('video_blobs')
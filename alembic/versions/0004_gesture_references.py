@@ -0,0 +1,37 @@
+"""gesture references for the nearest-gesture index
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 19:40:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('gesture_references',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('video_id', sa.Integer(), nullable=False),
+    sa.Column('frames', sa.Integer(), nullable=False),
+    sa.Column('features', sa.LargeBinary(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_gesture_references_id'), 'gesture_references', ['id'], unique=False)
+    op.create_index(op.f('ix_gesture_references_video_id'), 'gesture_references', ['video_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_gesture_references_video_id'), table_name='gesture_references')
+    op.drop_index(op.f('ix_gesture_references_id'), table_name='gesture_references')
+    op.drop_table('gesture_references')
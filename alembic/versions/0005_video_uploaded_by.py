@@ -0,0 +1,29 @@
+"""video uploader for ownership checks
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 21:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # У существующих записей владельца нет: удалить их через API нельзя
+    op.add_column('video_files', sa.Column('uploaded_by', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_video_files_uploaded_by'), 'video_files', ['uploaded_by'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_video_files_uploaded_by'), table_name='video_files')
+    op.drop_column('video_files', 'uploaded_by')
@@ -1,9 +1,13 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Optional
-from jose import JWTError, jwt
+import hashlib
+import time
+import uuid
 import bcrypt  # Импортируем bcrypt напрямую
 from app.config import settings
 from app.schemas import TokenData
+from app.services.token_cache import token_cache
+from app.services.token_signing import InvalidTokenError, signer
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -60,8 +64,9 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
 
-    to_encode.update({"exp": expire, "type": "access"})
-    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
+    # iat (с миллисекундами) сравнивается с users.tokens_valid_after при отзыве сессий
+    to_encode.update({"exp": expire, "iat": round(time.time(), 3), "type": "access"})
+    encoded_jwt = signer.encode(to_encode)
     return encoded_jwt
 
 
@@ -69,31 +74,55 @@ def create_refresh_token(data: dict) -> str:
     """Создает JWT refresh токен"""
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=settings.refresh_token_expire_days)
-    to_encode.update({"exp": expire, "type": "refresh"})
-    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
+    # jti делает каждый токен уникальным, даже выпущенные в одну секунду
+    to_encode.update({"exp": expire, "type": "refresh", "jti": uuid.uuid4().hex})
+    encoded_jwt = signer.encode(to_encode)
     return encoded_jwt
 
 
 def verify_token(token: str) -> Optional[TokenData]:
-    """Проверяет валидность access токена"""
+    """
+    Проверяет валидность access токена.
+
+    Успешно проверенный токен кэшируется до своего exp, повторные
+    запросы с ним не проверяют подпись заново.
+    """
+    digest = token_cache.digest(token)
+    cached = token_cache.get(digest)
+    if cached is not None:
+        return TokenData(public_id=cached[0], issued_at=cached[1])
+
     try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+        payload = signer.decode(token)
         public_id: str = payload.get("sub")  # В sub хранится public_id (строка)
         token_type: str = payload.get("type")
 
         if public_id is None or token_type != "access":
             return None
 
+        issued_at = payload.get("iat")
+        token_cache.set(digest, payload["exp"], public_id, issued_at)
         # Возвращаем TokenData с public_id, а не user_id
-        return TokenData(public_id=public_id)
-    except JWTError:
+        return TokenData(public_id=public_id, issued_at=issued_at)
+    except InvalidTokenError:
         return None
 
 
+def is_token_revoked(token_data: TokenData, tokens_valid_after: Optional[datetime]) -> bool:
+    """
+    Access токен выдан раньше, чем пользователь отозвал сессии (logout,
+    смена пароля, деактивация). Токены без iat выданы до появления проверки
+    и отклоняются после первого же отзыва.
+    """
+    if tokens_valid_after is None:
+        return False
+    return (token_data.issued_at or 0) < tokens_valid_after.replace(tzinfo=timezone.utc).timestamp()
+
+
 def verify_refresh_token(token: str) -> Optional[TokenData]:
     """Проверяет валидность refresh токена"""
     try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+        payload = signer.decode(token)
         public_id: str = payload.get("sub")
         token_type: str = payload.get("type")
 
@@ -101,6 +130,11 @@ def verify_refresh_token(token: str) -> Optional[TokenData]:
             return None
 
         # Возвращаем TokenData с public_id, а не user_id
-        return TokenData(public_id=public_id)
-    except JWTError:
+        return TokenData(public_id=public_id, expires_at=datetime.utcfromtimestamp(payload["exp"]))
+    except InvalidTokenError:
         return None
+
+
+def hash_token(token: str) -> str:
+    """sha256 токена - в таком виде refresh токены хранятся в БД"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
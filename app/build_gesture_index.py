@@ -0,0 +1,42 @@
+"""
+Индекс похожих жестов (режим практики):
+
+    python -m app.build_gesture_index          # полная пересборка
+    python -m app.build_gesture_index --sync   # только дописать новые эталоны
+
+Полная пересборка выбрасывает из файлов удаленные и замененные эталоны и
+нужна после смены настроек gesture_index_*. Работающие воркеры сервера
+переключаются на новые файлы при следующем поиске.
+"""
+import argparse
+import asyncio
+import logging
+import sys
+
+from app.database import async_engine
+from app.services.gesture_index import gesture_index
+
+
+async def run(args) -> int:
+    try:
+        if args.sync:
+            added = await gesture_index.sync()
+            print(f"добавлено эталонов: {added}")
+        else:
+            count = await gesture_index.rebuild()
+            print(f"эталонов в индексе: {count}")
+    finally:
+        gesture_index.stop()
+        await async_engine.dispose()
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sync", action="store_true", help="без пересборки, только новые эталоны")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    sys.exit(asyncio.run(run(parse_args())))
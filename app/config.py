@@ -1,17 +1,36 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
 
 
 class Settings(BaseSettings):
     # Database
     database_url: str
     database_url_async: str
+    db_pool_size: int = 10
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800  # секунд, меньше idle таймаута сервера/прокси
+    db_pool_pre_ping: bool = True
+    db_statement_cache_size: int = 100  # prepared statements asyncpg на соединение
+    db_schema_check: bool = True  # сверять версию схемы с миграциями при старте
 
     # JWT
     secret_key: str
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
     refresh_token_expire_days: int = 7
+    refresh_token_sync_interval: float = 10.0
+    # Подпись токенов: jose | pyjwt. Для RS*/ES*/EdDSA нужны ключи в jwt_keys_dir
+    # (<kid>.pem - закрытый, <kid>.pub.pem - открытый) и jwt_signing_kid
+    jwt_backend: str = "jose"
+    jwt_keys_dir: Optional[str] = None
+    jwt_signing_kid: Optional[str] = None
+    # Очистка просроченных токенов (email_verifications, users, refresh_tokens)
+    token_sweep_interval: float = 3600.0
+    token_sweep_batch_size: int = 1000
+    # Кэш проверенных access токенов
+    token_cache_enabled: bool = True
+    token_cache_max_size: int = 50000
 
     # Email
     smtp_host: str
@@ -19,12 +38,50 @@ class Settings(BaseSettings):
     smtp_user: str
     smtp_password: str
     email_from: str
+    smtp_use_tls: bool = True
+    smtp_timeout: float = 10.0
+
+    # Фоновая отправка писем (email_outbox)
+    email_batch_size: int = 50
+    email_poll_interval: float = 5.0
+    email_max_attempts: int = 5
+    email_backoff_base: float = 30.0
+    email_backoff_max: float = 3600.0
+    # Сколько секунд взятая в отправку пачка принадлежит воркеру; после
+    # падения воркера письма снова берутся в отправку по истечении срока
+    email_claim_timeout: float = 1800.0
 
     # Frontend
     frontend_url: str = "http://localhost:5173"
+    cors_origins: List[str] = ["http://localhost:5173", "http://localhost:3000"]
 
     # App
     debug: bool = False
+    metrics_enabled: bool = True  # /metrics в формате Prometheus
+    # Каталог снимков метрик воркеров (MultiProcessMetrics); python -m app.serve
+    # с несколькими воркерами создает временный, если не задан
+    metrics_multiprocess_dir: Optional[str] = None
+    metrics_flush_interval: float = 5.0
+    # Ответы с данными из БД сериализуются напрямую (orjson), без повторной валидации по response_model
+    fast_json_responses: bool = False
+    supported_languages: List[str] = ["ru", "en"]
+    default_language: str = "ru"
+
+    # Сервер (python -m app.serve)
+    serve_host: str = "0.0.0.0"
+    serve_port: int = 8000
+    serve_workers: Optional[int] = None  # по умолчанию - по числу доступных CPU
+    serve_loop: str = "uvloop"  # uvloop | asyncio
+    serve_http: str = "httptools"  # httptools | h11
+    serve_backlog: int = 2048
+    serve_keep_alive: int = 75  # секунд, больше idle таймаута балансировщика
+    serve_limit_concurrency: Optional[int] = None
+    serve_graceful_timeout: int = 60  # ожидание текущих запросов (загрузок) при остановке
+    serve_max_requests: int = 20000  # перезапуск воркера после N запросов, 0 - никогда
+    serve_max_requests_jitter: int = 2000
+
+    # Кэш байткода шаблонов писем (None - выключен)
+    email_template_cache_dir: Optional[str] = None
 
     # MinIO
     minio_endpoint: str
@@ -32,6 +89,99 @@ class Settings(BaseSettings):
     minio_secret_key: str
     minio_bucket: str = "videos"
     minio_secure: bool = False
+    minio_pool_size: int = 32  # не меньше minio_workers + video_upload_threads
+    minio_connect_timeout: float = 5.0
+    minio_read_timeout: float = 60.0
+    minio_retries: int = 3
+    minio_workers: int = 16
+    minio_startup_timeout: float = 5.0
+
+    # Загрузка видео (multipart upload в MinIO)
+    video_upload_part_size: int = 16 * 1024 * 1024  # не меньше 5 МБ - ограничение S3
+    video_upload_concurrency: int = 4  # частей одной загрузки в полете
+    video_upload_max_memory: int = 96 * 1024 * 1024  # память на одну загрузку
+    video_upload_threads: int = 16  # пул потоков отправки частей (общий для загрузок)
+    video_max_size: int = 2 * 1024 * 1024 * 1024
+
+    # Выдача видео
+    video_stream_chunk_size: int = 256 * 1024
+    video_presigned_url_ttl: int = 3600
+    video_presigned_url_refresh_margin: int = 300
+
+    # Разбор заголовков MP4/WebM после загрузки (длительность, разрешение, кодеки)
+    video_probe_enabled: bool = True
+    video_probe_workers: int = 2  # процессов разбора
+    video_probe_concurrency: int = 8  # видео в работе одновременно (чтение диапазонов из MinIO)
+    video_probe_head_size: int = 512 * 1024
+    video_probe_tail_size: int = 512 * 1024
+
+    # Распознавание жестов (/recognize): микробатчи на пуле процессов
+    recognition_enabled: bool = True
+    recognition_model: str = "app.services.recognition_model:DummyModel"  # модуль:класс
+    recognition_model_path: Optional[str] = None  # файл весов, передается модели
+    recognition_workers: int = 2  # процессов с загруженной моделью
+    recognition_max_batch_size: int = 32
+    recognition_max_wait_ms: float = 5.0  # сколько первая последовательность ждет попутчиков
+    recognition_max_queue: int = 1024
+    recognition_sequence_length: int = 32  # кадров после ресемплинга
+    recognition_points: int = 21  # точек кисти на кадр (MediaPipe Hands)
+    recognition_coords: int = 3
+    recognition_max_frames: int = 512
+    recognition_max_sequences: int = 64  # последовательностей в одном запросе
+    recognition_top_k: int = 5
+
+    # Поток распознавания по WebSocket (/recognize/stream)
+    recognition_stream_window: int = 32  # кадров в скользящем окне
+    recognition_stream_stride: int = 8  # новых кадров между распознаваниями
+    recognition_stream_min_frames: int = 16  # раньше окно не распознается
+    recognition_stream_max_message_frames: int = 64
+    recognition_stream_idle_timeout: float = 30.0  # секунд без кадров до закрытия
+    recognition_stream_max_connections: int = 1000  # на воркер
+
+    # Поиск похожих эталонных жестов (режим практики): индекс в memory-mapped файлах
+    gesture_index_enabled: bool = True
+    gesture_index_dir: str = "gesture_index"  # общий для всех воркеров
+    gesture_index_sequence_length: int = 32  # кадров эталона после ресемплинга (для DTW)
+    gesture_index_shortlist: int = 100  # лучших по косинусу, которые пересчитываются DTW
+    gesture_index_dtw_band: int = 4  # ширина полосы DTW, кадров
+    gesture_index_chunk_rows: int = 16384  # строк эмбеддингов на одно матричное умножение
+    gesture_index_threads: int = 2
+    gesture_index_sync_batch_size: int = 1000
+    gesture_index_sync_overlap: int = 1000  # id ниже last_id, которые sync просматривает повторно
+    gesture_search_max_k: int = 50
+
+    # Хэширование паролей (bcrypt)
+    hashing_workers: int = 4
+    hashing_max_concurrency: int = 4
+    hashing_max_queue: int = 64
+    hashing_use_processes: bool = False
+
+    # Кэш пользователей для get_current_user (memory | redis)
+    user_cache_enabled: bool = True
+    user_cache_backend: str = "memory"
+    user_cache_redis_url: Optional[str] = None
+    user_cache_ttl: float = 60.0
+    user_cache_max_size: int = 10000
+
+    # Ограничение частоты запросов к дорогим маршрутам (memory | redis).
+    # Лимиты "N/second|minute|hour|day" по маршрутам: для IP клиента и для email
+    rate_limit_enabled: bool = True
+    rate_limit_backend: str = "memory"
+    rate_limit_redis_url: Optional[str] = None
+    rate_limit_max_keys: int = 100000
+    rate_limit_trust_forwarded: bool = False  # брать IP из X-Forwarded-For (за прокси)
+    rate_limit_trusted_proxies: int = 1  # сколько своих прокси дописывают X-Forwarded-For
+    rate_limits_ip: Dict[str, str] = {
+        "login": "20/minute",
+        "register": "5/minute",
+        "forgot_password": "5/minute",
+        "resend_verification": "5/minute",
+    }
+    rate_limits_email: Dict[str, str] = {
+        "login": "5/minute",
+        "forgot_password": "3/hour",
+        "resend_verification": "3/hour",
+    }
 
     class Config:
         env_file = ".env"
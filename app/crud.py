@@ -1,12 +1,17 @@
 from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, insert, update, delete, func, tuple_, Row
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 import uuid
 
-from app import models, schemas, auth
+from app import models, schemas
+from app.config import settings
 from app.models import EmailVerification
+from app.services.hashing import hasher
+from app.services.user_cache import user_cache
+from app.services.refresh_tokens import revocation_list
 
 
 # User CRUD operations
@@ -33,38 +38,40 @@ async def get_user_by_public_id(db: AsyncSession, public_id: str) -> Optional[mo
 
 
 async def create_user(db: AsyncSession, user_data: schemas.UserCreate) -> models.User:
-    """Создает нового пользователя в базе данных"""
-    # Проверяем, существует ли пользователь с таким email
-    existing_user = await get_user_by_email(db, user_data.email)
-    if existing_user:
-        raise ValueError("Пользователь с таким email уже существует")
-
-    # Проверяем, существует ли пользователь с таким username
-    existing_username = await get_user_by_username(db, user_data.username)
-    if existing_username:
-        raise ValueError("Пользователь с таким именем уже существует")
-
-    # Хэшируем пароль с помощью bcrypt
-    hashed_password = auth.get_password_hash(user_data.password)
+    """
+    Создает нового пользователя одним INSERT ... RETURNING, без commit.
+
+    Уникальность email и username проверяет сама БД (уникальные индексы),
+    а не предварительные SELECT - так нет гонки между проверкой и вставкой.
+    При конфликте транзакция откатывается и поднимается ValueError; какое
+    поле занято, определяется SELECT по username, а не по тексту ошибки
+    драйвера (он разный у asyncpg, psycopg и sqlite).
+    """
+    # Хэшируем пароль с помощью bcrypt (вне event loop)
+    hashed_password = await hasher.hash(user_data.password)
 
     # Создаем токен для верификации email
     verification_token = str(uuid.uuid4())
     token_expires = datetime.utcnow() + timedelta(hours=24)
 
-    # Создаем объект пользователя
-    db_user = models.User(
-        email=user_data.email,
-        username=user_data.username,
-        hashed_password=hashed_password,
-        verification_token=verification_token,
-        verification_token_expires=token_expires
-    )
-
-    db.add(db_user)
-    await db.commit()
-    await db.refresh(db_user)
+    try:
+        result = await db.execute(
+            insert(models.User).values(
+                email=user_data.email,
+                username=user_data.username,
+                hashed_password=hashed_password,
+                verification_token=verification_token,
+                verification_token_expires=token_expires
+            ).returning(models.User)
+        )
+    except IntegrityError:
+        await db.rollback()
+        # Конфликтующая запись уже закоммичена - иначе уникальный индекс не сработал бы
+        if await get_user_by_username(db, user_data.username) is not None:
+            raise ValueError("Пользователь с таким именем уже существует")
+        raise ValueError("Пользователь с таким email уже существует")
 
-    return db_user
+    return result.scalar_one()
 
 
 async def verify_user_email(db: AsyncSession, token: str) -> bool:
@@ -84,14 +91,64 @@ async def verify_user_email(db: AsyncSession, token: str) -> bool:
     user.verification_token_expires = None
 
     await db.commit()
+    await user_cache.invalidate(user.public_id)
     return True
 
 
 async def update_password(db: AsyncSession, user: models.User, new_password: str) -> None:
-    user.hashed_password = auth.get_password_hash(new_password)
+    user.hashed_password = await hasher.hash(new_password)
     user.reset_token = None
     user.reset_token_expires = None
+    # После смены пароля все выданные сессии становятся недействительными
+    await revoke_user_sessions(db, user.id)
+    await db.commit()
+    await user_cache.invalidate(user.public_id)
+
+
+async def update_user_profile(
+        db: AsyncSession, user_id: int, update_data: schemas.UserUpdate
+) -> models.User:
+    """Обновляет профиль пользователя"""
+    user = await db.get(models.User, user_id)
+
+    data = update_data.model_dump(exclude_unset=True)
+    # username обязателен - null означает "не менять"
+    if data.get("username") is None:
+        data.pop("username", None)
+    elif data["username"] != user.username:
+        existing_username = await get_user_by_username(db, data["username"])
+        if existing_username:
+            raise ValueError("Пользователь с таким именем уже существует")
+
+    for field, value in data.items():
+        setattr(user, field, value)
+
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Проверка выше не защищает от одновременного переименования в то же имя
+        await db.rollback()
+        raise ValueError("Пользователь с таким именем уже существует")
+    await db.refresh(user)
+    await user_cache.invalidate(user.public_id)
+    return user
+
+
+async def deactivate_user(db: AsyncSession, user_id: int) -> None:
+    """Деактивирует пользователя"""
+    user = await db.get(models.User, user_id)
+    user.is_active = False
+    await revoke_user_sessions(db, user.id)
     await db.commit()
+    await user_cache.invalidate(user.public_id)
+
+
+async def add_email_verification(db: AsyncSession, email: str) -> EmailVerification:
+    """Добавляет запись для подтверждения email в текущую транзакцию (без commit)"""
+    verification = EmailVerification.create_for_email(email)
+    db.add(verification)
+    await db.flush()
+    return verification
 
 
 async def create_email_verification(db: AsyncSession, email: str) -> EmailVerification:
@@ -102,10 +159,8 @@ async def create_email_verification(db: AsyncSession, email: str) -> EmailVerifi
     )
 
     # Создаем новую
-    verification = EmailVerification.create_for_email(email)
-    db.add(verification)
+    verification = await add_email_verification(db, email)
     await db.commit()
-    await db.refresh(verification)
     return verification
 
 
@@ -170,6 +225,331 @@ async def verify_email_token(db: AsyncSession, token: str) -> bool:
     logger.info(f"Пользователь найден: {user.id}, {user.email}")
     user.is_verified = True
     await db.commit()
+    await user_cache.invalidate(user.public_id)
 
     logger.info(f"Email успешно подтвержден для {user.email}")
     return True
+
+
+async def enqueue_email(db: AsyncSession, to_email: str, subject: str, body_html: str) -> models.EmailOutbox:
+    """Кладет письмо в outbox - отправкой занимается EmailDispatcher"""
+    item = models.EmailOutbox(to_email=to_email, subject=subject, body_html=body_html)
+    db.add(item)
+    await db.commit()
+    return item
+
+
+# Video catalog
+CATALOG_COLUMNS = (
+    models.VideoFile.id,
+    models.VideoFile.filename,
+    models.VideoFile.description,
+    models.VideoFile.content_type,
+    models.VideoFile.size,
+    models.VideoFile.duration,
+    models.VideoFile.width,
+    models.VideoFile.height,
+    models.VideoFile.frame_rate,
+    models.VideoFile.video_codec,
+    models.VideoFile.created_at,
+)
+
+
+async def list_videos(
+        db: AsyncSession,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None,
+        filters: Optional[schemas.VideoCatalogFilters] = None
+) -> List[Row]:
+    """
+    Страница каталога (новые первыми) с keyset пагинацией по (created_at, id).
+    Выбираются только нужные каталогу колонки. Фильтры по длительности и
+    разрешению - по колонкам из заголовков видео (неразобранные видео
+    под такие фильтры не попадают).
+    """
+    query = select(*CATALOG_COLUMNS)
+    if filters is not None:
+        video = models.VideoFile
+        if filters.min_duration is not None:
+            query = query.where(video.duration >= filters.min_duration)
+        if filters.max_duration is not None:
+            query = query.where(video.duration <= filters.max_duration)
+        if filters.min_width is not None:
+            query = query.where(video.width >= filters.min_width)
+        if filters.min_height is not None:
+            query = query.where(video.height >= filters.min_height)
+        if filters.max_height is not None:
+            query = query.where(video.height <= filters.max_height)
+    if after is not None:
+        query = query.where(
+            tuple_(models.VideoFile.created_at, models.VideoFile.id) < tuple_(*after)
+        )
+    query = query.order_by(
+        models.VideoFile.created_at.desc(), models.VideoFile.id.desc()
+    ).limit(limit)
+
+    result = await db.execute(query)
+    return list(result.all())
+
+
+async def get_video_catalog_version(db: AsyncSession) -> Tuple[int, int, int]:
+    """
+    Отметка изменений каталога: (количество записей, максимальный id,
+    сколько еще ждут разбора заголовков) - после разбора в каталоге
+    появляются длительность и разрешение.
+    """
+    result = await db.execute(
+        select(
+            func.count(models.VideoFile.id),
+            func.coalesce(func.max(models.VideoFile.id), 0),
+            func.count(models.VideoFile.id).filter(models.VideoFile.probe_status == "pending")
+        )
+    )
+    count, max_id, pending = result.one()
+    return count, max_id, pending
+
+
+async def save_video_probe(db: AsyncSession, video_id: int, status: str, metadata: Optional[dict] = None) -> None:
+    """Сохраняет результат разбора заголовков видео"""
+    await db.execute(
+        update(models.VideoFile)
+        .where(models.VideoFile.id == video_id)
+        .values(probe_status=status, **(metadata or {}))
+    )
+    await db.commit()
+
+
+# Video blobs: одинаковое содержимое хранится в MinIO один раз
+PROBE_COLUMNS = (
+    models.VideoFile.probe_status,
+    models.VideoFile.container,
+    models.VideoFile.duration,
+    models.VideoFile.width,
+    models.VideoFile.height,
+    models.VideoFile.frame_rate,
+    models.VideoFile.video_codec,
+    models.VideoFile.audio_codec,
+)
+
+
+async def get_video_blob(db: AsyncSession, sha256: str) -> Optional[models.VideoBlob]:
+    result = await db.execute(
+        select(models.VideoBlob).where(models.VideoBlob.sha256 == sha256)
+    )
+    return result.scalar_one_or_none()
+
+
+async def add_video_for_blob(
+        db: AsyncSession,
+        sha256: str,
+        filename: str,
+        description: Optional[str],
+        content_type: str,
+        uploaded_by: int
+) -> Optional[models.VideoFile]:
+    """
+    Запись видео для уже сохраненного содержимого: refcount + 1 и новый
+    VideoFile с тем же объектом в одной транзакции, в MinIO ничего не пишется.
+    Метаданные заголовков копируются с уже разобранной копии.
+    None - объекта с таким хэшем нет (или его удалили параллельно).
+    """
+    blob = models.VideoBlob
+    result = await db.execute(
+        update(blob)
+        .where(blob.sha256 == sha256)
+        .values(refcount=blob.refcount + 1)
+        .returning(blob.object_name, blob.size, blob.etag)
+    )
+    stored = result.one_or_none()
+    if stored is None:
+        await db.rollback()
+        return None
+
+    result = await db.execute(
+        select(*PROBE_COLUMNS)
+        .where(models.VideoFile.content_sha256 == sha256, models.VideoFile.probe_status != "pending")
+        .limit(1)
+    )
+    probe = result.one_or_none()
+
+    video = models.VideoFile(
+        filename=filename,
+        description=description,
+        object_name=stored.object_name,
+        content_type=content_type,
+        size=stored.size,
+        etag=stored.etag,
+        content_sha256=sha256,
+        uploaded_by=uploaded_by,
+        **(probe._asdict() if probe is not None else {})
+    )
+    db.add(video)
+    await db.commit()
+    await db.refresh(video)
+    return video
+
+
+async def add_video_with_blob(db: AsyncSession, video: models.VideoFile, blob: models.VideoBlob) -> bool:
+    """
+    Запись видео вместе с новым объектом (refcount 1).
+    False - такое же содержимое только что сохранил параллельный запрос.
+    """
+    db.add_all([blob, video])
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return False
+    await db.refresh(video)
+    return True
+
+
+async def delete_video(db: AsyncSession, video: models.VideoFile) -> Optional[str]:
+    """
+    Удаляет запись видео (коммит - на вызывающей стороне; эталон жеста
+    удаляется отдельно, delete_gesture_references) и возвращает имя
+    объекта MinIO, который больше никому не нужен: последняя ссылка на
+    VideoBlob или старая запись без хэша. None - на объект ссылаются другие записи.
+    """
+    await db.delete(video)
+    if video.content_sha256 is None:
+        return video.object_name
+
+    blob = models.VideoBlob
+    result = await db.execute(
+        update(blob)
+        .where(blob.sha256 == video.content_sha256)
+        .values(refcount=blob.refcount - 1)
+        .returning(blob.refcount, blob.object_name)
+    )
+    stored = result.one_or_none()
+    if stored is None or stored.refcount > 0:
+        return None
+    await db.execute(delete(blob).where(blob.sha256 == video.content_sha256))
+    return stored.object_name
+
+
+# Gesture references: эталоны для индекса похожих жестов
+async def delete_gesture_references(db: AsyncSession, video_id: int) -> List[int]:
+    """Удаляет эталоны видео (коммит - на вызывающей стороне) и возвращает их id"""
+    reference = models.GestureReference
+    result = await db.execute(delete(reference).where(reference.video_id == video_id).returning(reference.id))
+    return list(result.scalars().all())
+
+
+async def save_gesture_reference(
+        db: AsyncSession, video_id: int, features: bytes, frames: int
+) -> Tuple[int, List[int]]:
+    """
+    Заменяет эталон видео; у нового эталона новый id, чтобы индекс дописал
+    его инкрементально. Возвращает id нового эталона и id замененных.
+    """
+    reference = models.GestureReference
+    replaced_ids = await delete_gesture_references(db, video_id)
+    result = await db.execute(
+        insert(reference)
+        .values(video_id=video_id, features=features, frames=frames)
+        .returning(reference.id)
+    )
+    reference_id = result.scalar_one()
+    await db.commit()
+    return reference_id, replaced_ids
+
+
+async def get_gesture_references(db: AsyncSession, after_id: int, limit: int) -> List[Row]:
+    """Эталоны с id больше after_id по возрастанию id (keyset)"""
+    reference = models.GestureReference
+    result = await db.execute(
+        select(reference.id, reference.features)
+        .where(reference.id > after_id)
+        .order_by(reference.id)
+        .limit(limit)
+    )
+    return list(result.all())
+
+
+async def get_gesture_reference_ids(db: AsyncSession) -> List[int]:
+    """id всех текущих эталонов - по ним sync обновляет маску live индекса"""
+    result = await db.execute(select(models.GestureReference.id))
+    return list(result.scalars().all())
+
+
+async def get_gesture_reference_videos(db: AsyncSession, reference_ids: List[int]) -> Dict[int, Row]:
+    """
+    Видео для найденных эталонов: id эталона -> строка видео. Эталонов,
+    которые уже удалены или заменены, в результате нет.
+    """
+    reference = models.GestureReference
+    video = models.VideoFile
+    result = await db.execute(
+        select(reference.id.label("reference_id"), video.id, video.filename, video.description)
+        .join(video, video.id == reference.video_id)
+        .where(reference.id.in_(reference_ids))
+    )
+    return {row.reference_id: row for row in result.all()}
+
+
+# Refresh tokens
+async def create_refresh_token(db: AsyncSession, user_id: int, token_hash: str) -> None:
+    """Сохраняет хэш выданного refresh токена (коммит - на вызывающей стороне)"""
+    db.add(models.RefreshToken(
+        token_hash=token_hash,
+        user_id=user_id,
+        expires_at=datetime.utcnow() + timedelta(days=settings.refresh_token_expire_days)
+    ))
+
+
+async def consume_refresh_token(db: AsyncSession, token_hash: str) -> Optional[int]:
+    """
+    Отзывает действующий refresh токен при ротации одним UPDATE по уникальному
+    индексу. Возвращает user_id или None, если токен неизвестен, просрочен
+    или уже был использован.
+    """
+    now = datetime.utcnow()
+    result = await db.execute(
+        update(models.RefreshToken)
+        .where(
+            models.RefreshToken.token_hash == token_hash,
+            models.RefreshToken.is_revoked.is_(False),
+            models.RefreshToken.expires_at > now
+        )
+        .values(is_revoked=True, revoked_at=now)
+        .returning(models.RefreshToken.user_id)
+    )
+    return result.scalar_one_or_none()
+
+
+async def revoke_user_sessions(db: AsyncSession, user_id: int) -> Optional[str]:
+    """
+    Отзывает все сессии пользователя (коммит - на вызывающей стороне):
+    действующие refresh токены и access токены, выданные до этого момента.
+    Возвращает public_id - после коммита по нему сбрасывается кэш пользователя.
+    """
+    public_id = await db.scalar(
+        update(models.User)
+        .where(models.User.id == user_id)
+        .values(tokens_valid_after=datetime.utcnow())
+        .returning(models.User.public_id)
+    )
+    result = await db.execute(
+        update(models.RefreshToken)
+        .where(
+            models.RefreshToken.user_id == user_id,
+            models.RefreshToken.is_revoked.is_(False)
+        )
+        .values(is_revoked=True, revoked_at=datetime.utcnow())
+        .returning(models.RefreshToken.token_hash, models.RefreshToken.expires_at)
+    )
+    revocation_list.add(result.all())
+    return public_id
+
+
+async def get_revoked_refresh_token_owner(db: AsyncSession, token_hash: str) -> Optional[int]:
+    """Владелец токена, если токен уже отозван в БД (в том числе другим воркером), иначе None"""
+    result = await db.execute(
+        select(models.RefreshToken.user_id).where(
+            models.RefreshToken.token_hash == token_hash,
+            models.RefreshToken.is_revoked.is_(True)
+        )
+    )
+    return result.scalar_one_or_none()
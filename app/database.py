@@ -1,17 +1,60 @@
-from sqlalchemy import create_engine
+import os
+import time
+from typing import Optional
+
+from sqlalchemy import create_engine, inspect, text, Engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 from app.config import settings
 
-# Синхронный движок для Alembic миграций
-engine = create_engine(settings.database_url)
 
-# Асинхронный движок для приложения
-async_engine = create_async_engine(settings.database_url_async)
+class TimedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, который считает выдачи соединений и время их ожидания"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            elapsed = time.perf_counter() - started_at
+            self.checkouts += 1
+            self.wait_total += elapsed
+            self.wait_max = max(self.wait_max, elapsed)
+
 
-# Синхронная сессия
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _async_engine_options() -> dict:
+    url = make_url(settings.database_url_async)
+    if url.get_backend_name() == "sqlite":
+        # Локальная разработка на aiosqlite: пул диалекта по умолчанию
+        return {"url": url}
+
+    if url.get_driver_name() == "asyncpg":
+        # Кэш подготовленных выражений asyncpg на соединение
+        url = url.update_query_dict(
+            {"prepared_statement_cache_size": str(settings.db_statement_cache_size)}
+        )
+    return {
+        "url": url,
+        "poolclass": TimedAsyncAdaptedQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+# Асинхронный движок для приложения
+async_engine = create_async_engine(**_async_engine_options())
 
 # Асинхронная сессия
 AsyncSessionLocal = async_sessionmaker(
@@ -20,14 +63,86 @@ AsyncSessionLocal = async_sessionmaker(
 
 Base = declarative_base()
 
+_sync_engine: Optional[Engine] = None
+
+
+def get_sync_engine() -> Engine:
+    """
+    Синхронный движок для задач при старте (создание схемы, миграции).
+    Создается по требованию, без пула - в обработке запросов не участвует.
+    """
+    global _sync_engine
+    if _sync_engine is None:
+        _sync_engine = create_engine(settings.database_url, poolclass=NullPool)
+    return _sync_engine
+
+
+def dispose_sync_engine() -> None:
+    global _sync_engine
+    if _sync_engine is not None:
+        _sync_engine.dispose()
+        _sync_engine = None
+
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+
+class SchemaVersionError(RuntimeError):
+    """Версия схемы в БД не совпадает с последней миграцией"""
+
+
+def expected_schema_revision() -> Optional[str]:
+    """Последняя ревизия из каталога миграций alembic"""
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    return ScriptDirectory.from_config(Config(ALEMBIC_INI)).get_current_head()
+
+
+async def check_schema_version() -> str:
+    """
+    Проверка при старте: один SELECT из alembic_version вместо create_all.
+    Миграции применяются один раз на деплой командой alembic upgrade head.
+    """
+    expected = expected_schema_revision()
+    async with async_engine.connect() as connection:
+        try:
+            current = (await connection.execute(text("SELECT version_num FROM alembic_version"))).scalar()
+        except DBAPIError:
+            current = None
+            await connection.rollback()
+            legacy = await connection.run_sync(lambda sync: inspect(sync).has_table("users"))
+            if legacy:
+                # Схема создана create_all до перехода на alembic: ревизия 0000
+                # примет существующие таблицы, дальше пойдут обычные миграции
+                raise SchemaVersionError(
+                    "БД создана до перехода на миграции (нет alembic_version): выполните "
+                    f"alembic upgrade head, базовая ревизия 0000 примет существующие таблицы, ожидается {expected}"
+                )
+
+    if current != expected:
+        raise SchemaVersionError(
+            f"Версия схемы БД {current}, ожидается {expected}: выполните alembic upgrade head"
+        )
+    return current
+
+
+def pool_stats() -> dict:
+    """Состояние пула асинхронного движка"""
+    pool = async_engine.pool
+    if not isinstance(pool, TimedAsyncAdaptedQueuePool):
+        return {"status": pool.status()}
 
-# Dependency для синхронной сессии
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.db_max_overflow,
+        "checkouts": pool.checkouts,
+        "wait_avg_ms": pool.wait_total / pool.checkouts * 1000 if pool.checkouts else 0.0,
+        "wait_max_ms": pool.wait_max * 1000,
+    }
 
 
 # Dependency для асинхронной сессии
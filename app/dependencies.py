@@ -1,9 +1,13 @@
-from fastapi import Depends, HTTPException, status
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request, WebSocket, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_async_db
+from app.database import AsyncSessionLocal, get_async_db
 from app import crud, auth
+from app.config import settings
+from app.services.user_cache import AnyUser, user_cache
 
 security = HTTPBearer()
 
@@ -11,7 +15,12 @@ security = HTTPBearer()
 async def get_current_user(
         credentials: HTTPAuthorizationCredentials = Depends(security),
         db: AsyncSession = Depends(get_async_db)
-):
+) -> AnyUser:
+    """
+    Текущий пользователь по access токену. При попадании в кэш это снимок
+    CachedUser, а не строка БД: обработчики, которые меняют пользователя,
+    загружают его из БД по current_user.id.
+    """
     token = credentials.credentials
     token_data = auth.verify_token(token)
 
@@ -22,10 +31,20 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Ищем пользователя по public_id из токена
-    user = await crud.get_user_by_public_id(db, token_data.public_id)
+    # Ищем пользователя по public_id из токена: сначала в кэше, затем в БД
+    user = await user_cache.get(token_data.public_id)
     if user is None:
-        raise HTTPException(status_code=404, detail="User not found")
+        user = await crud.get_user_by_public_id(db, token_data.public_id)
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        await user_cache.set(user)
+
+    if auth.is_token_revoked(token_data, user.tokens_valid_after):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
 
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
@@ -33,7 +52,52 @@ async def get_current_user(
     return user
 
 
-async def get_current_active_user(current_user=Depends(get_current_user)):
+async def get_current_active_user(current_user: AnyUser = Depends(get_current_user)) -> AnyUser:
     if not current_user.is_verified:
         raise HTTPException(status_code=400, detail="Email not verified")
     return current_user
+
+
+def get_language(request: Request) -> str:
+    """Язык запроса, определенный LanguageMiddleware"""
+    return getattr(request.state, "lang", settings.default_language)
+
+
+# Подпротокол, за которым в Sec-WebSocket-Protocol следует access токен;
+# сервер подтверждает именно его, сам токен обратно не отправляется
+WS_AUTH_SUBPROTOCOL = "bearer"
+
+
+async def get_websocket_user(websocket: WebSocket) -> Optional[AnyUser]:
+    """
+    Пользователь WebSocket соединения: токен проверяется один раз при
+    подключении. Браузер не может задать заголовок Authorization для
+    WebSocket, поэтому токен передается и в Sec-WebSocket-Protocol: парой
+    подпротоколов "bearer", "<токен>" (new WebSocket(url, ["bearer", token])).
+    В URL токен не принимается - он попал бы в access log.
+    Сессия БД нужна только на время проверки, а не на все соединение.
+    None - токен недействителен или пользователь неактивен/не подтвержден.
+    """
+    protocols = websocket.scope.get("subprotocols") or []
+    if WS_AUTH_SUBPROTOCOL in protocols[:-1]:
+        token = protocols[protocols.index(WS_AUTH_SUBPROTOCOL) + 1]
+    else:
+        scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+        token = credentials if scheme.lower() == "bearer" else None
+    token_data = auth.verify_token(token) if token else None
+    if token_data is None:
+        return None
+
+    user = await user_cache.get(token_data.public_id)
+    if user is None:
+        async with AsyncSessionLocal() as db:
+            user = await crud.get_user_by_public_id(db, token_data.public_id)
+        if user is None:
+            return None
+        await user_cache.set(user)
+
+    if auth.is_token_revoked(token_data, user.tokens_valid_after):
+        return None
+    if not user.is_active or not user.is_verified:
+        return None
+    return user
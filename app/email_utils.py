@@ -1,59 +1,57 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from jinja2 import Template
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import settings
-import os
+from app import crud
+from app.services.email_dispatcher import dispatcher
+from app.services.email_templates import templates
 
+SUBJECTS = {
+    "verification_email.html": {
+        "ru": "Подтверждение регистрации - Жестовый помощник",
+        "en": "Email confirmation - Sign Language Assistant",
+    },
+    "reset_password.html": {
+        "ru": "Сброс пароля - Жестовый помощник",
+        "en": "Password reset - Sign Language Assistant",
+    },
+}
 
-def send_email(to_email: str, subject: str, body_html: str) -> bool:
-    """Отправка email через SMTP"""
-    try:
-        msg = MIMEMultipart()
-        msg["From"] = settings.email_from
-        msg["To"] = to_email
-        msg["Subject"] = subject
 
-        msg.attach(MIMEText(body_html, "html"))
+def get_subject(template_name: str, lang: str) -> str:
+    subjects = SUBJECTS[template_name]
+    return subjects.get(lang) or subjects[settings.default_language]
 
-        with smtplib.SMTP(settings.smtp_host, settings.smtp_port) as server:
-            server.starttls()
-            server.login(settings.smtp_user, settings.smtp_password)
-            server.send_message(msg)
 
-        return True
-    except Exception as e:
-        print(f"Error sending email: {e}")
-        return False
+async def send_email(db: AsyncSession, to_email: str, subject: str, body_html: str) -> None:
+    """Ставит письмо в очередь на отправку (email_outbox)"""
+    await crud.enqueue_email(db, to_email, subject, body_html)
+    dispatcher.notify()
 
 
-def send_verification_email(email: str, verification_url: str) -> bool:
+async def send_verification_email(
+        db: AsyncSession, email: str, verification_url: str, lang: str = settings.default_language
+) -> None:
     """Отправка email для подтверждения регистрации"""
-    template_path = os.path.join(os.path.dirname(__file__), "templates", "verification_email.html")
-
-    with open(template_path, "r", encoding="utf-8") as f:
-        template = Template(f.read())
-
-    body = template.render(
+    body = templates.render(
+        "verification_email.html",
+        lang,
         verification_url=verification_url,
         frontend_url=settings.frontend_url
     )
 
-    subject = "Подтверждение регистрации - Жестовый помощник"
-    return send_email(email, subject, body)
+    subject = get_subject("verification_email.html", lang)
+    await send_email(db, email, subject, body)
 
 
-def send_password_reset_email(email: str, reset_url: str) -> bool:
+async def send_password_reset_email(
+        db: AsyncSession, email: str, reset_url: str, lang: str = settings.default_language
+) -> None:
     """Отправка email для сброса пароля"""
-    template_path = os.path.join(os.path.dirname(__file__), "templates", "reset_password.html")
-
-    with open(template_path, "r", encoding="utf-8") as f:
-        template = Template(f.read())
-
-    body = template.render(
+    body = templates.render(
+        "reset_password.html",
+        lang,
         reset_url=reset_url,
         frontend_url=settings.frontend_url
     )
 
-    subject = "Сброс пароля - Жестовый помощник"
-    return send_email(email, subject, body)
+    subject = get_subject("reset_password.html", lang)
+    await send_email(db, email, subject, body)
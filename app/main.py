@@ -1,34 +1,66 @@
-import uvicorn
 from fastapi import FastAPI, Request, Response
-from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 
-from app.routers import auth, users, language, videos
+from app.routers import auth, users, language, videos, metrics, recognition, gestures
 from app.middleware.language_middleware import LanguageMiddleware
+from app.middleware.metrics_middleware import MetricsMiddleware
 from app.config import settings
-from app.database import engine
-from app import models
-
-
-class CustomCORSMiddleware(CORSMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-
-        # Добавляем CORS заголовки даже для ошибок
-        origin = request.headers.get('origin')
-        if origin in self.allow_origins:
-            response.headers['Access-Control-Allow-Origin'] = origin
-            response.headers['Access-Control-Allow-Credentials'] = 'true'
-
-        return response
+from app.database import async_engine, check_schema_version
+from app.services.hashing import hasher, HashingOverloadedError
+from app.services.email_dispatcher import dispatcher
+from app.services.email_templates import templates
+from app.services.storage import init_storage, check_bucket, close_storage
+from app.services.refresh_tokens import refresh_token_maintenance
+from app.services.token_sweeper import token_sweeper
+from app.services.video_probe import video_prober
+from app.services.recognition import RecognitionOverloadedError, recognizer
+from app.services.gesture_index import gesture_index
+from app.services.startup import StartupReport
+from app.services.metrics import instrument_engine, multiprocess_metrics
+from app.services.rate_limit import RateLimitExceededError, retry_after_header
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Создание таблиц при старте
-    models.Base.metadata.create_all(bind=engine)
+    report = StartupReport()
+    # Схема создается миграциями (alembic upgrade head), здесь только проверка версии
+    if settings.db_schema_check:
+        with report.phase("schema"):
+            await check_schema_version()
+    # Компилируем шаблоны писем один раз
+    with report.phase("templates"):
+        templates.load()
+    with report.phase("storage"):
+        storage = init_storage()
+        await check_bucket(storage)
+    with report.phase("background"):
+        dispatcher.start()
+        refresh_token_maintenance.start()
+        token_sweeper.start()
+        if multiprocess_metrics is not None:
+            multiprocess_metrics.start()
+    # Процессы распознавания с загруженной моделью поднимаются до первого запроса
+    with report.phase("recognition"):
+        await recognizer.start()
+    # Эталоны, добавленные, пока сервер был остановлен
+    with report.phase("gesture_index"):
+        await gesture_index.sync()
+    report.finish()
+    app.state.startup_report = report
     yield
+    # Дожидаемся отправки текущей пачки писем и операций хэширования
+    await token_sweeper.stop()
+    await refresh_token_maintenance.stop()
+    await dispatcher.stop()
+    await video_prober.stop()
+    await recognizer.stop()
+    gesture_index.stop()
+    if multiprocess_metrics is not None:
+        await multiprocess_metrics.stop()
+    hasher.shutdown()
+    close_storage()
+    await async_engine.dispose()
 
 app = FastAPI(
     title="РЖЯ-помощник API",
@@ -37,22 +69,57 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-app.add_middleware(LanguageMiddleware)
-
-# Настройка CORS
+# Определение языка и CORS
 app.add_middleware(
-    CustomCORSMiddleware,
-    allow_origins=["http://localhost:5173", "http://localhost:3000"],
+    LanguageMiddleware,
+    allow_origins=settings.cors_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+if settings.metrics_enabled:
+    # Внешний слой: задержка включает все остальные middleware
+    app.add_middleware(MetricsMiddleware)
+    instrument_engine(async_engine.sync_engine)
+
+
+@app.exception_handler(HashingOverloadedError)
+async def hashing_overloaded_handler(request: Request, exc: HashingOverloadedError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Service is busy, try again later"},
+        headers={"Retry-After": "1"}
+    )
+
+
+@app.exception_handler(RecognitionOverloadedError)
+async def recognition_overloaded_handler(request: Request, exc: RecognitionOverloadedError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Service is busy, try again later"},
+        headers={"Retry-After": "1"}
+    )
+
+
+@app.exception_handler(RateLimitExceededError)
+async def rate_limit_handler(request: Request, exc: RateLimitExceededError):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many requests, try again later"},
+        headers={"Retry-After": retry_after_header(exc.retry_after)}
+    )
+
+
 # Подключение роутеров
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(language.router)
 app.include_router(videos.router)
+app.include_router(recognition.router)
+app.include_router(gestures.router)
+if settings.metrics_enabled:
+    app.include_router(metrics.router)
 
 
 @app.get("/")
@@ -65,4 +132,6 @@ async def health_check():
     return {"status": "healthy"}
 
 if __name__ == '__main__':
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Несколько воркеров, uvloop/httptools и штатная остановка - см. app/serve.py
+    from app.serve import main
+    main()
@@ -1,41 +1,166 @@
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from datetime import datetime, timedelta
-
-
-class LanguageMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        # Определяем язык:
-        #    - Из куки 'lang' (если пользователь явно выбрал)
-        #    - Из заголовка Accept-Language браузера
-        #    - По умолчанию 'ru'
-
-        lang = request.cookies.get('lang')
-
-        if not lang:
-            accept_language = request.headers.get('accept-language', '')
-            if accept_language:
-                primary_lang = accept_language.split(',')[0].split('-')[0].lower()
-                if primary_lang in ['ru', 'en']:
-                    lang = primary_lang
-                else:
-                    lang = 'ru'
-            else:
-                lang = 'ru'
-
-        request.state.lang = lang
-
-        response = await call_next(request)
-
-        if 'lang' not in request.cookies:
-            response.set_cookie(
-                key='lang',
-                value=lang,
-                max_age=365 * 24 * 60 * 60,  # 1 год
-                httponly=True,  # Не доступен из JavaScript
-                samesite='lax'
-            )
-
-        response.headers['Content-Language'] = lang
-
-        return response
\ No newline at end of file
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import cookie_parser
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+LANG_COOKIE_MAX_AGE = 365 * 24 * 60 * 60  # 1 год
+ALL_METHODS = ("DELETE", "GET", "HEAD", "OPTIONS", "PATCH", "POST", "PUT")
+
+
+@lru_cache(maxsize=1024)
+def negotiate_language(accept_language: str) -> str:
+    """
+    Выбирает язык из заголовка Accept-Language с учетом q-значений.
+    Например "en-US,en;q=0.9,ru;q=0.8" -> "en". Результат кэшируется:
+    браузеры присылают очень ограниченный набор значений этого заголовка.
+    """
+    best_lang = settings.default_language
+    best_q = 0.0
+
+    for item in accept_language.split(","):
+        lang, _, params = item.strip().partition(";")
+        primary = lang.strip().split("-")[0].lower()
+        if primary not in settings.supported_languages:
+            continue
+
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                continue
+
+        # При равных q побеждает язык, указанный раньше
+        if q > best_q:
+            best_lang, best_q = primary, q
+
+    return best_lang
+
+
+class LanguageMiddleware:
+    """
+    Чистый ASGI middleware: определение языка и CORS за один проход по заголовкам.
+
+    Язык берется из куки 'lang' (если пользователь явно выбрал), иначе
+    из Accept-Language, по умолчанию - settings.default_language. Он сохраняется
+    в request.state.lang, а в ответ добавляются Content-Language и (при
+    отсутствии) кука 'lang'. Тело ответа не буферизуется - заголовки
+    дописываются в сообщение http.response.start.
+    """
+
+    def __init__(
+            self,
+            app: ASGIApp,
+            allow_origins: Iterable[str] = (),
+            allow_credentials: bool = True,
+            allow_methods: Iterable[str] = ("*",),
+            allow_headers: Iterable[str] = ("*",),
+            max_age: int = 600
+    ):
+        self.app = app
+        self.allow_origins = frozenset(allow_origins)
+        self.allow_all_origins = "*" in self.allow_origins
+        self.allow_credentials = allow_credentials
+        self.allow_all_headers = "*" in allow_headers
+
+        methods = ALL_METHODS if "*" in allow_methods else allow_methods
+        self.allow_methods = ", ".join(methods)
+        self.allow_headers = ", ".join(h.lower() for h in allow_headers if h != "*")
+        self.max_age = str(max_age)
+
+        # Заголовки Set-Cookie заранее для каждого поддерживаемого языка
+        self._lang_cookies = {
+            lang: f"lang={lang}; HttpOnly; Max-Age={LANG_COOKIE_MAX_AGE}; Path=/; SameSite=lax"
+            for lang in settings.supported_languages
+        }
+
+    def is_allowed_origin(self, origin: str) -> bool:
+        return self.allow_all_origins or origin in self.allow_origins
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cookie_header = accept_language = origin = request_method = request_headers = None
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                cookie_header = value.decode("latin-1")
+            elif name == b"accept-language":
+                accept_language = value.decode("latin-1")
+            elif name == b"origin":
+                origin = value.decode("latin-1")
+            elif name == b"access-control-request-method":
+                request_method = value.decode("latin-1")
+            elif name == b"access-control-request-headers":
+                request_headers = value.decode("latin-1")
+
+        lang = None
+        if cookie_header:
+            lang = cookie_parser(cookie_header).get("lang")
+        has_cookie = lang in self._lang_cookies
+        if not has_cookie:
+            lang = negotiate_language(accept_language) if accept_language else settings.default_language
+
+        scope.setdefault("state", {})["lang"] = lang
+
+        if scope["method"] == "OPTIONS" and origin is not None and request_method is not None:
+            await self.preflight_response(origin, request_headers, send)
+            return
+
+        cors_headers = self.simple_cors_headers(origin)
+        lang_cookie = None if has_cookie else self._lang_cookies[lang]
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["Content-Language"] = lang
+                if lang_cookie is not None:
+                    headers.append("Set-Cookie", lang_cookie)
+                for key, value in cors_headers:
+                    headers[key] = value
+                if origin is not None and not self.allow_all_origins:
+                    headers.add_vary_header("Origin")
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    def simple_cors_headers(self, origin: Optional[str]) -> List[Tuple[str, str]]:
+        if origin is None or not self.is_allowed_origin(origin):
+            return []
+        headers = [("Access-Control-Allow-Origin", origin)]
+        if self.allow_credentials:
+            headers.append(("Access-Control-Allow-Credentials", "true"))
+        return headers
+
+    async def preflight_response(self, origin: str, request_headers: Optional[str], send: Send) -> None:
+        """Отвечает на CORS preflight, не передавая запрос приложению"""
+        if not self.is_allowed_origin(origin):
+            status, body = 400, b"Disallowed CORS origin"
+            headers = []
+        else:
+            status, body = 200, b"OK"
+            headers = self.simple_cors_headers(origin) + [
+                ("Access-Control-Allow-Methods", self.allow_methods),
+                ("Access-Control-Max-Age", self.max_age),
+            ]
+            allow_headers = request_headers if self.allow_all_headers else self.allow_headers
+            if allow_headers:
+                headers.append(("Access-Control-Allow-Headers", allow_headers))
+
+        headers += [
+            ("Vary", "Origin"),
+            ("Content-Type", "text/plain; charset=utf-8"),
+            ("Content-Length", str(len(body))),
+        ]
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text
+from sqlalchemy import Column, Integer, BigInteger, Float, String, Boolean, DateTime, Text, LargeBinary, Index, text
 from sqlalchemy.sql import func
 from datetime import datetime, timedelta
 from app.database import Base
@@ -11,17 +11,34 @@ def generate_uuid():
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Частичные индексы для очистки просроченных токенов: в них только
+        # строки с выданным токеном, поэтому они остаются маленькими
+        Index(
+            "ix_users_verification_token_expires", "verification_token_expires",
+            postgresql_where=text("verification_token IS NOT NULL"),
+            sqlite_where=text("verification_token IS NOT NULL")
+        ),
+        Index(
+            "ix_users_reset_token_expires", "reset_token_expires",
+            postgresql_where=text("reset_token IS NOT NULL"),
+            sqlite_where=text("reset_token IS NOT NULL")
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     public_id = Column(String(36), unique=True, index=True, default=generate_uuid)
     email = Column(String(255), unique=True, index=True, nullable=False)
-    username = Column(String(100), nullable=False)
+    username = Column(String(100), unique=True, index=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
     is_active = Column(Boolean, default=True)
     is_verified = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    # Access токены, выданные раньше (iat), отклоняются: logout, смена пароля
+    tokens_valid_after = Column(DateTime)
+
     # Дополнительные поля для профиля
     full_name = Column(String(200))
     avatar_url = Column(String(500))
@@ -40,7 +57,7 @@ class EmailVerification(Base):
     email = Column(String(255), nullable=False, index=True)
     token = Column(String(100), unique=True, index=True, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    expires_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
     is_used = Column(Boolean, default=False)
 
     @classmethod
@@ -54,15 +71,23 @@ class RefreshToken(Base):
     __tablename__ = "refresh_tokens"
 
     id = Column(Integer, primary_key=True, index=True)
-    token = Column(String(500), unique=True, index=True, nullable=False)
-    user_id = Column(Integer, nullable=False)
-    expires_at = Column(DateTime(timezone=True), nullable=False)
+    # Храним только sha256 токена, а не сам JWT
+    token_hash = Column(String(64), unique=True, index=True, nullable=False)
+    user_id = Column(Integer, nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     is_revoked = Column(Boolean, default=False)
+    revoked_at = Column(DateTime, index=True)
 
 
 class VideoFile(Base):
     __tablename__ = "video_files"
+    __table_args__ = (
+        # Keyset пагинация каталога по (created_at, id)
+        Index("ix_video_files_created_at_id", "created_at", "id"),
+        # Фильтр каталога по разрешению
+        Index("ix_video_files_height_width", "height", "width"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -70,6 +95,69 @@ class VideoFile(Base):
 
     description = Column(Text)
 
-    object_name = Column(String(255), unique=True, index=True)
+    # Одинаковые файлы ссылаются на один объект MinIO (VideoBlob)
+    object_name = Column(String(255), index=True)
+
+    content_type = Column(String(100))
+    size = Column(BigInteger)
+    etag = Column(String(100))
+    content_sha256 = Column(String(64), index=True)
+    # users.id загрузившего; удалять видео и менять эталон жеста может только он.
+    # У записей, загруженных до появления колонки, владельца нет
+    uploaded_by = Column(Integer, index=True)
+
+    # Метаданные из заголовков контейнера (VideoProber): pending -> ok | failed
+    probe_status = Column(String(16), nullable=False, default="pending", server_default="pending", index=True)
+    container = Column(String(16))
+    duration = Column(Float, index=True)  # секунды
+    width = Column(Integer)
+    height = Column(Integer)
+    frame_rate = Column(Float)
+    video_codec = Column(String(32))
+    audio_codec = Column(String(32))
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class VideoBlob(Base):
+    """Объект MinIO с содержимым видео; refcount - сколько VideoFile на него ссылается"""
+    __tablename__ = "video_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    object_name = Column(String(255), unique=True, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    etag = Column(String(100))
+    content_type = Column(String(100))
+    refcount = Column(Integer, nullable=False, default=1)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+class GestureReference(Base):
+    """Эталонная последовательность точек кисти для видео каталога (индекс жестов)"""
+    __tablename__ = "gesture_references"
+
+    # Новый id при каждой замене: индекс дописывает эталоны по возрастанию id
+    id = Column(Integer, primary_key=True, index=True)
+    video_id = Column(Integer, nullable=False, unique=True, index=True)
+    frames = Column(Integer, nullable=False)
+    # float32 [frames, points, coords], как прислал клиент
+    features = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    to_email = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=False)
+    body_html = Column(Text, nullable=False)
+
+    # pending -> sending -> sent | failed, при неудаче с повтором - снова pending
+    status = Column(String(20), nullable=False, default="pending", index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    last_error = Column(Text)
+
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = Column(DateTime)
@@ -0,0 +1,54 @@
+"""
+Разбор заголовков уже загруженных видео (длительность, разрешение, кодеки):
+
+    python -m app.probe_videos
+    python -m app.probe_videos --retry-failed --concurrency 16
+
+Обрабатываются записи в статусе pending (после миграции 0002 - все
+существующие), с --retry-failed - еще и failed. Повторный запуск
+продолжает с того, что осталось.
+"""
+import argparse
+import asyncio
+import logging
+import sys
+
+from app.config import settings
+from app.database import async_engine
+from app.services.storage import init_storage, close_storage
+from app.services.video_probe import VideoProber
+
+
+async def run(args) -> int:
+    storage = init_storage()
+    prober = VideoProber(
+        workers=args.workers,
+        concurrency=args.concurrency,
+        head_size=settings.video_probe_head_size,
+        tail_size=settings.video_probe_tail_size
+    )
+    try:
+        totals = await prober.backfill(storage, batch_size=args.batch_size, retry_failed=args.retry_failed)
+    finally:
+        await prober.stop()
+        close_storage()
+        await async_engine.dispose()
+
+    print(f"разобрано: {totals['ok']}, не поддерживается/повреждено: {totals['failed']}, "
+          f"ошибок (остались pending): {totals['error']}, прочитано {prober.bytes_read / 1024 / 1024:.1f} МБ")
+    return 1 if totals["error"] else 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=settings.video_probe_concurrency,
+                        help="видео одновременно")
+    parser.add_argument("--workers", type=int, default=settings.video_probe_workers, help="процессов разбора")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--retry-failed", action="store_true", help="повторить и для статуса failed")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    sys.exit(asyncio.run(run(parse_args())))
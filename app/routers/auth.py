@@ -1,14 +1,20 @@
 import uuid
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta, datetime
 
 from app.database import get_async_db
+from app.dependencies import get_language, get_current_user
 from app import crud, auth, email_utils, models
 from app.config import settings
+from app.services.hashing import hasher
+from app.services.rate_limit import rate_limiter
+from app.services.refresh_tokens import revocation_list
+from app.services.serialization import fast_response, token_serializer, user_serializer
+from app.services.user_cache import user_cache
 from app.schemas import (
     UserCreate, UserResponse, Token,
     EmailVerificationRequest, PasswordResetRequest,
@@ -20,33 +26,42 @@ router = APIRouter(prefix="/auth", tags=["authentication"])
 
 @router.post("/register", response_model=UserResponse)
 async def register(
+        request: Request,
         user_data: UserCreate,
-        db: AsyncSession = Depends(get_async_db)
+        db: AsyncSession = Depends(get_async_db),
+        lang: str = Depends(get_language)
 ):
     """Регистрация нового пользователя"""
+    await rate_limiter.check("register", request, user_data.email)
+
+    # Пользователь, верификация и письмо в outbox - одна транзакция,
+    # единственный commit делает постановка письма в очередь
     try:
         user = await crud.create_user(db, user_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        # Создаем верификацию email
-        verification = await crud.create_email_verification(db, user.email)
+    # Создаем верификацию email
+    verification = await crud.add_email_verification(db, user.email)
 
-        # Отправляем email для подтверждения
-        verification_url = f"{settings.frontend_url}/verify-email/{verification.token}"
-        email_utils.send_verification_email(user.email, verification_url)
+    # Отправляем email для подтверждения
+    verification_url = f"{settings.frontend_url}/verify-email/{verification.token}"
+    await email_utils.send_verification_email(db, user.email, verification_url, lang)
 
-        return user
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    return fast_response(user_serializer, user)
 
 
 @router.post("/login", response_model=Token)
 async def login(
+        request: Request,
         form_data: OAuth2PasswordRequestForm = Depends(),
         db: AsyncSession = Depends(get_async_db)
 ):
     """Аутентификация пользователя"""
+    await rate_limiter.check("login", request, form_data.username)
+
     user = await crud.get_user_by_email(db, form_data.username)
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+    if not user or not await hasher.verify(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -64,12 +79,14 @@ async def login(
     refresh_token = auth.create_refresh_token(
         data={"sub": user.public_id}
     )
+    await crud.create_refresh_token(db, user.id, auth.hash_token(refresh_token))
+    await db.commit()
 
-    return Token(
+    return fast_response(token_serializer, Token(
         access_token=access_token,
         refresh_token=refresh_token,
         token_type="bearer"
-    )
+    ))
 
 
 @router.post("/verify-email/{token}")
@@ -87,9 +104,13 @@ async def verify_email(
 @router.post("/resend-verification")
 async def resend_verification(
         request: EmailVerificationRequest,
-        db: AsyncSession = Depends(get_async_db)
+        http_request: Request,
+        db: AsyncSession = Depends(get_async_db),
+        lang: str = Depends(get_language)
 ):
     """Повторная отправка email для подтверждения"""
+    await rate_limiter.check("resend_verification", http_request, request.email)
+
     user = await crud.get_user_by_email(db, request.email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -102,7 +123,7 @@ async def resend_verification(
 
     # Отправляем email
     verification_url = f"{settings.frontend_url}/verify-email/{verification.token}"
-    email_utils.send_verification_email(user.email, verification_url)
+    await email_utils.send_verification_email(db, user.email, verification_url, lang)
 
     return {"message": "Verification email sent"}
 
@@ -110,9 +131,13 @@ async def resend_verification(
 @router.post("/forgot-password")
 async def forgot_password(
         request: PasswordResetRequest,
-        db: AsyncSession = Depends(get_async_db)
+        http_request: Request,
+        db: AsyncSession = Depends(get_async_db),
+        lang: str = Depends(get_language)
 ):
     """Запрос на сброс пароля"""
+    await rate_limiter.check("forgot_password", http_request, request.email)
+
     user = await crud.get_user_by_email(db, request.email)
     if user:
         # Генерируем токен для сброса пароля
@@ -125,7 +150,7 @@ async def forgot_password(
 
         # Отправляем email
         reset_url = f"{settings.frontend_url}/reset-password/{reset_token}"
-        email_utils.send_password_reset_email(user.email, reset_url)
+        await email_utils.send_password_reset_email(db, user.email, reset_url, lang)
 
     return {"message": "If email exists, reset instructions sent"}
 
@@ -151,24 +176,71 @@ async def reset_password(
     return {"message": "Password updated successfully"}
 
 
-@router.post("/refresh")
+@router.post("/refresh", response_model=Token)
 async def refresh_token(
         refresh_token: str,
         db: AsyncSession = Depends(get_async_db)
 ):
-    """Обновление access token"""
+    """Обновление токенов: старый refresh токен отзывается, выдается новая пара"""
     token_data = auth.verify_refresh_token(refresh_token)
     if not token_data:
         raise HTTPException(status_code=401, detail="Invalid refresh token")
 
-    user = await crud.get_user_by_public_id(db, token_data.public_id)
-    if not user:
+    token_hash = auth.hash_token(refresh_token)
+    user_id = None
+    if not revocation_list.is_revoked(token_hash):
+        user_id = await crud.consume_refresh_token(db, token_hash)
+    if user_id is None:
+        # Повторное использование отозванного токена - возможна кража,
+        # поэтому отзываем все сессии владельца. Токен мог отозвать другой
+        # воркер, о чем список отзыва этого воркера еще не знает, поэтому
+        # решение принимается по is_revoked в БД
+        owner_id = await crud.get_revoked_refresh_token_owner(db, token_hash)
+        if owner_id is not None:
+            public_id = await crud.revoke_user_sessions(db, owner_id)
+            await db.commit()
+            await user_cache.invalidate(public_id)
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+
+    user = await user_cache.get(token_data.public_id)
+    if user is None:
+        user = await crud.get_user_by_public_id(db, token_data.public_id)
+    if not user or user.id != user_id:
         raise HTTPException(status_code=404, detail="User not found")
 
-    # Создаем новый access token
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+
+    # Создаем новую пару токенов
     access_token = auth.create_access_token(
         data={"sub": user.public_id},
         expires_delta=timedelta(minutes=settings.access_token_expire_minutes)
     )
+    new_refresh_token = auth.create_refresh_token(
+        data={"sub": user.public_id}
+    )
+    await crud.create_refresh_token(db, user.id, auth.hash_token(new_refresh_token))
+    await db.commit()
 
-    return {"access_token": access_token, "token_type": "bearer"}
+    revocation_list.add([(token_hash, token_data.expires_at)])
+
+    return fast_response(token_serializer, Token(
+        access_token=access_token,
+        refresh_token=new_refresh_token,
+        token_type="bearer"
+    ))
+
+
+@router.post("/logout")
+async def logout(
+        current_user: models.User = Depends(get_current_user),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Выход на всех устройствах: отзыв всех refresh токенов и уже выданных
+    access токенов пользователя
+    """
+    await crud.revoke_user_sessions(db, current_user.id)
+    await db.commit()
+    await user_cache.invalidate(current_user.public_id)
+    return {"message": "Logged out"}
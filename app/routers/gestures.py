@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import get_async_db
+from app.dependencies import get_current_active_user
+from app import crud, models, schemas
+from app.services.gesture_index import gesture_index
+from app.services.recognition_model import landmarks_array
+
+router = APIRouter(prefix="/gestures", tags=["gestures"])
+
+
+@router.post("/search", response_model=schemas.GestureSearchResponse)
+async def search_gestures(
+        request: schemas.GestureSearchRequest,
+        current_user: models.User = Depends(get_current_active_user),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Режим практики: эталонные жесты каталога, больше всего похожие на жест
+    ученика. Сначала отбор по косинусной близости по всему индексу, затем
+    (rerank) лучшие кандидаты упорядочиваются по расстоянию DTW.
+    """
+    if not gesture_index.enabled:
+        raise HTTPException(status_code=503, detail="Gesture search is disabled")
+    if request.k > settings.gesture_search_max_k:
+        raise HTTPException(status_code=422, detail=f"k must be at most {settings.gesture_search_max_k}")
+    try:
+        array = landmarks_array(
+            request.landmarks, settings.recognition_points, settings.recognition_coords,
+            settings.recognition_max_frames
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    # Удаленные и замененные эталоны индекс отсеивает сам (маска live); видео
+    # могли удалить уже после последнего sync - такие пропускаются ниже
+    matches = await gesture_index.search_async(array, request.k, request.rerank)
+    videos = await crud.get_gesture_reference_videos(db, [reference_id for reference_id, _, _ in matches])
+
+    results = []
+    for reference_id, similarity, distance in matches:
+        video = videos.get(reference_id)
+        if video is None:
+            continue
+        results.append({
+            "video_id": video.id,
+            "filename": video.filename,
+            "description": video.description,
+            "similarity": similarity,
+            "distance": distance,
+        })
+        if len(results) == request.k:
+            break
+    return {"matches": results}
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Response
+
+from app.database import pool_stats
+from app.services.email_dispatcher import dispatcher
+from app.services.hashing import hasher
+from app.services.rate_limit import rate_limiter
+from app.services.recognition import recognizer
+from app.services.metrics import Gauge, multiprocess_metrics, registry
+
+router = APIRouter(tags=["metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Значения, которые сервисы уже считают сами - читаются только при сборе
+registry.register(Gauge(
+    "db_pool_checked_out", "Database connections currently checked out",
+    lambda: pool_stats().get("checked_out", 0)
+))
+registry.register(Gauge(
+    "db_pool_overflow", "Database connections opened above pool_size",
+    lambda: pool_stats().get("overflow", 0)
+))
+registry.register(Gauge(
+    "password_hashing_queue_depth", "Password hashing operations waiting for a worker",
+    lambda: hasher.waiting
+))
+registry.register(Gauge(
+    "recognition_queue_depth", "Landmark sequences waiting for a recognition batch",
+    lambda: recognizer.queue_depth
+))
+registry.register(Gauge(
+    "rate_limit_keys", "Rate limit buckets held by the workers (memory backend)",
+    lambda: max(rate_limiter.backend.size(), 0)
+))
+registry.register(Gauge(
+    "email_outbox_queue_depth", "Pending emails in the outbox",
+    lambda: dispatcher.queue_depth, multiprocess_mode="max"
+))
+registry.register(Gauge(
+    "email_outbox_lag_seconds", "Age of the oldest pending email",
+    lambda: dispatcher.queue_lag, multiprocess_mode="max"
+))
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики в текстовом формате Prometheus; под python -m app.serve - сумма по всем воркерам"""
+    if multiprocess_metrics is not None:
+        return Response(multiprocess_metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+    return Response(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status
+
+from app.config import settings
+from app.dependencies import WS_AUTH_SUBPROTOCOL, get_current_active_user, get_websocket_user
+from app import models, schemas
+from app.services.metrics import recognition_streams_active
+from app.services.recognition import RecognitionUnavailableError, recognizer
+from app.services.recognition_stream import RecognitionStream
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["recognition"])
+
+
+@router.post("/recognize", response_model=schemas.RecognitionResponse)
+async def recognize(
+        request: schemas.RecognitionRequest,
+        current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    Распознавание жеста по последовательности точек кисти (landmarks) или
+    по пачке последовательностей (batch). Последовательности разных
+    запросов объединяются в общие пачки для модели; в ответе - лучшие
+    варианты для каждой последовательности в порядке запроса.
+    """
+    sequences = request.sequences
+    if len(sequences) > settings.recognition_max_sequences:
+        raise HTTPException(
+            status_code=422, detail=f"At most {settings.recognition_max_sequences} sequences per request"
+        )
+    try:
+        arrays = [recognizer.to_array(sequence, settings.recognition_max_frames) for sequence in sequences]
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    try:
+        predictions = await recognizer.recognize(arrays)
+    except RecognitionUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return {
+        "results": [
+            {
+                "label": top[0][0],
+                "score": top[0][1],
+                "top": [{"label": label, "score": score} for label, score in top]
+            }
+            for top in predictions
+        ]
+    }
+
+
+@router.websocket("/recognize/stream")
+async def recognize_stream(websocket: WebSocket):
+    """
+    Распознавание в реальном времени: токен проверяется один раз при
+    подключении (подпротоколы "bearer", "<токен>" или Authorization: Bearer), дальше клиент шлет
+    кадры - бинарные сообщения float32 [frames, points, coords] или JSON
+    {"frames": [...]}. Сервер распознает скользящее окно каждые
+    recognition_stream_stride кадров и присылает {"type": "result", ...}
+    с задержкой и числом отброшенных кадров. Ошибка в сообщении -
+    {"type": "error"}, соединение при этом не закрывается.
+    """
+    user = await get_websocket_user(websocket)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    if not recognizer.running or recognition_streams_active.value >= settings.recognition_stream_max_connections:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+
+    subprotocol = WS_AUTH_SUBPROTOCOL if WS_AUTH_SUBPROTOCOL in (websocket.scope.get("subprotocols") or []) else None
+    await websocket.accept(subprotocol=subprotocol)
+    stream = RecognitionStream(
+        recognizer,
+        window=settings.recognition_stream_window,
+        stride=settings.recognition_stream_stride,
+        min_frames=settings.recognition_stream_min_frames,
+        max_message_frames=settings.recognition_stream_max_message_frames
+    )
+    recognition_streams_active.inc()
+    task = asyncio.create_task(stream.recognize_loop(websocket.send_json))
+    try:
+        while not task.done():
+            try:
+                message = await asyncio.wait_for(websocket.receive(), settings.recognition_stream_idle_timeout)
+            except asyncio.TimeoutError:
+                await websocket.close(code=status.WS_1000_NORMAL_CLOSURE, reason="Idle timeout")
+                break
+            if message["type"] == "websocket.disconnect":
+                break
+            try:
+                frames = stream.parse(message)
+            except ValueError as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+                continue
+            stream.add(frames)
+
+        if task.done() and not task.cancelled() and isinstance(task.exception(), RecognitionUnavailableError):
+            # Сервер останавливается - клиент переподключится к другому воркеру
+            await websocket.close(code=status.WS_1012_SERVICE_RESTART)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        recognition_streams_active.dec()
+        logger.info(f"Поток распознавания пользователя {user.id} закрыт: {stream.stats()}")
@@ -1,27 +1,42 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_async_db
 from app.dependencies import get_current_active_user
-from app import models, schemas
+from app import crud, schemas
+from app.services.serialization import fast_response, user_serializer
+from app.services.user_cache import AnyUser
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
 @router.get("/me", response_model=schemas.UserResponse)
 async def read_users_me(
-        current_user: models.User = Depends(get_current_active_user)
+        current_user: AnyUser = Depends(get_current_active_user)
 ):
     """Получение информации о текущем пользователе"""
-    return current_user
+    return fast_response(user_serializer, current_user)
 
 
-@router.put("/me")
+@router.put("/me", response_model=schemas.UserResponse)
 async def update_user_profile(
         update_data: schemas.UserUpdate,
-        current_user: models.User = Depends(get_current_active_user),
+        current_user: AnyUser = Depends(get_current_active_user),
         db: AsyncSession = Depends(get_async_db)
 ):
-    """Обновление профиля пользователя"""
-    # Здесь логика обновления профиля
-    pass
+    """Обновление профиля пользователя (строка загружается из БД, current_user может быть снимком из кэша)"""
+    try:
+        user = await crud.update_user_profile(db, current_user.id, update_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return fast_response(user_serializer, user)
+
+
+@router.delete("/me")
+async def deactivate_user(
+        current_user: AnyUser = Depends(get_current_active_user),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """Деактивация учетной записи текущего пользователя"""
+    await crud.deactivate_user(db, current_user.id)
+    return {"message": "User deactivated"}
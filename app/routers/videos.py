@@ -0,0 +1,413 @@
+import base64
+import hashlib
+import logging
+import os
+import re
+import uuid
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import get_async_db
+from app.dependencies import get_current_active_user
+from app import crud, models, schemas
+from app.services.gesture_index import gesture_index
+from app.services.metrics import video_uploads
+from app.services.recognition_model import landmarks_array
+from app.services.serialization import fast_response, video_catalog_serializer, video_file_serializer
+from app.services.storage import StorageService, get_storage
+from app.services.video_probe import video_prober
+from app.services.video_upload import (
+    ContentHashMismatchError, DuplicateContentError, EmptyUploadError, StreamingUploader, UploadTooLargeError
+)
+from app.services.video_delivery import (
+    RangeNotSatisfiableError, etag_matches, parse_range, presigned_urls
+)
+
+router = APIRouter(prefix="/videos", tags=["videos"])
+
+logger = logging.getLogger(__name__)
+
+SHA256_PATTERN = r"^[0-9a-f]{64}$"
+
+
+def get_uploader(storage: StorageService = Depends(get_storage)) -> StreamingUploader:
+    return StreamingUploader(
+        storage,
+        part_size=settings.video_upload_part_size,
+        concurrency=settings.video_upload_concurrency,
+        max_memory=settings.video_upload_max_memory,
+        max_size=settings.video_max_size
+    )
+
+
+def encode_cursor(created_at: datetime, video_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{video_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, video_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(video_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def get_catalog_filters(
+        min_duration: Optional[float] = Query(None, ge=0),
+        max_duration: Optional[float] = Query(None, ge=0),
+        min_width: Optional[int] = Query(None, ge=1),
+        min_height: Optional[int] = Query(None, ge=1),
+        max_height: Optional[int] = Query(None, ge=1)
+) -> schemas.VideoCatalogFilters:
+    return schemas.VideoCatalogFilters(
+        min_duration=min_duration,
+        max_duration=max_duration,
+        min_width=min_width,
+        min_height=min_height,
+        max_height=max_height
+    )
+
+
+@router.get("", response_model=schemas.VideoCatalogPage)
+async def list_videos(
+        request: Request,
+        limit: int = Query(50, ge=1, le=200),
+        cursor: Optional[str] = Query(None),
+        filters: schemas.VideoCatalogFilters = Depends(get_catalog_filters),
+        current_user: models.User = Depends(get_current_active_user),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Каталог видео, новые первыми. Пагинация курсором: next_cursor из ответа
+    передается в следующий запрос. Фильтры min/max_duration (секунды),
+    min_width, min_height/max_height - по метаданным из заголовков видео.
+    Ответ снабжен слабым ETag по отметке изменений каталога - при совпадении
+    If-None-Match отдается 304 без выборки страницы.
+    """
+    after = decode_cursor(cursor) if cursor else None
+
+    count, max_id, pending = await crud.get_video_catalog_version(db)
+    page_key = hashlib.sha1(
+        f"{limit}:{cursor}:{filters.model_dump_json(exclude_none=True)}".encode()
+    ).hexdigest()[:12]
+    etag = f'W/"{count}-{max_id}-{pending}-{page_key}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    rows = await crud.list_videos(db, limit, after, filters)
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    if settings.fast_json_responses:
+        content = video_catalog_serializer.dump_page(rows, next_cursor)
+    else:
+        page = schemas.VideoCatalogPage(
+            items=[schemas.VideoCatalogItem.model_validate(row) for row in rows],
+            next_cursor=next_cursor
+        )
+        content = page.model_dump_json()
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+@router.get("/blobs/{sha256}", response_model=schemas.VideoBlobResponse)
+async def check_video_blob(
+        sha256: str = Path(..., pattern=SHA256_PATTERN),
+        current_user: models.User = Depends(get_current_active_user),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Проверка перед загрузкой: есть ли уже файл с таким SHA-256 (hex, строчными).
+    Если есть, загрузку с заголовком X-Content-SHA256 можно отправить без тела -
+    запись создается без передачи байтов.
+    """
+    blob = await crud.get_video_blob(db, sha256)
+    if blob is None:
+        raise HTTPException(status_code=404, detail="Content not found")
+    return blob
+
+
+@router.post("/upload", response_model=schemas.VideoFileResponse, status_code=201)
+async def upload_video(
+        request: Request,
+        filename: str = Query(..., max_length=255),
+        description: Optional[str] = Query(None),
+        current_user: models.User = Depends(get_current_active_user),
+        db: AsyncSession = Depends(get_async_db),
+        storage: StorageService = Depends(get_storage),
+        uploader: StreamingUploader = Depends(get_uploader)
+):
+    """
+    Загрузка видео. Тело запроса - сами байты файла (не multipart/form-data),
+    оно потоком уходит в MinIO, не сохраняясь целиком ни в памяти, ни на диске.
+
+    Одинаковое содержимое хранится один раз: по ходу загрузки считается
+    SHA-256, и если такой файл уже есть, загрузка в MinIO отменяется, а
+    новая запись ссылается на существующий объект. С заголовком
+    X-Content-SHA256 уже сохраненное содержимое не читается вовсе, новое
+    загружается и сверяется с ним (несовпадение хэша - 400).
+    """
+    content_type = request.headers.get("content-type") or "application/octet-stream"
+
+    expected_sha256 = request.headers.get("x-content-sha256")
+    if expected_sha256 is not None:
+        expected_sha256 = expected_sha256.strip().lower()
+        if not re.match(SHA256_PATTERN, expected_sha256):
+            raise HTTPException(status_code=400, detail="Invalid X-Content-SHA256 header")
+        video = await crud.add_video_for_blob(db, expected_sha256, filename, description, content_type, current_user.id)
+        if video is not None:
+            video_uploads.inc(labels=("deduplicated_header",))
+            return finish_upload(storage, video)
+
+    # Имя объекта всегда новое: удаление последней ссылки убирает объект
+    # уже после коммита, и повторная загрузка того же содержимого не должна
+    # попасть под то же имя
+    extension = os.path.splitext(filename)[1].lower()
+    object_name = f"{uuid.uuid4()}{extension}"
+
+    async def is_stored(sha256: str) -> bool:
+        return await crud.get_video_blob(db, sha256) is not None
+
+    try:
+        size, etag, sha256 = await uploader.upload(
+            request.stream(), object_name, content_type, expected_sha256, is_stored
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except (EmptyUploadError, ContentHashMismatchError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except DuplicateContentError as e:
+        video = await crud.add_video_for_blob(db, e.sha256, filename, description, content_type, current_user.id)
+        if video is None:
+            # Объект удалили между проверкой и записью - загруженные части уже отброшены
+            raise HTTPException(status_code=409, detail="Stored content was deleted during upload, retry")
+        video_uploads.inc(labels=("deduplicated",))
+        return finish_upload(storage, video)
+
+    # Запись в БД появляется только после того, как объект сохранен в MinIO
+    video = models.VideoFile(
+        filename=filename,
+        description=description,
+        object_name=object_name,
+        content_type=content_type,
+        size=size,
+        etag=etag,
+        content_sha256=sha256,
+        uploaded_by=current_user.id
+    )
+    blob = models.VideoBlob(
+        sha256=sha256,
+        object_name=object_name,
+        size=size,
+        etag=etag,
+        content_type=content_type,
+        refcount=1
+    )
+    try:
+        created = await crud.add_video_with_blob(db, video, blob)
+    except Exception:
+        await db.rollback()
+        await storage.remove_object(object_name)
+        raise
+
+    if not created:
+        # Параллельный запрос успел сохранить то же содержимое - ссылаемся на его объект
+        video = await crud.add_video_for_blob(db, sha256, filename, description, content_type, current_user.id)
+        stored_object = video.object_name if video is not None else None
+        if stored_object != object_name:
+            await storage.remove_object(object_name)
+        if video is None:
+            raise HTTPException(status_code=409, detail="Stored content was deleted during upload, retry")
+        video_uploads.inc(labels=("deduplicated",))
+        return finish_upload(storage, video)
+
+    video_uploads.inc(labels=("stored",))
+    return finish_upload(storage, video)
+
+
+def finish_upload(storage: StorageService, video: models.VideoFile):
+    # Длительность и разрешение появятся после разбора заголовков в фоне
+    # (у копии уже разобранного файла они скопированы сразу)
+    if video.probe_status == "pending":
+        video_prober.submit(storage, video)
+    return fast_response(video_file_serializer, video, status_code=201)
+
+
+async def get_video_or_404(
+        db: AsyncSession, storage: StorageService, video_id: int
+) -> models.VideoFile:
+    video = await db.get(models.VideoFile, video_id)
+    if video is None:
+        raise HTTPException(status_code=404, detail="Video not found")
+
+    # Для старых записей размер и ETag берем из MinIO один раз
+    if video.size is None or video.etag is None:
+        stat = await storage.stat_object(video.object_name)
+        video.size = stat.size
+        video.etag = stat.etag
+        video.content_type = video.content_type or stat.content_type
+        await db.commit()
+    return video
+
+
+@router.get("/{video_id}/stream")
+async def stream_video(
+        video_id: int,
+        request: Request,
+        current_user: models.User = Depends(get_current_active_user),
+        db: AsyncSession = Depends(get_async_db),
+        storage: StorageService = Depends(get_storage)
+):
+    """
+    Отдача видео с поддержкой Range/If-Range/If-None-Match.
+    На запрос диапазона отвечает 206 и проксирует из MinIO только нужные байты.
+    """
+    video = await get_video_or_404(db, storage, video_id)
+    etag = f'"{video.etag}"'
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Cache-Control": "private, max-age=3600",
+    }
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # If-Range: диапазон отдаем, только если файл не изменился
+    if range_header and (if_range is None or if_range == etag):
+        try:
+            byte_range = parse_range(range_header, video.size)
+        except RangeNotSatisfiableError:
+            return Response(
+                status_code=416,
+                headers={**headers, "Content-Range": f"bytes */{video.size}"}
+            )
+
+    if byte_range is None:
+        headers["Content-Length"] = str(video.size)
+        return StreamingResponse(
+            storage.iter_object(video.object_name, 0, 0, settings.video_stream_chunk_size),
+            media_type=video.content_type,
+            headers=headers
+        )
+
+    start, end = byte_range
+    length = end - start + 1
+    headers["Content-Range"] = f"bytes {start}-{end}/{video.size}"
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(
+        storage.iter_object(video.object_name, start, length, settings.video_stream_chunk_size),
+        status_code=206,
+        media_type=video.content_type,
+        headers=headers
+    )
+
+
+@router.get("/{video_id}/download")
+async def download_video(
+        video_id: int,
+        redirect: bool = Query(True),
+        current_user: models.User = Depends(get_current_active_user),
+        db: AsyncSession = Depends(get_async_db),
+        storage: StorageService = Depends(get_storage)
+):
+    """
+    Ссылка на видео напрямую в MinIO (presigned GET URL).
+    По умолчанию отвечает редиректом, с redirect=false - JSON со ссылкой.
+    Байты видео при этом через API не проходят, Range обрабатывает MinIO.
+    """
+    video = await get_video_or_404(db, storage, video_id)
+
+    url, expires_at = await presigned_urls.get(video.object_name, storage.presigned_get_object)
+
+    if redirect:
+        return RedirectResponse(url, status_code=307)
+    return {"url": url, "expires_at": int(expires_at)}
+
+
+async def get_owned_video(db: AsyncSession, video_id: int, user: models.User) -> models.VideoFile:
+    """Видео, которое может менять пользователь: 404 - нет видео, 403 - загрузил не он"""
+    video = await db.get(models.VideoFile, video_id)
+    if video is None:
+        raise HTTPException(status_code=404, detail="Video not found")
+    if video.uploaded_by is None or video.uploaded_by != user.id:
+        raise HTTPException(status_code=403, detail="Only the uploader can modify this video")
+    return video
+
+
+@router.delete("/{video_id}", status_code=204)
+async def delete_video(
+        video_id: int,
+        current_user: models.User = Depends(get_current_active_user),
+        db: AsyncSession = Depends(get_async_db),
+        storage: StorageService = Depends(get_storage)
+):
+    """
+    Удаление видео (только загрузившим его пользователем). Объект в MinIO
+    удаляется вместе с последней записью, которая на него ссылается, и после
+    коммита: если коммит не пройдет, записи по-прежнему указывают на целый
+    объект, а если не удастся удалить объект, остается лишь осиротевший
+    объект без записей.
+    """
+    video = await get_owned_video(db, video_id, current_user)
+
+    reference_ids = await crud.delete_gesture_references(db, video.id)
+    object_name = await crud.delete_video(db, video)
+    await db.commit()
+    if object_name is not None:
+        presigned_urls.invalidate(object_name)
+        try:
+            await storage.remove_object(object_name)
+        except Exception as e:
+            logger.error(f"Не удалось удалить объект {object_name} удаленного видео {video_id}: {e}")
+    try:
+        await gesture_index.retire_async(reference_ids)
+    except Exception as e:
+        # Поиск все равно не вернет удаленный эталон (его нет в БД), маску поправит sync при старте
+        logger.error(f"Не удалось исключить эталоны видео {video_id} из индекса жестов: {e!r}")
+    return Response(status_code=204)
+
+
+@router.put("/{video_id}/landmarks", response_model=schemas.GestureReferenceResponse)
+async def set_video_landmarks(
+        video_id: int,
+        request: schemas.GestureReferenceRequest,
+        current_user: models.User = Depends(get_current_active_user),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Эталонная последовательность точек кисти для видео (только загрузившим
+    его пользователем): с ней сравниваются жесты ученика в режиме практики.
+    Замена эталона добавляет его в индекс как новый, старый сразу исключается
+    из поиска и выпадет из файлов при пересборке.
+    """
+    await get_owned_video(db, video_id, current_user)
+    try:
+        array = landmarks_array(
+            request.landmarks, settings.recognition_points, settings.recognition_coords,
+            settings.recognition_max_frames
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    reference_id, replaced_ids = await crud.save_gesture_reference(db, video_id, array.tobytes(), len(array))
+    try:
+        await gesture_index.append_async([(reference_id, array)])
+        await gesture_index.retire_async([i for i in replaced_ids if i != reference_id])
+    except Exception as e:
+        # Эталон сохранен в БД, в индекс его допишет sync при старте
+        logger.error(f"Не удалось обновить индекс жестов для видео {video_id}: {e!r}")
+    return {"video_id": video_id, "reference_id": reference_id, "frames": len(array)}
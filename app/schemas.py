@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr, validator, Field, field_validator
-from typing import Optional
+from pydantic import BaseModel, EmailStr, validator, Field, field_validator, model_validator
+from typing import List, Optional
 from datetime import datetime
 import re
 
@@ -78,6 +78,8 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     user_id: Optional[int] = None
     public_id: Optional[str] = None
+    expires_at: Optional[datetime] = None
+    issued_at: Optional[float] = None
 
 
 class EmailVerificationRequest(BaseModel):
@@ -109,4 +111,129 @@ class UserUpdate(BaseModel):
         if v is not None and not re.match(r'^[a-zA-Z0-9_]+$', v):
             raise ValueError(
                 'Имя пользователя может содержать только буквы латиницы, цифры и подчеркивания')
-        return v
\ No newline at end of file
+        return v
+
+
+class VideoFileResponse(BaseModel):
+    id: int
+    filename: str
+    description: Optional[str] = None
+    object_name: str
+    content_type: Optional[str] = None
+    size: Optional[int] = None
+    content_sha256: Optional[str] = None
+    probe_status: Optional[str] = None
+    container: Optional[str] = None
+    duration: Optional[float] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    frame_rate: Optional[float] = None
+    video_codec: Optional[str] = None
+    audio_codec: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class VideoBlobResponse(BaseModel):
+    """Ответ проверки содержимого перед загрузкой"""
+    sha256: str
+    size: int
+    content_type: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class VideoCatalogItem(BaseModel):
+    id: int
+    filename: str
+    description: Optional[str] = None
+    content_type: Optional[str] = None
+    size: Optional[int] = None
+    duration: Optional[float] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    frame_rate: Optional[float] = None
+    video_codec: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class VideoCatalogFilters(BaseModel):
+    min_duration: Optional[float] = Field(None, ge=0)
+    max_duration: Optional[float] = Field(None, ge=0)
+    min_width: Optional[int] = Field(None, ge=1)
+    min_height: Optional[int] = Field(None, ge=1)
+    max_height: Optional[int] = Field(None, ge=1)
+
+
+class VideoCatalogPage(BaseModel):
+    items: List[VideoCatalogItem]
+    next_cursor: Optional[str] = None
+
+
+# Распознавание жестов: последовательность - кадры, кадр - точки кисти [x, y, z]
+LandmarkSequence = List[List[List[float]]]
+
+
+class RecognitionRequest(BaseModel):
+    """Одна последовательность (landmarks) или пачка (batch)"""
+    landmarks: Optional[LandmarkSequence] = None
+    batch: Optional[List[LandmarkSequence]] = None
+
+    @model_validator(mode='after')
+    def check_one_input(self):
+        if (self.landmarks is None) == (self.batch is None):
+            raise ValueError('Нужно передать ровно одно из полей: landmarks или batch')
+        return self
+
+    @property
+    def sequences(self) -> List[LandmarkSequence]:
+        return [self.landmarks] if self.landmarks is not None else self.batch
+
+
+class GesturePrediction(BaseModel):
+    label: str
+    score: float
+
+
+class RecognitionResult(BaseModel):
+    label: str
+    score: float
+    top: List[GesturePrediction]
+
+
+class RecognitionResponse(BaseModel):
+    results: List[RecognitionResult]
+
+
+class GestureReferenceRequest(BaseModel):
+    landmarks: LandmarkSequence
+
+
+class GestureReferenceResponse(BaseModel):
+    video_id: int
+    reference_id: int
+    frames: int
+
+
+class GestureSearchRequest(BaseModel):
+    landmarks: LandmarkSequence
+    k: int = Field(5, ge=1)
+    rerank: bool = True  # пересчитать лучших по косинусу с DTW
+
+
+class GestureMatch(BaseModel):
+    video_id: int
+    filename: str
+    description: Optional[str] = None
+    similarity: float  # косинусная близость эмбеддингов
+    distance: Optional[float] = None  # DTW, только при rerank
+
+
+class GestureSearchResponse(BaseModel):
+    matches: List[GestureMatch]
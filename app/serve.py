@@ -0,0 +1,235 @@
+"""
+Боевой запуск API: python -m app.serve
+
+Несколько процессов uvicorn на одном сокете (слушает супервизор, воркеры
+получают готовый сокет), uvloop + httptools, настройки keep-alive и backlog.
+
+- SIGTERM / SIGINT: воркеры перестают принимать соединения, дожидаются
+  текущих запросов (загрузки видео) до serve_graceful_timeout, затем
+  lifespan останавливает диспетчер писем (текущая пачка отправляется).
+- serve_max_requests: воркер завершается после N запросов (с разбросом
+  serve_max_requests_jitter, чтобы не перезапускались одновременно),
+  супервизор сразу поднимает новый.
+- /metrics: реестр метрик у каждого воркера свой, поэтому при нескольких
+  воркерах они пишут снимки в общий каталог (metrics_multiprocess_dir,
+  по умолчанию временный), и ответ любого воркера - сумма по всем
+  (MultiProcessMetrics). Счетчики завершившихся воркеров переносит
+  супервизор, так что перезапуск по max_requests их не сбрасывает.
+
+Для разработки с автоперезагрузкой: uvicorn app.main:app --reload
+"""
+import functools
+import logging
+import os
+import random
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+from multiprocessing.context import SpawnProcess
+from socket import socket
+from typing import List, Optional
+
+import uvicorn
+from uvicorn._subprocess import get_subprocess
+
+from app.config import settings
+from app.services.metrics import MultiProcessMetrics
+
+logger = logging.getLogger("uvicorn.error")
+
+# Код выхода воркера, у которого не прошел startup (как в uvicorn.main)
+STARTUP_FAILURE = 3
+# Сверх serve_graceful_timeout - на shutdown lifespan (письма, пулы, БД)
+SHUTDOWN_MARGIN = 15.0
+CHECK_INTERVAL = 0.5
+
+
+def default_workers() -> int:
+    """Число доступных процессу CPU (учитывает ограничение affinity в контейнере)"""
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def available(module: str, preferred: str, fallback: str) -> str:
+    """uvloop/httptools ставятся с uvicorn[standard]; без них - стандартная реализация"""
+    try:
+        __import__(module)
+        return preferred
+    except ImportError:
+        logger.warning(f"{module} не установлен, используется {fallback}")
+        return fallback
+
+
+def build_config() -> uvicorn.Config:
+    loop = settings.serve_loop
+    if loop == "uvloop":
+        loop = available("uvloop", "uvloop", "asyncio")
+    http = settings.serve_http
+    if http == "httptools":
+        http = available("httptools", "httptools", "h11")
+
+    return uvicorn.Config(
+        "app.main:app",
+        host=settings.serve_host,
+        port=settings.serve_port,
+        loop=loop,
+        http=http,
+        lifespan="on",
+        backlog=settings.serve_backlog,
+        timeout_keep_alive=settings.serve_keep_alive,
+        timeout_graceful_shutdown=settings.serve_graceful_timeout,
+        limit_concurrency=settings.serve_limit_concurrency,
+    )
+
+
+def run_worker(config: uvicorn.Config, sockets: List[socket]) -> None:
+    """Точка входа воркера (в дочернем процессе)"""
+    server = uvicorn.Server(config)
+    server.run(sockets=sockets)
+    if not server.started:
+        sys.exit(STARTUP_FAILURE)
+
+
+def warn_per_process_state(workers: int) -> None:
+    """In-memory состояние у каждого воркера свое - лимиты и инвалидация не общие"""
+    if workers < 2:
+        return
+    if settings.rate_limit_enabled and settings.rate_limit_backend == "memory":
+        logger.warning(
+            f"rate_limit_backend=memory: лимиты считаются в каждом из {workers} воркеров отдельно, "
+            "для общих лимитов нужен redis"
+        )
+    if settings.user_cache_enabled and settings.user_cache_backend == "memory":
+        logger.warning(
+            "user_cache_backend=memory: изменения пользователя (в том числе отзыв access токенов "
+            f"при logout) видны другим воркерам с задержкой до {settings.user_cache_ttl:.0f} с"
+        )
+
+
+class Supervisor:
+    """Держит workers процессов uvicorn и перезапускает завершившиеся"""
+
+    def __init__(
+            self,
+            config: uvicorn.Config,
+            workers: int,
+            max_requests: int = 0,
+            max_requests_jitter: int = 0,
+            graceful_timeout: float = 60
+    ):
+        self.config = config
+        self.workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.processes: List[SpawnProcess] = []
+        self.restarts = 0
+        self.should_exit = threading.Event()
+        self._socket: Optional[socket] = None
+        self.metrics_dir: Optional[str] = None
+        self._own_metrics_dir = False
+
+    def spawn(self) -> SpawnProcess:
+        if self.max_requests > 0:
+            self.config.limit_max_requests = self.max_requests + random.randint(0, self.max_requests_jitter)
+        target = functools.partial(run_worker, self.config)
+        process = get_subprocess(self.config, target=target, sockets=[self._socket])
+        process.start()
+        return process
+
+    def handle_exit(self, sig, frame) -> None:
+        self.should_exit.set()
+
+    def setup_metrics(self) -> None:
+        """Общий каталог снимков метрик: воркеры получают его через окружение"""
+        if not settings.metrics_enabled or self.workers < 2:
+            return
+        self.metrics_dir = settings.metrics_multiprocess_dir
+        if self.metrics_dir is None:
+            self.metrics_dir = tempfile.mkdtemp(prefix="metrics-")
+            self._own_metrics_dir = True
+        MultiProcessMetrics.reset(self.metrics_dir)
+        os.environ["METRICS_MULTIPROCESS_DIR"] = self.metrics_dir
+
+    def reap(self, process: SpawnProcess) -> None:
+        """Счетчики завершившегося воркера остаются в общих метриках"""
+        if self.metrics_dir is None:
+            return
+        try:
+            MultiProcessMetrics.mark_dead(self.metrics_dir, process.pid)
+        except Exception as e:
+            logger.warning(f"Не удалось перенести метрики воркера {process.pid}: {e!r}")
+
+    def run(self) -> int:
+        self.setup_metrics()
+        self._socket = self.config.bind_socket()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, self.handle_exit)
+
+        logger.info(
+            f"Запуск {self.workers} воркеров (loop={self.config.loop}, http={self.config.http}, "
+            f"max_requests={self.max_requests or 'off'}), pid {os.getpid()}"
+        )
+        self.processes = [self.spawn() for _ in range(self.workers)]
+
+        code = 0
+        while not self.should_exit.wait(CHECK_INTERVAL):
+            for i, process in enumerate(self.processes):
+                if process.is_alive():
+                    continue
+                process.join()
+                self.reap(process)
+                if process.exitcode == STARTUP_FAILURE:
+                    logger.error(f"Воркер {process.pid} не запустился, остановка")
+                    code = STARTUP_FAILURE
+                    self.should_exit.set()
+                    break
+                self.restarts += 1
+                logger.info(f"Воркер {process.pid} завершился (код {process.exitcode}), запуск нового")
+                self.processes[i] = self.spawn()
+
+        self.shutdown()
+        return code
+
+    def shutdown(self) -> None:
+        """SIGTERM воркерам и ожидание их штатной остановки; зависшие убиваются"""
+        logger.info("Остановка воркеров: ожидание текущих запросов")
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+
+        deadline = self.graceful_timeout + SHUTDOWN_MARGIN
+        for process in self.processes:
+            process.join(timeout=deadline)
+            if process.is_alive():
+                logger.warning(f"Воркер {process.pid} не остановился за {deadline:.0f} с, kill")
+                process.kill()
+                process.join()
+            self.reap(process)
+
+        self._socket.close()
+        if self._own_metrics_dir:
+            shutil.rmtree(self.metrics_dir, ignore_errors=True)
+        logger.info(f"Сервер остановлен, перезапусков воркеров: {self.restarts}")
+
+
+def main() -> None:
+    config = build_config()
+    workers = settings.serve_workers or default_workers()
+    warn_per_process_state(workers)
+    supervisor = Supervisor(
+        config,
+        workers=workers,
+        max_requests=settings.serve_max_requests,
+        max_requests_jitter=settings.serve_max_requests_jitter,
+        graceful_timeout=settings.serve_graceful_timeout
+    )
+    sys.exit(supervisor.run())
+
+
+if __name__ == "__main__":
+    main()
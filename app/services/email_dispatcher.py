@@ -0,0 +1,294 @@
+import asyncio
+import logging
+import smtplib
+import socket
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import List, Optional
+
+from sqlalchemy import select, func, update
+
+from app import models
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.services.metrics import smtp_send_duration
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPSession:
+    """
+    Долгоживущее SMTP соединение.
+
+    Подключение (STARTTLS + login) выполняется один раз и переиспользуется
+    для всех писем; при обрыве соединение открывается заново.
+    Не потокобезопасно - используется только из потока диспетчера.
+    """
+
+    def __init__(self):
+        self._smtp: Optional[smtplib.SMTP] = None
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(settings.smtp_host, settings.smtp_port, timeout=settings.smtp_timeout)
+        if settings.smtp_use_tls:
+            smtp.starttls()
+        if settings.smtp_user:
+            smtp.login(settings.smtp_user, settings.smtp_password)
+        return smtp
+
+    def send(self, msg: MIMEMultipart) -> None:
+        if self._smtp is None:
+            self._smtp = self._connect()
+        try:
+            self._smtp.send_message(msg)
+        except (smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout):
+            # Соединение протухло - переподключаемся и пробуем еще раз.
+            # Не OSError целиком: от него наследуются все SMTPException, и
+            # отказ сервера (SMTPResponseException, SMTPRecipientsRefused)
+            # привел бы к повторной отправке вместо ошибки письма
+            self.close()
+            self._smtp = self._connect()
+            self._smtp.send_message(msg)
+
+    def close(self) -> None:
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+
+def build_message(to_email: str, subject: str, body_html: str) -> MIMEMultipart:
+    msg = MIMEMultipart()
+    msg["From"] = settings.email_from
+    msg["To"] = to_email
+    msg["Subject"] = subject
+    msg.attach(MIMEText(body_html, "html"))
+    return msg
+
+
+class EmailDispatcher:
+    """
+    Фоновая отправка писем из таблицы email_outbox.
+
+    Обработчики запросов только кладут письмо в outbox, а диспетчер пачками
+    забирает готовые к отправке записи и отправляет их через одно постоянное
+    SMTP соединение. Неудачные отправки повторяются с экспоненциальной
+    задержкой.
+
+    Пачка берется короткой транзакцией: записи (FOR UPDATE SKIP LOCKED,
+    поэтому несколько воркеров не возьмут одно письмо) переводятся в статус
+    sending с next_attempt_at на claim_timeout вперед. Отправка идет вне
+    транзакции, результаты записываются второй короткой транзакцией. Если
+    воркер упал посреди пачки, ее письма снова берутся в отправку после
+    claim_timeout.
+    """
+
+    def __init__(
+            self,
+            batch_size: int,
+            poll_interval: float,
+            max_attempts: int,
+            backoff_base: float,
+            backoff_max: float,
+            claim_timeout: float
+    ):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.claim_timeout = claim_timeout
+
+        self._session = SMTPSession()
+        # Один поток: SMTP сессия не потокобезопасна
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+        # Счетчики
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.batches = 0
+        self.total_send_time = 0.0
+        self.queue_depth = 0
+        self.queue_lag = 0.0
+        self._recent_sends: deque = deque(maxlen=1000)
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="smtp")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает диспетчер, дожидаясь отправки текущей пачки"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        self._executor.submit(self._session.close).result()
+        self._executor.shutdown(wait=True)
+        self._executor = None
+
+    def notify(self) -> None:
+        """Будит диспетчер после постановки письма в очередь"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                processed = await self.drain_once()
+            except Exception as e:
+                logger.exception(f"Ошибка диспетчера email: {e}")
+                processed = 0
+
+            # Пачка была полной - скорее всего в очереди есть еще письма
+            if processed >= self.batch_size:
+                continue
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def _send_batch(self, messages: List[MIMEMultipart]) -> List[Optional[str]]:
+        """Отправляет пачку писем в потоке диспетчера, возвращает ошибки по каждому"""
+        errors = []
+        for msg in messages:
+            started_at = time.perf_counter()
+            outcome = "error"
+            try:
+                self._session.send(msg)
+                errors.append(None)
+                outcome = "sent"
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as e:
+                # Сервер отклонил конкретное письмо - сессия остается рабочей
+                errors.append(str(e) or e.__class__.__name__)
+                outcome = "rejected"
+            except Exception as e:
+                # Сервер недоступен - остальные письма пачки даже не пытаемся отправить
+                self._session.close()
+                error = str(e) or e.__class__.__name__
+                errors.extend([error] * (len(messages) - len(errors)))
+                break
+            finally:
+                send_time = time.perf_counter() - started_at
+                self.total_send_time += send_time
+                smtp_send_duration.observe(send_time, (outcome,))
+        return errors
+
+    def _backoff(self, attempts: int) -> timedelta:
+        delay = min(self.backoff_base * (2 ** (attempts - 1)), self.backoff_max)
+        return timedelta(seconds=delay)
+
+    async def _claim(self) -> List:
+        """Забирает пачку готовых к отправке писем и сразу коммитит статус sending"""
+        outbox = models.EmailOutbox
+        now = datetime.utcnow()
+        ready = (
+            select(outbox.id)
+            .where(
+                outbox.status.in_(["pending", "sending"]),
+                outbox.next_attempt_at <= now
+            )
+            .order_by(outbox.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(outbox)
+                .where(outbox.id.in_(ready.scalar_subquery()))
+                .values(status="sending", next_attempt_at=now + timedelta(seconds=self.claim_timeout))
+                .returning(outbox.id, outbox.to_email, outbox.subject, outbox.body_html, outbox.attempts)
+                .execution_options(synchronize_session=False)
+            )
+            items = sorted(result.all(), key=lambda item: item.id)
+            await db.commit()
+        return items
+
+    async def drain_once(self) -> int:
+        """Отправляет одну пачку писем, возвращает количество обработанных"""
+        items = await self._claim()
+
+        if items:
+            messages = [build_message(i.to_email, i.subject, i.body_html) for i in items]
+            loop = asyncio.get_running_loop()
+            errors = await loop.run_in_executor(self._executor, self._send_batch, messages)
+
+            now = datetime.utcnow()
+            results = []
+            for item, error in zip(items, errors):
+                attempts = item.attempts + 1
+                if error is None:
+                    results.append({
+                        "id": item.id, "attempts": attempts, "status": "sent", "sent_at": now, "last_error": None
+                    })
+                    self.sent += 1
+                    self._recent_sends.append(time.monotonic())
+                elif attempts >= self.max_attempts:
+                    results.append({"id": item.id, "attempts": attempts, "status": "failed", "last_error": error})
+                    self.failed += 1
+                    logger.error(f"Письмо {item.id} для {item.to_email} не отправлено: {error}")
+                else:
+                    results.append({
+                        "id": item.id, "attempts": attempts, "status": "pending",
+                        "next_attempt_at": now + self._backoff(attempts), "last_error": error
+                    })
+                    self.retried += 1
+
+            async with AsyncSessionLocal() as db:
+                # UPDATE по первичному ключу для каждой записи пачки
+                await db.execute(update(models.EmailOutbox), results)
+                await db.commit()
+            self.batches += 1
+
+        async with AsyncSessionLocal() as db:
+            # Глубина очереди и возраст самого старого неотправленного письма
+            result = await db.execute(
+                select(func.count(), func.min(models.EmailOutbox.created_at))
+                .where(models.EmailOutbox.status.in_(["pending", "sending"]))
+            )
+            depth, oldest = result.one()
+        self.queue_depth = depth
+        self.queue_lag = (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0
+
+        return len(items)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        sent_last_minute = sum(1 for t in self._recent_sends if now - t <= 60)
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "batches": self.batches,
+            "sent_per_minute": sent_last_minute,
+            "avg_send_ms": self.total_send_time / (self.sent + self.retried + self.failed or 1) * 1000,
+            "queue_depth": self.queue_depth,
+            "queue_lag_seconds": self.queue_lag,
+        }
+
+
+dispatcher = EmailDispatcher(
+    batch_size=settings.email_batch_size,
+    poll_interval=settings.email_poll_interval,
+    max_attempts=settings.email_max_attempts,
+    backoff_base=settings.email_backoff_base,
+    backoff_max=settings.email_backoff_max,
+    claim_timeout=settings.email_claim_timeout
+)
@@ -0,0 +1,79 @@
+import os
+from typing import Dict, Optional, Sequence, Tuple
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template, select_autoescape
+
+from app.config import settings
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates")
+
+
+class EmailTemplateRegistry:
+    """
+    Реестр шаблонов писем.
+
+    Все шаблоны компилируются один раз (load() при старте приложения) через
+    общий jinja2.Environment и хранятся по ключу (язык, имя). Шаблоны лежат
+    в подпапках по языкам: templates/ru/..., templates/en/...
+    В режиме debug включается auto_reload - измененные файлы перечитываются.
+    """
+
+    def __init__(
+            self,
+            templates_dir: str,
+            languages: Sequence[str],
+            default_language: str,
+            auto_reload: bool = False,
+            bytecode_cache_dir: Optional[str] = None
+    ):
+        self.languages = tuple(languages)
+        self.default_language = default_language
+        self.auto_reload = auto_reload
+
+        bytecode_cache = None
+        if bytecode_cache_dir:
+            os.makedirs(bytecode_cache_dir, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+
+        self.env = Environment(
+            loader=FileSystemLoader(templates_dir),
+            autoescape=select_autoescape(["html"]),
+            auto_reload=auto_reload,
+            bytecode_cache=bytecode_cache,
+            cache_size=-1
+        )
+        self._templates: Dict[Tuple[str, str], Template] = {}
+
+    def load(self) -> None:
+        """Компилирует все шаблоны всех языков"""
+        templates = {}
+        for path in self.env.list_templates(extensions=["html"]):
+            lang, _, name = path.partition("/")
+            if lang in self.languages and name:
+                templates[(lang, name)] = self.env.get_template(path)
+        self._templates = templates
+
+    def get(self, name: str, lang: str) -> Template:
+        if not self._templates:
+            self.load()
+
+        if (lang, name) not in self._templates:
+            lang = self.default_language
+
+        if self.auto_reload:
+            # Environment сам проверит mtime файла и перекомпилирует при изменении
+            return self.env.get_template(f"{lang}/{name}")
+
+        return self._templates[(lang, name)]
+
+    def render(self, name: str, lang: str, **context) -> str:
+        return self.get(name, lang).render(**context)
+
+
+templates = EmailTemplateRegistry(
+    TEMPLATES_DIR,
+    languages=settings.supported_languages,
+    default_language=settings.default_language,
+    auto_reload=settings.debug,
+    bytecode_cache_dir=settings.email_template_cache_dir
+)
@@ -0,0 +1,499 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app import crud
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.services.recognition_model import preprocess
+
+logger = logging.getLogger(__name__)
+
+# Отрезков последовательности в эмбеддинге (средняя поза на каждом) + средняя скорость
+EMBED_SEGMENTS = 4
+
+# (id эталона, косинусная близость, расстояние DTW или None без пересчета)
+Match = Tuple[int, float, Optional[float]]
+
+
+def embed(frames: np.ndarray) -> np.ndarray:
+    """
+    Эмбеддинги пачки нормализованных последовательностей [n, frames, points, coords]:
+    средняя поза на EMBED_SEGMENTS отрезках и средний модуль скорости по каждой
+    координате, центрированные и с единичной нормой - скалярное произведение
+    двух эмбеддингов равно косинусной близости.
+    """
+    n, length = frames.shape[:2]
+    flat = frames.reshape(n, length, -1)
+    edges = np.linspace(0, length, EMBED_SEGMENTS + 1).astype(np.intp)
+    segments = np.add.reduceat(flat, edges[:-1], axis=1) / np.diff(edges)[None, :, None]
+    motion = np.abs(np.diff(flat, axis=1)).mean(axis=1)
+    embeddings = np.concatenate([segments.reshape(n, -1), motion], axis=1)
+    embeddings -= embeddings.mean(axis=1, keepdims=True)
+    embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-6)
+    return embeddings.astype(np.float32)
+
+
+def banded_dtw(query: np.ndarray, candidates: np.ndarray, band: int) -> np.ndarray:
+    """
+    DTW с полосой Сако-Чибы между query [frames, features] и каждым из
+    candidates [n, frames, features] сразу: цикл идет только по клеткам полосы,
+    каждая клетка считается вектором для всех кандидатов. Расстояние нормировано
+    на длину пути, чтобы не зависеть от числа кадров.
+    """
+    n, length = candidates.shape[:2]
+    query_length = len(query)
+    band = max(band, abs(query_length - length))
+
+    # Евклидовы расстояния между кадрами: [n, query_length, length]
+    cross = np.matmul(candidates, query.T).transpose(0, 2, 1)
+    cost = (query ** 2).sum(axis=1)[None, :, None] + (candidates ** 2).sum(axis=2)[:, None, :] - 2 * cross
+    cost = np.sqrt(np.maximum(cost, 0))
+
+    acc = np.full((n, query_length + 1, length + 1), np.inf, dtype=np.float32)
+    acc[:, 0, 0] = 0
+    for i in range(1, query_length + 1):
+        for j in range(max(1, i - band), min(length, i + band) + 1):
+            acc[:, i, j] = cost[:, i - 1, j - 1] + np.minimum(
+                np.minimum(acc[:, i - 1, j], acc[:, i, j - 1]), acc[:, i - 1, j - 1]
+            )
+    return acc[:, query_length, length] / (query_length + length)
+
+
+class GestureIndex:
+    """
+    Индекс эталонных жестов для режима практики: с какими жестами каталога
+    больше всего похож жест ученика.
+
+    Эталоны (таблица gesture_references) хранятся в файлах каталога
+    index_dir: эмбеддинги [n, dim] в float32 (их поиск читает целиком) и
+    ресемплированные последовательности [n, sequence_length, points * coords]
+    в float16 (читаются только строки shortlist), плюс id эталонов.
+    Файлы открываются через np.memmap, поэтому все воркеры сервера делят
+    одни и те же страницы в page cache, а в память процесса ничего не копируется.
+
+    Поиск - косинусная близость запроса со всеми эмбеддингами (матричное
+    умножение блоками по chunk_rows строк) и top-k через argpartition;
+    по желанию shortlist лучших пересчитывается DTW с полосой.
+
+    Индекс пополняется инкрементально (sync): новые эталоны дописываются в
+    конец файлов под файловой блокировкой, затем атомарно обновляется
+    meta.json. Остальные воркеры замечают новый meta.json при следующем
+    поиске. Транзакции коммитятся не в порядке id, поэтому sync каждый раз
+    просматривает и sync_overlap id ниже last_id, пропуская уже
+    проиндексированные.
+
+    Удаленные и замененные эталоны остаются в файлах, пока индекс не
+    пересоберут (python -m app.build_gesture_index), но исключаются из поиска
+    маской live (байт на строку). Запросы API дописывают свой эталон
+    (append) и сбрасывают байты замененных (retire), не обращаясь к БД;
+    sync при старте переписывает маску целиком по списку id из БД и
+    подбирает то, что не успели записать. Маска тоже memmap, изменения
+    сразу видны всем воркерам.
+    """
+
+    META = "meta.json"
+    LOCK = "index.lock"
+    # Версия формата файлов: индекс другой версии пересобирается при sync
+    FORMAT = 2
+
+    def __init__(
+            self,
+            index_dir: str,
+            sequence_length: int,
+            points: int,
+            coords: int,
+            shortlist: int,
+            dtw_band: int,
+            chunk_rows: int,
+            threads: int,
+            sync_batch_size: int,
+            sync_overlap: int,
+            enabled: bool = True
+    ):
+        self.index_dir = index_dir
+        self.sequence_length = sequence_length
+        self.points = points
+        self.coords = coords
+        self.features = points * coords
+        self.dim = self.features * (EMBED_SEGMENTS + 1)
+        self.shortlist = shortlist
+        self.dtw_band = dtw_band
+        self.chunk_rows = chunk_rows
+        self.threads = threads
+        self.sync_batch_size = sync_batch_size
+        self.sync_overlap = sync_overlap
+        self.enabled = enabled
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._view_lock = threading.Lock()
+        # (inode и mtime meta.json, meta, embeddings, sequences, ids, live)
+        self._view: Optional[tuple] = None
+
+        # Счетчики
+        self.searches = 0
+        self.reloads = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="gesture-index")
+        return self._executor
+
+    # Файлы индекса
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def _data_paths(self, generation: int) -> Tuple[str, str, str, str]:
+        return (
+            self._path(f"embeddings.{generation}.f32"),
+            self._path(f"sequences.{generation}.f16"),
+            self._path(f"ids.{generation}.i64"),
+            self._path(f"live.{generation}.u8"),
+        )
+
+    def _read_meta(self) -> Optional[dict]:
+        try:
+            with open(self._path(self.META)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, meta: dict) -> None:
+        tmp_path = self._path(self.META + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._path(self.META))
+
+    def _new_meta(self, generation: int) -> dict:
+        return {
+            "format": self.FORMAT,
+            "generation": generation,
+            "count": 0,
+            "last_id": 0,
+            "sequence_length": self.sequence_length,
+            "points": self.points,
+            "coords": self.coords,
+            "dim": self.dim,
+        }
+
+    def _compatible(self, meta: Optional[dict]) -> bool:
+        return meta is not None and all(
+            meta.get(key) == value for key, value in self._new_meta(0).items()
+            if key not in ("generation", "count", "last_id")
+        )
+
+    def _lock(self):
+        """Блокировка записи между процессами (воркеры сервера, команда пересборки)"""
+        os.makedirs(self.index_dir, exist_ok=True)
+        lock_file = open(self._path(self.LOCK), "a")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    @staticmethod
+    def _unlock(lock_file) -> None:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+    @contextmanager
+    def _locked(self):
+        lock_file = self._lock()
+        try:
+            yield
+        finally:
+            self._unlock(lock_file)
+
+    # Запись
+    def _encode(self, rows: Sequence[Tuple[int, np.ndarray]]) -> Tuple[np.ndarray, ...]:
+        frames = preprocess([features for _, features in rows], self.sequence_length)
+        embeddings = embed(frames)
+        sequences = frames.reshape(len(rows), self.sequence_length, self.features).astype(np.float16)
+        ids = np.fromiter((reference_id for reference_id, _ in rows), dtype=np.int64, count=len(rows))
+        live = np.ones(len(rows), dtype=np.uint8)
+        return embeddings, sequences, ids, live
+
+    def _append_files(self, meta: dict, rows: Sequence[Tuple[int, np.ndarray]]) -> None:
+        count = meta["count"]
+        arrays = self._encode(rows)
+        for path, array in zip(self._data_paths(meta["generation"]), arrays):
+            row_bytes = array[0].nbytes
+            with open(path, "ab") as f:
+                # Хвост от прерванной записи (файл длиннее, чем count в meta.json) отрезается
+                f.truncate(count * row_bytes)
+                f.write(array.tobytes())
+        meta["count"] = count + len(rows)
+        meta["last_id"] = max(meta["last_id"], int(arrays[2].max()))
+
+    def _indexed_ids(self, meta: dict) -> np.ndarray:
+        ids_path = self._data_paths(meta["generation"])[2]
+        if not meta["count"]:
+            return np.empty(0, dtype=np.int64)
+        return np.fromfile(ids_path, dtype=np.int64, count=meta["count"])
+
+    def append(self, rows: Sequence[Tuple[int, np.ndarray]]) -> int:
+        """
+        Дописывает эталоны (id, последовательность [frames, points, coords]),
+        которых еще нет в индексе. Возвращает число добавленных; -1 - индекс
+        создан с другими настройками и его нужно пересобрать.
+        """
+        with self._locked():
+            meta = self._read_meta()
+            if meta is None:
+                meta = self._new_meta(0)
+            elif not self._compatible(meta):
+                return -1
+            known = set(self._indexed_ids(meta).tolist())
+            new_rows = {}
+            for reference_id, features in rows:
+                if reference_id not in known:
+                    new_rows[reference_id] = features
+            if not new_rows:
+                return 0
+            self._append_files(meta, sorted(new_rows.items(), key=lambda row: row[0]))
+            self._write_meta(meta)
+        return len(new_rows)
+
+    def mark_live(self, live_ids: Sequence[int]) -> int:
+        """
+        Переписывает маску live: в поиске участвуют только строки с id из
+        live_ids (эталоны, которые сейчас есть в БД). Возвращает число
+        исключенных строк.
+        """
+        with self._locked():
+            meta = self._read_meta()
+            if not self._compatible(meta) or not meta["count"]:
+                return 0
+            live = np.isin(self._indexed_ids(meta), np.asarray(live_ids, dtype=np.int64)).astype(np.uint8)
+            # Запись в тот же файл на месте: memmap других процессов видят ее сразу
+            with open(self._data_paths(meta["generation"])[3], "r+b") as f:
+                f.write(live.tobytes())
+        return len(live) - int(live.sum())
+
+    def retire(self, reference_ids: Sequence[int]) -> int:
+        """
+        Исключает из поиска эталоны с этими id (удалены или заменены): меняются
+        только их байты маски live. Возвращает число исключенных строк.
+        """
+        with self._locked():
+            meta = self._read_meta()
+            if not self._compatible(meta) or not meta["count"]:
+                return 0
+            rows = np.flatnonzero(np.isin(self._indexed_ids(meta), np.asarray(reference_ids, dtype=np.int64)))
+            with open(self._data_paths(meta["generation"])[3], "r+b") as f:
+                for row in rows:
+                    f.seek(int(row))
+                    f.write(b"\0")
+        return len(rows)
+
+    async def append_async(self, rows: Sequence[Tuple[int, np.ndarray]]) -> int:
+        if not self.enabled or not rows:
+            return 0
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), self.append, rows)
+
+    async def retire_async(self, reference_ids: Sequence[int]) -> int:
+        if not self.enabled or not reference_ids:
+            return 0
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), self.retire, reference_ids)
+
+    def last_id(self) -> int:
+        meta = self._read_meta()
+        return meta["last_id"] if self._compatible(meta) else 0
+
+    # Чтение
+    def _refresh(self) -> Optional[tuple]:
+        """
+        Переоткрывает файлы, если meta.json заменили с прошлого поиска: на
+        каждый поиск - только stat. meta.json всегда пишется заново через
+        os.replace, поэтому новая версия - это новый inode.
+        """
+        for _ in range(3):
+            try:
+                stat = os.stat(self._path(self.META))
+            except FileNotFoundError:
+                return None
+            key = (stat.st_ino, stat.st_mtime_ns)
+            view = self._view
+            if view is not None and view[0] == key:
+                return view
+
+            with self._view_lock:
+                meta = self._read_meta()
+                if not self._compatible(meta):
+                    return None
+                count = meta["count"]
+                embeddings_path, sequences_path, ids_path, live_path = self._data_paths(meta["generation"])
+                try:
+                    view = (
+                        key,
+                        meta,
+                        np.memmap(embeddings_path, np.float32, "r", shape=(count, self.dim)),
+                        np.memmap(
+                            sequences_path, np.float16, "r", shape=(count, self.sequence_length, self.features)
+                        ),
+                        np.memmap(ids_path, np.int64, "r", shape=(count,)),
+                        np.memmap(live_path, np.uint8, "r", shape=(count,)),
+                    ) if count else (key, meta, None, None, None, None)
+                except FileNotFoundError:
+                    # Между чтением meta.json и открытием файлов индекс пересобрали - читаем заново
+                    continue
+                self._view = view
+                self.reloads += 1
+                return view
+        return None
+
+    def search(self, sequence: np.ndarray, k: int, rerank: bool = True) -> List[Match]:
+        """Ближайшие эталоны к последовательности [frames, points, coords]"""
+        view = self._refresh()
+        if view is None or not view[1]["count"]:
+            return []
+        _, meta, embeddings, sequences, ids, live = view
+        count = meta["count"]
+        self.searches += 1
+
+        # Удаленные и замененные эталоны в выдачу не попадают
+        stale = np.asarray(live) == 0
+        live_count = count - int(np.count_nonzero(stale))
+        if not live_count:
+            return []
+
+        frames = preprocess([sequence], self.sequence_length)
+        query = embed(frames)[0]
+
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, self.chunk_rows):
+            block = embeddings[start:start + self.chunk_rows]
+            np.matmul(block, query, out=scores[start:start + len(block)])
+        scores[stale] = -np.inf
+
+        size = min(max(k, self.shortlist) if rerank else k, live_count)
+        best = np.argpartition(-scores, size - 1)[:size]
+        best = best[np.argsort(-scores[best])]
+
+        if not rerank:
+            return [(int(ids[i]), float(scores[i]), None) for i in best]
+
+        # Выборка по отсортированным номерам читает с диска только строки shortlist, по порядку
+        candidates = sequences[np.sort(best)].astype(np.float32)
+        order_in_file = np.argsort(np.argsort(best))
+        distances = banded_dtw(frames[0].reshape(self.sequence_length, -1), candidates, self.dtw_band)
+        distances = distances[order_in_file]
+        order = np.argsort(distances, kind="stable")[:k]
+        return [(int(ids[best[i]]), float(scores[best[i]]), float(distances[i])) for i in order]
+
+    async def search_async(self, sequence: np.ndarray, k: int, rerank: bool = True) -> List[Match]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), self.search, sequence, k, rerank)
+
+    # Пополнение и пересборка из БД
+    def _decode(self, row) -> Tuple[int, np.ndarray]:
+        features = np.frombuffer(row.features, dtype=np.float32).reshape(-1, self.points, self.coords)
+        return row.id, features
+
+    async def sync(self) -> int:
+        """
+        Добавляет эталоны из БД, которых еще нет в индексе, и обновляет маску
+        live; возвращает число добавленных. Просмотр начинается на sync_overlap
+        id ниже last_id: эталон с меньшим id мог закоммититься позже.
+        """
+        if not self.enabled:
+            return 0
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        meta = await loop.run_in_executor(executor, self._read_meta)
+        if meta is not None and not self._compatible(meta):
+            logger.info("Индекс жестов создан с другими настройками - пересборка")
+            return await self.rebuild()
+
+        added = 0
+        after_id = max(0, meta["last_id"] - self.sync_overlap) if meta else 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                rows = await crud.get_gesture_references(db, after_id=after_id, limit=self.sync_batch_size)
+            if rows:
+                appended = await loop.run_in_executor(executor, self.append, [self._decode(row) for row in rows])
+                if appended < 0:
+                    return await self.rebuild()
+                added += appended
+                after_id = rows[-1].id
+            if len(rows) < self.sync_batch_size:
+                break
+
+        async with AsyncSessionLocal() as db:
+            live_ids = await crud.get_gesture_reference_ids(db)
+        await loop.run_in_executor(executor, self.mark_live, live_ids)
+        return added
+
+    async def rebuild(self) -> int:
+        """
+        Полная пересборка в файлы нового поколения: удаленные и замененные
+        эталоны выбрасываются. Поиск в это время идет по старым файлам.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        lock_file = await loop.run_in_executor(executor, self._lock)
+        try:
+            old_meta = self._read_meta()
+            generation = (old_meta["generation"] + 1) if old_meta else 0
+            meta = self._new_meta(generation)
+            for path in self._data_paths(generation):
+                open(path, "wb").close()
+            while True:
+                async with AsyncSessionLocal() as db:
+                    rows = await crud.get_gesture_references(
+                        db, after_id=meta["last_id"], limit=self.sync_batch_size
+                    )
+                if not rows:
+                    break
+                await loop.run_in_executor(
+                    executor, self._append_files, meta, [self._decode(row) for row in rows]
+                )
+            self._write_meta(meta)
+            if old_meta is not None and old_meta["generation"] != generation:
+                # Открытые memmap старого поколения остаются рабочими до переоткрытия
+                for path in self._data_paths(old_meta["generation"]):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+        finally:
+            self._unlock(lock_file)
+        logger.info(f"Индекс жестов пересобран: {meta['count']} эталонов, поколение {generation}")
+        return meta["count"]
+
+    def stop(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        meta = self._view[1] if self._view is not None else {}
+        return {
+            "references": meta.get("count", 0),
+            "generation": meta.get("generation"),
+            "searches": self.searches,
+            "reloads": self.reloads,
+        }
+
+
+gesture_index = GestureIndex(
+    index_dir=settings.gesture_index_dir,
+    sequence_length=settings.gesture_index_sequence_length,
+    points=settings.recognition_points,
+    coords=settings.recognition_coords,
+    shortlist=settings.gesture_index_shortlist,
+    dtw_band=settings.gesture_index_dtw_band,
+    chunk_rows=settings.gesture_index_chunk_rows,
+    threads=settings.gesture_index_threads,
+    sync_batch_size=settings.gesture_index_sync_batch_size,
+    sync_overlap=settings.gesture_index_sync_overlap,
+    enabled=settings.gesture_index_enabled
+)
@@ -0,0 +1,132 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from app import auth
+from app.config import settings
+from app.services.metrics import password_hashing_duration
+
+
+class HashingOverloadedError(Exception):
+    """Очередь на хэширование переполнена - запрос нужно отклонить (503)"""
+
+
+class PasswordHasher:
+    """
+    Выполняет bcrypt вне event loop на выделенном пуле.
+
+    bcrypt отпускает GIL, поэтому по умолчанию используется пул потоков;
+    пул процессов включается настройкой hashing_use_processes.
+    Одновременно выполняется не более max_concurrency операций, еще не более
+    max_queue ждут своей очереди - остальные запросы сразу отклоняются.
+    """
+
+    def __init__(
+            self,
+            workers: int,
+            max_concurrency: int,
+            max_queue: int,
+            use_processes: bool = False
+    ):
+        self.workers = workers
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.use_processes = use_processes
+
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        # Счетчики
+        self.waiting = 0
+        self.in_progress = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait_time = 0.0
+        self.total_run_time = 0.0
+        self.max_wait_time = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.use_processes:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="bcrypt"
+                )
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Семафор создается лениво, внутри работающего event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _run(self, operation: str, func: Callable, *args):
+        semaphore = self._get_semaphore()
+
+        if semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise HashingOverloadedError("Password hashing queue is full")
+
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        started_at = time.perf_counter()
+        wait_time = started_at - queued_at
+        self.total_wait_time += wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+
+        self.in_progress += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            run_time = time.perf_counter() - started_at
+            self.in_progress -= 1
+            self.completed += 1
+            self.total_run_time += run_time
+            password_hashing_duration.observe(run_time, (operation,))
+            semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        """Асинхронно создает bcrypt хэш пароля"""
+        return await self._run("hash", auth.get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Асинхронно проверяет пароль по хэшу"""
+        return await self._run("verify", auth.verify_password, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        """Текущая глубина очереди и накопленные задержки"""
+        completed = self.completed or 1
+        return {
+            "workers": self.workers,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "queue_depth": self.waiting,
+            "in_progress": self.in_progress,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": self.total_wait_time / completed * 1000,
+            "max_wait_ms": self.max_wait_time * 1000,
+            "avg_run_ms": self.total_run_time / completed * 1000,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._semaphore = None
+
+
+hasher = PasswordHasher(
+    workers=settings.hashing_workers,
+    max_concurrency=settings.hashing_max_concurrency,
+    max_queue=settings.hashing_max_queue,
+    use_processes=settings.hashing_use_processes
+)
@@ -0,0 +1,473 @@
+"""
+Разбор заголовков контейнеров MP4/MOV и WebM/Matroska без декодирования кадров.
+
+Модуль не зависит от приложения - функции выполняются в пуле процессов
+VideoProber. На вход - известные куски объекта {смещение: байты} и его
+размер; если для разбора не хватает данных (moov в середине файла, большой
+кластер в конце WebM), возвращается диапазон, который нужно дочитать.
+"""
+import math
+import struct
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, Optional, Tuple, Union
+
+# Больше этого moov/заголовок не читаем - скорее всего файл поврежден
+MAX_ELEMENT_SIZE = 32 * 1024 * 1024
+# Сколько дочитывать, когда не хватает только заголовка бокса/элемента
+READ_AHEAD = 64 * 1024
+# Допустимые значения: все, что за пределами, - поврежденный или подделанный заголовок
+MAX_DIMENSION = 65535
+
+MP4_TOP_LEVEL = {b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide", b"pnot", b"uuid", b"styp"}
+
+CODECS = {
+    "avc1": "h264", "avc3": "h264", "hvc1": "hevc", "hev1": "hevc", "vp08": "vp8", "vp09": "vp9",
+    "av01": "av1", "mp4v": "mpeg4", "mp4a": "aac", "opus": "opus", "ac-3": "ac3", "ec-3": "eac3",
+    "V_VP8": "vp8", "V_VP9": "vp9", "V_AV1": "av1", "V_MPEG4/ISO/AVC": "h264", "V_MPEGH/ISO/HEVC": "hevc",
+    "A_OPUS": "opus", "A_VORBIS": "vorbis", "A_AAC": "aac",
+}
+
+
+class ProbeError(Exception):
+    """Файл не является поддерживаемым контейнером или заголовки повреждены"""
+
+
+class NeedMoreData(Exception):
+    """Для разбора нужен диапазон [offset, offset + length)"""
+
+    def __init__(self, offset: int, length: int):
+        super().__init__(offset, length)
+        self.offset = offset
+        self.length = length
+
+
+@dataclass
+class ProbeResult:
+    container: str
+    duration: Optional[float] = None  # секунды
+    width: Optional[int] = None
+    height: Optional[int] = None
+    frame_rate: Optional[float] = None
+    video_codec: Optional[str] = None
+    audio_codec: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class SparseBuffer:
+    """Известные куски объекта; чтение за их пределами - NeedMoreData"""
+
+    def __init__(self, chunks: Dict[int, bytes], size: int):
+        self.chunks = sorted(chunks.items())
+        self.size = size
+
+    def read(self, offset: int, length: int, read_ahead: int = 0) -> bytes:
+        length = min(length, self.size - offset)
+        if length < 0:
+            raise ProbeError(f"Offset {offset} is beyond the end of the file")
+        for start, data in self.chunks:
+            if start <= offset and offset + length <= start + len(data):
+                return data[offset - start:offset - start + length]
+        raise NeedMoreData(offset, min(max(length, read_ahead), self.size - offset))
+
+    def tail(self) -> Tuple[int, bytes]:
+        """Самый длинный кусок, заканчивающийся концом файла (смещение, байты)"""
+        for start, data in self.chunks:
+            if start + len(data) == self.size:
+                return start, data
+        return self.size, b""
+
+
+def codec_name(tag: str) -> str:
+    return CODECS.get(tag, tag.strip().lower())
+
+
+# MP4 / MOV (ISO BMFF)
+def iter_boxes(data: bytes, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """Дочерние боксы в data[start:end]: (тип, начало содержимого, конец)"""
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header = 8
+        if size == 1:
+            if offset + 16 > end:
+                return
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            return
+        yield box_type, offset + header, offset + size
+        offset += size
+
+
+def find_box(data: bytes, start: int, end: int, box_type: bytes) -> Optional[Tuple[int, int]]:
+    for child_type, child_start, child_end in iter_boxes(data, start, end):
+        if child_type == box_type:
+            return child_start, child_end
+    return None
+
+
+def _full_box_times(data: bytes, start: int) -> Tuple[int, int]:
+    """(timescale, duration) из mvhd/mdhd с учетом версии бокса"""
+    version = data[start]
+    if version == 1:
+        return struct.unpack_from(">IQ", data, start + 20)
+    return struct.unpack_from(">II", data, start + 12)
+
+
+def parse_trak(data: bytes, start: int, end: int, result: ProbeResult) -> None:
+    mdia = find_box(data, start, end, b"mdia")
+    if mdia is None:
+        return
+    hdlr = find_box(data, *mdia, b"hdlr")
+    handler = data[hdlr[0] + 8:hdlr[0] + 12] if hdlr else b""
+
+    stbl = None
+    minf = find_box(data, *mdia, b"minf")
+    if minf is not None:
+        stbl = find_box(data, *minf, b"stbl")
+    codec = None
+    if stbl is not None:
+        stsd = find_box(data, *stbl, b"stsd")
+        if stsd is not None and stsd[1] - stsd[0] >= 16:
+            codec = codec_name(data[stsd[0] + 12:stsd[0] + 16].decode("latin-1"))
+
+    if handler == b"soun":
+        result.audio_codec = result.audio_codec or codec
+        return
+    if handler != b"vide" or result.video_codec is not None:
+        return
+    result.video_codec = codec
+
+    tkhd = find_box(data, start, end, b"tkhd")
+    if tkhd is not None and tkhd[1] - tkhd[0] >= 84:
+        width, height = struct.unpack_from(">II", data, tkhd[1] - 8)
+        width, height = width >> 16, height >> 16
+        # Матрица поворота: a == 0 - кадр повернут на 90/270 градусов (видео с телефона)
+        matrix_offset = tkhd[1] - 8 - 36
+        a, b = struct.unpack_from(">ii", data, matrix_offset)
+        if a == 0 and b != 0:
+            width, height = height, width
+        result.width, result.height = width or None, height or None
+
+    mdhd = find_box(data, *mdia, b"mdhd")
+    if mdhd is not None and stbl is not None:
+        timescale, duration = _full_box_times(data, mdhd[0])
+        stts = find_box(data, *stbl, b"stts")
+        if stts is not None and timescale and duration:
+            count = struct.unpack_from(">I", data, stts[0] + 4)[0]
+            samples = sum(
+                struct.unpack_from(">I", data, stts[0] + 8 + i * 8)[0]
+                for i in range(min(count, (stts[1] - stts[0] - 8) // 8))
+            )
+            if samples:
+                result.frame_rate = round(samples * timescale / duration, 3)
+
+
+def parse_moov(data: bytes) -> ProbeResult:
+    result = ProbeResult(container="mp4")
+    end = len(data)
+    mvhd = find_box(data, 0, end, b"mvhd")
+    if mvhd is not None:
+        timescale, duration = _full_box_times(data, mvhd[0])
+        if timescale and duration and duration not in (0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF):
+            result.duration = duration / timescale
+        elif timescale:
+            # Фрагментированный MP4 (MediaRecorder в Safari): длительность в mvex/mehd
+            mvex = find_box(data, 0, end, b"mvex")
+            mehd = find_box(data, *mvex, b"mehd") if mvex else None
+            if mehd is not None:
+                version = data[mehd[0]]
+                fmt = ">Q" if version == 1 else ">I"
+                fragment_duration = struct.unpack_from(fmt, data, mehd[0] + 4)[0]
+                result.duration = fragment_duration / timescale or None
+
+    for box_type, start, box_end in iter_boxes(data, 0, end):
+        if box_type == b"trak":
+            parse_trak(data, start, box_end, result)
+    return result
+
+
+def probe_mp4(buffer: SparseBuffer) -> ProbeResult:
+    """Обход боксов верхнего уровня до moov (в начале или в конце файла)"""
+    offset = 0
+    while offset + 8 <= buffer.size:
+        header = buffer.read(offset, 16, READ_AHEAD)
+        size, box_type = struct.unpack_from(">I4s", header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", header, 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = buffer.size - offset
+        if size < header_size:
+            raise ProbeError(f"Invalid MP4 box size at offset {offset}")
+
+        if box_type == b"moov":
+            if size > MAX_ELEMENT_SIZE:
+                raise ProbeError(f"moov box is too large: {size} bytes")
+            data = buffer.read(offset + header_size, size - header_size)
+            result = parse_moov(data)
+            if buffer.read(4, 4) == b"ftyp":
+                brand = buffer.read(8, 4)
+                if brand == b"qt  ":
+                    result.container = "mov"
+            return result
+        offset += size
+    raise ProbeError("moov box not found")
+
+
+# WebM / Matroska (EBML)
+EBML_HEADER = 0x1A45DFA3
+EBML_DOCTYPE = 0x4282
+SEGMENT = 0x18538067
+INFO = 0x1549A966
+TIMECODE_SCALE = 0x2AD7B1
+DURATION = 0x4489
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+TRACK_TYPE = 0x83
+CODEC_ID = 0x86
+DEFAULT_DURATION = 0x23E383
+VIDEO = 0xE0
+PIXEL_WIDTH = 0xB0
+PIXEL_HEIGHT = 0xBA
+CLUSTER = 0x1F43B675
+CLUSTER_TIMECODE = 0xE7
+SIMPLE_BLOCK = 0xA3
+BLOCK_GROUP = 0xA0
+BLOCK = 0xA1
+BLOCK_DURATION = 0x9B
+CLUSTER_ID = b"\x1f\x43\xb6\x75"
+
+UNKNOWN_SIZE = -1
+
+
+def read_vint(data: bytes, offset: int, keep_marker: bool) -> Tuple[int, int]:
+    """EBML число переменной длины: (значение, длина); размер из одних единиц - UNKNOWN_SIZE"""
+    if offset >= len(data):
+        raise IndexError(offset)
+    first = data[offset]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        raise ProbeError(f"Invalid EBML number at offset {offset}")
+    if offset + length > len(data):
+        raise IndexError(offset)
+    value = first if keep_marker else first & (mask - 1)
+    for byte in data[offset + 1:offset + length]:
+        value = (value << 8) | byte
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        return UNKNOWN_SIZE, length
+    return value, length
+
+
+def read_element(data: bytes, offset: int) -> Tuple[int, int, int]:
+    """(id, начало данных, размер данных или UNKNOWN_SIZE)"""
+    element_id, id_length = read_vint(data, offset, keep_marker=True)
+    size, size_length = read_vint(data, offset + id_length, keep_marker=False)
+    return element_id, offset + id_length + size_length, size
+
+
+def iter_elements(data: bytes, start: int, end: int) -> Iterator[Tuple[int, int, int]]:
+    """Дочерние элементы data[start:end]: (id, начало данных, конец данных)"""
+    offset = start
+    while offset < end:
+        try:
+            element_id, data_start, size = read_element(data, offset)
+        except IndexError:
+            return
+        data_end = end if size == UNKNOWN_SIZE else data_start + size
+        if data_end > end:
+            return
+        yield element_id, data_start, data_end
+        offset = data_end
+
+
+def find_element(data: bytes, start: int, end: int, element_id: int) -> Optional[Tuple[int, int]]:
+    for child_id, child_start, child_end in iter_elements(data, start, end):
+        if child_id == element_id:
+            return child_start, child_end
+    return None
+
+
+def read_uint(data: bytes, start: int, end: int) -> int:
+    return int.from_bytes(data[start:end], "big")
+
+
+def read_float(data: bytes, start: int, end: int) -> float:
+    if end - start == 4:
+        return struct.unpack_from(">f", data, start)[0]
+    if end - start == 8:
+        return struct.unpack_from(">d", data, start)[0]
+    return 0.0
+
+
+def parse_tracks(data: bytes, start: int, end: int, result: ProbeResult) -> None:
+    for element_id, entry_start, entry_end in iter_elements(data, start, end):
+        if element_id != TRACK_ENTRY:
+            continue
+        track_type = codec = default_duration = None
+        width = height = None
+        for child_id, child_start, child_end in iter_elements(data, entry_start, entry_end):
+            if child_id == TRACK_TYPE:
+                track_type = read_uint(data, child_start, child_end)
+            elif child_id == CODEC_ID:
+                codec = codec_name(data[child_start:child_end].rstrip(b"\x00").decode("ascii", "replace"))
+            elif child_id == DEFAULT_DURATION:
+                default_duration = read_uint(data, child_start, child_end)
+            elif child_id == VIDEO:
+                for video_id, video_start, video_end in iter_elements(data, child_start, child_end):
+                    if video_id == PIXEL_WIDTH:
+                        width = read_uint(data, video_start, video_end)
+                    elif video_id == PIXEL_HEIGHT:
+                        height = read_uint(data, video_start, video_end)
+
+        if track_type == 1 and result.video_codec is None:
+            result.video_codec = codec
+            result.width, result.height = width, height
+            if default_duration:
+                result.frame_rate = round(1e9 / default_duration, 3)
+        elif track_type == 2 and result.audio_codec is None:
+            result.audio_codec = codec
+
+
+def iter_blocks(data: bytes, start: int, end: int) -> Iterator[Tuple[int, int, int]]:
+    """Блоки кластера: (начало, конец, BlockDuration или 0)"""
+    for element_id, element_start, element_end in iter_elements(data, start, end):
+        if element_id == SIMPLE_BLOCK:
+            yield element_start, element_end, 0
+        elif element_id == BLOCK_GROUP:
+            block = find_element(data, element_start, element_end, BLOCK)
+            duration = find_element(data, element_start, element_end, BLOCK_DURATION)
+            if block is not None:
+                yield block[0], block[1], read_uint(data, *duration) if duration else 0
+
+
+def last_block_time(tail: bytes) -> Optional[int]:
+    """
+    Время (в единицах TimecodeScale) последнего блока по последнему кластеру
+    в хвосте файла. MediaRecorder пишет WebM без Duration, поэтому
+    длительность берется отсюда. Совпадение ID кластера внутри данных кадра
+    отсекается проверкой, что первым внутри идет Timecode.
+    """
+    position = len(tail)
+    while True:
+        position = tail.rfind(CLUSTER_ID, 0, position)
+        if position < 0:
+            return None
+        try:
+            _, data_start, size = read_element(tail, position)
+            first_id, first_start, first_size = read_element(tail, data_start)
+        except (IndexError, ProbeError):
+            continue
+        if first_id != CLUSTER_TIMECODE or first_size in (UNKNOWN_SIZE, 0) or first_size > 8:
+            continue
+
+        cluster_time = read_uint(tail, first_start, first_start + first_size)
+        end = len(tail) if size == UNKNOWN_SIZE else min(len(tail), data_start + size)
+        latest = cluster_time
+        for block_start, block_end, duration in iter_blocks(tail, data_start, end):
+            try:
+                _, track_length = read_vint(tail, block_start, keep_marker=False)
+            except (IndexError, ProbeError):
+                continue
+            if block_start + track_length + 2 > block_end:
+                continue
+            relative = struct.unpack_from(">h", tail, block_start + track_length)[0]
+            latest = max(latest, cluster_time + relative + duration)
+        return latest
+
+
+def probe_webm(buffer: SparseBuffer) -> ProbeResult:
+    head = buffer.read(0, READ_AHEAD, READ_AHEAD)
+    element_id, data_start, size = read_element(head, 0)
+    if element_id != EBML_HEADER or size == UNKNOWN_SIZE:
+        raise ProbeError("Not an EBML file")
+    doctype = find_element(head, data_start, data_start + size, EBML_DOCTYPE)
+    result = ProbeResult(container=head[doctype[0]:doctype[1]].decode("ascii", "replace") if doctype else "matroska")
+
+    segment_id, segment_start, segment_size = read_element(head, data_start + size)
+    if segment_id != SEGMENT:
+        raise ProbeError("Segment element not found")
+    segment_end = buffer.size if segment_size == UNKNOWN_SIZE else min(buffer.size, segment_start + segment_size)
+
+    timecode_scale = 1_000_000
+    duration = None
+    seen_info = seen_tracks = False
+    offset = segment_start
+    while offset < segment_end and not (seen_info and seen_tracks):
+        header = buffer.read(offset, 12, READ_AHEAD)
+        element_id, header_end, size = read_element(header, 0)
+        if element_id == CLUSTER or size == UNKNOWN_SIZE:
+            break
+        data_offset = offset + header_end
+        if element_id in (INFO, TRACKS):
+            if size > MAX_ELEMENT_SIZE:
+                raise ProbeError(f"EBML element is too large: {size} bytes")
+            data = buffer.read(data_offset, size)
+            if element_id == INFO:
+                seen_info = True
+                for child_id, child_start, child_end in iter_elements(data, 0, len(data)):
+                    if child_id == TIMECODE_SCALE:
+                        timecode_scale = read_uint(data, child_start, child_end) or timecode_scale
+                    elif child_id == DURATION:
+                        duration = read_float(data, child_start, child_end)
+            else:
+                seen_tracks = True
+                parse_tracks(data, 0, len(data), result)
+        offset = data_offset + size
+
+    if not seen_tracks:
+        raise ProbeError("Tracks element not found")
+
+    if duration:
+        result.duration = duration * timecode_scale / 1e9
+    else:
+        tail_start, tail = buffer.tail()
+        latest = last_block_time(tail)
+        if latest is None and tail_start > 0 and len(tail) < MAX_ELEMENT_SIZE:
+            # В хвосте не нашлось начала кластера - нужен хвост побольше
+            length = min(buffer.size, max(len(tail) * 4, READ_AHEAD))
+            raise NeedMoreData(buffer.size - length, length)
+        if latest is not None:
+            result.duration = latest * timecode_scale / 1e9
+    return result
+
+
+def probe(chunks: Dict[int, bytes], size: int) -> Union[ProbeResult, Tuple[int, int]]:
+    """
+    Точка входа для пула процессов. Возвращает ProbeResult или диапазон
+    (offset, length), который нужно дочитать и вызвать probe еще раз.
+    """
+    buffer = SparseBuffer(chunks, size)
+    try:
+        magic = buffer.read(0, 8)
+        if magic[:4] == b"\x1a\x45\xdf\xa3":
+            return validate(probe_webm(buffer))
+        if magic[4:8] in MP4_TOP_LEVEL:
+            return validate(probe_mp4(buffer))
+    except NeedMoreData as e:
+        return e.offset, e.length
+    except (struct.error, IndexError, ValueError, ZeroDivisionError, OverflowError) as e:
+        raise ProbeError(f"Corrupted container headers: {e!r}")
+    raise ProbeError("Unsupported container")
+
+
+def validate(result: ProbeResult) -> ProbeResult:
+    """Значения из заголовков идут в колонки БД как есть - проверяем диапазоны"""
+    for name in ("duration", "frame_rate"):
+        value = getattr(result, name)
+        if value is not None and not (math.isfinite(value) and value >= 0):
+            raise ProbeError(f"Invalid {name}: {value!r}")
+    for name in ("width", "height"):
+        value = getattr(result, name)
+        if value is not None and not 1 <= value <= MAX_DIMENSION:
+            raise ProbeError(f"Invalid {name}: {value!r}")
+    return result
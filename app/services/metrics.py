@@ -0,0 +1,409 @@
+import asyncio
+import glob
+import json
+import logging
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм, в секундах
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+BCRYPT_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class Metric(ABC):
+    """Базовая метрика: имя, описание и имена меток"""
+
+    type = "untyped"
+    # Как складываются значения разных воркеров (MultiProcessMetrics): sum или max
+    multiprocess_mode = "sum"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    @abstractmethod
+    def snapshot(self) -> Dict[Tuple[str, ...], Any]:
+        """Текущие значения: метки -> значение (для гистограммы - список корзин и сумма)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def samples(self, values: Dict[Tuple[str, ...], Any]) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self, values: Optional[Dict[Tuple[str, ...], Any]] = None) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples(self.snapshot() if values is None else values))
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, labels: Tuple[str, ...] = ()) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Any]:
+        return dict(self._values)
+
+    def samples(self, values: Dict[Tuple[str, ...], Any]) -> Iterable[str]:
+        for labels, value in values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Gauge(Metric):
+    """
+    Gauge без меток; значение задается вручную или вычисляется при сборе (func).
+    multiprocess_mode="max" - для значений, общих для всех воркеров (например,
+    глубина очереди в БД): сумма по воркерам их бы умножила.
+    """
+
+    type = "gauge"
+
+    def __init__(
+            self, name: str, documentation: str, func: Callable[[], float] = None, multiprocess_mode: str = "sum"
+    ):
+        super().__init__(name, documentation)
+        self.value = 0.0
+        self.func = func
+        self.multiprocess_mode = multiprocess_mode
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Any]:
+        return {(): self.func() if self.func is not None else self.value}
+
+    def samples(self, values: Dict[Tuple[str, ...], Any]) -> Iterable[str]:
+        yield f"{self.name} {_format_value(values.get((), 0))}"
+
+
+class Histogram(Metric):
+    """
+    Гистограмма с фиксированными корзинами.
+
+    На каждое наблюдение - поиск корзины и два инкремента в уже
+    существующем списке; накопительные значения считаются только при сборе.
+    """
+
+    type = "histogram"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Tuple[str, ...] = (),
+            buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # метки -> [количество по корзинам..., +Inf, сумма]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, labels: Tuple[str, ...] = ()) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Any]:
+        return {labels: list(series) for labels, series in list(self._series.items())}
+
+    def samples(self, values: Dict[Tuple[str, ...], Any]) -> Iterable[str]:
+        for labels, series in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            cumulative += series[len(self.buckets)]
+            inf = _format_labels(self.labelnames, labels, 'le="+Inf"')
+            yield f"{self.name}_bucket{inf} {cumulative}"
+            label_str = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_str} {_format_value(series[-1])}"
+            yield f"{self.name}_count{label_str} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Значения всех метрик в виде, пригодном для JSON (MultiProcessMetrics)"""
+        return {
+            name: {
+                "type": metric.type,
+                "mode": metric.multiprocess_mode,
+                "values": [[list(labels), value] for labels, value in metric.snapshot().items()],
+            }
+            for name, metric in self._metrics.items()
+        }
+
+    def render(self, snapshots: Optional[List[Dict[str, dict]]] = None) -> str:
+        """
+        Текстовый формат Prometheus (text/plain; version=0.0.4). С snapshots -
+        значения, сложенные из снимков нескольких процессов.
+        """
+        merged = merge_snapshots(snapshots) if snapshots is not None else {}
+        lines: List[str] = []
+        for name, metric in self._metrics.items():
+            if snapshots is None:
+                lines.extend(metric.render())
+            else:
+                lines.extend(metric.render(merged.get(name, {})))
+        return "\n".join(lines) + "\n"
+
+
+def _merge_value(mode: str, a: Any, b: Any) -> Any:
+    if isinstance(a, list):
+        return [x + y for x, y in zip(a, b)]
+    return max(a, b) if mode == "max" else a + b
+
+
+def merge_snapshots(snapshots: Iterable[Dict[str, dict]]) -> Dict[str, Dict[Tuple[str, ...], Any]]:
+    """Складывает снимки Registry.snapshot: счетчики и гистограммы - сумма, gauge - по mode"""
+    merged: Dict[str, Dict[Tuple[str, ...], Any]] = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            values = merged.setdefault(name, {})
+            for labels, value in metric["values"]:
+                key = tuple(labels)
+                values[key] = value if key not in values else _merge_value(metric["mode"], values[key], value)
+    return merged
+
+
+class MultiProcessMetrics:
+    """
+    Общие метрики воркеров python -m app.serve: реестр у каждого процесса
+    свой, а /metrics отвечает любой из них.
+
+    Каждый воркер раз в flush_interval (и при каждом сборе) атомарно пишет
+    снимок своего реестра в directory/worker-<pid>-<id>.json, а /metrics
+    складывает снимки всех воркеров: счетчики и гистограммы суммируются,
+    gauge - сумма или максимум (multiprocess_mode). Значения других воркеров
+    отстают не больше чем на flush_interval.
+
+    Когда воркер завершается (в том числе по serve_max_requests), супервизор
+    переносит его счетчики и гистограммы в dead.json (mark_dead), поэтому
+    они не сбрасываются при перезапуске воркеров; gauge умершего воркера
+    отбрасываются.
+    """
+
+    DEAD = "dead.json"
+    # Сколько имен перенесенных файлов помнить в dead.json: сбор, который
+    # прочитал файл воркера до переноса, не должен посчитать его дважды
+    DEAD_FILES_KEPT = 1000
+
+    def __init__(self, registry: Registry, directory: str, flush_interval: float):
+        self.registry = registry
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._file = f"worker-{os.getpid()}-{uuid.uuid4().hex[:8]}.json"
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _write(path: str, data: dict) -> None:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read(path: str) -> Optional[dict]:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def flush(self) -> None:
+        self._write(os.path.join(self.directory, self._file), self.registry.snapshot())
+
+    def render(self) -> str:
+        """Метрики всех воркеров; собственные значения - текущие"""
+        self.flush()
+        snapshots = []
+        names = []
+        for path in glob.glob(os.path.join(self.directory, "worker-*.json")):
+            snapshot = self._read(path)
+            if snapshot is not None:
+                snapshots.append(snapshot)
+                names.append(os.path.basename(path))
+        # dead.json читается после файлов воркеров: файл, перенесенный между
+        # этими чтениями, уже учтен в dead.json и пропускается
+        dead = self._read(os.path.join(self.directory, self.DEAD)) or {"files": [], "metrics": {}}
+        merged_files = set(dead["files"])
+        snapshots = [snapshot for name, snapshot in zip(names, snapshots) if name not in merged_files]
+        snapshots.append(dead["metrics"])
+        return self.registry.render(snapshots)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Не удалось записать метрики воркера: {e!r}")
+
+    @classmethod
+    def mark_dead(cls, directory: str, pid: int) -> None:
+        """Переносит счетчики и гистограммы завершившегося воркера в dead.json (из супервизора)"""
+        dead_path = os.path.join(directory, cls.DEAD)
+        for path in glob.glob(os.path.join(directory, f"worker-{pid}-*.json")):
+            snapshot = cls._read(path)
+            dead = cls._read(dead_path) or {"files": [], "metrics": {}}
+            if snapshot is not None:
+                cumulative = {name: metric for name, metric in snapshot.items() if metric["type"] != "gauge"}
+                types = {name: metric["type"] for name, metric in {**dead["metrics"], **cumulative}.items()}
+                dead["metrics"] = {
+                    name: {
+                        "type": types[name],
+                        "mode": "sum",
+                        "values": [[list(labels), value] for labels, value in values.items()],
+                    }
+                    for name, values in merge_snapshots([dead["metrics"], cumulative]).items()
+                }
+            dead["files"] = (dead["files"] + [os.path.basename(path)])[-cls.DEAD_FILES_KEPT:]
+            # Сначала dead.json, потом удаление: сбор не должен потерять значения
+            cls._write(dead_path, dead)
+            os.remove(path)
+
+    @classmethod
+    def reset(cls, directory: str) -> None:
+        """Очищает каталог при старте сервера: снимки прошлого запуска не нужны"""
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            os.remove(path)
+
+
+registry = Registry()
+
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being processed"
+))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status")
+))
+db_query_duration = registry.register(Histogram(
+    "db_query_duration_seconds", "SQL statement execution time", buckets=SQL_BUCKETS
+))
+password_hashing_duration = registry.register(Histogram(
+    "password_hashing_duration_seconds", "bcrypt hash/verify time (without queueing)",
+    ("operation",), buckets=BCRYPT_BUCKETS
+))
+smtp_send_duration = registry.register(Histogram(
+    "smtp_send_duration_seconds", "Time to send one email over SMTP", ("outcome",)
+))
+storage_operation_duration = registry.register(Histogram(
+    "storage_operation_duration_seconds", "MinIO operation latency", ("operation", "outcome")
+))
+video_probe_duration = registry.register(Histogram(
+    "video_probe_duration_seconds", "Video header probe time: range reads and parsing", ("outcome",)
+))
+
+video_uploads = registry.register(Counter(
+    "video_uploads_total", "Video uploads by outcome: new content stored or deduplicated", ("outcome",)
+))
+recognition_batch_size = registry.register(Histogram(
+    "recognition_batch_size", "Sequences per recognition batch", buckets=BATCH_SIZE_BUCKETS
+))
+recognition_queue_wait = registry.register(Histogram(
+    "recognition_queue_wait_seconds", "Time a sequence waits in the queue before its batch starts",
+    buckets=SQL_BUCKETS
+))
+recognition_batch_duration = registry.register(Histogram(
+    "recognition_batch_duration_seconds", "Recognition batch time: preprocessing and model in the worker pool",
+    ("outcome",), buckets=SQL_BUCKETS
+))
+recognition_streams_active = registry.register(Gauge(
+    "recognition_streams_active", "Open WebSocket recognition streams"
+))
+recognition_stream_lag = registry.register(Histogram(
+    "recognition_stream_lag_seconds", "Stream lag: newest frame in the window received -> result sent"
+))
+recognition_stream_frames = registry.register(Counter(
+    "recognition_stream_frames_total", "Stream frames received, and dropped without being recognized", ("outcome",)
+))
+rate_limit_checks = registry.register(Counter(
+    "rate_limit_checks_total", "Rate limit checks by route and key type", ("route", "key")
+))
+rate_limit_rejections = registry.register(Counter(
+    "rate_limit_rejections_total", "Requests rejected with 429 by route and key type", ("route", "key")
+))
+
+
+def instrument_engine(sync_engine) -> None:
+    """Подписывается на события движка: длительность и количество SQL запросов"""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started_at = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started_at = getattr(context, "_metrics_started_at", None)
+        if started_at is not None:
+            db_query_duration.observe(time.perf_counter() - started_at)
+
+
+# Каталог задает python -m app.serve при нескольких воркерах
+multiprocess_metrics = MultiProcessMetrics(
+    registry, settings.metrics_multiprocess_dir, settings.metrics_flush_interval
+) if settings.metrics_multiprocess_dir else None
@@ -0,0 +1,187 @@
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request
+
+from app.config import settings
+from app.services.metrics import rate_limit_checks, rate_limit_rejections
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+class RateLimitExceededError(Exception):
+    """Лимит запросов исчерпан - запрос отклоняется с 429"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limit exceeded, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+def parse_limit(limit: str) -> Tuple[int, float]:
+    """ "10/minute" -> (емкость корзины 10, пополнение 10/60 токена в секунду)"""
+    count, _, period = limit.partition("/")
+    capacity = int(count)
+    return capacity, capacity / PERIODS[period.strip()]
+
+
+class RateLimitBackend(ABC):
+    """
+    Хранилище token bucket. hit() забирает один токен из корзины key и
+    возвращает 0, если запрос разрешен, иначе - через сколько секунд повторить.
+    """
+
+    @abstractmethod
+    async def hit(self, key: str, capacity: int, rate: float) -> float:
+        raise NotImplementedError
+
+    def size(self) -> int:
+        return -1
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """In-process корзины; число ключей ограничено (вытесняются давно не использованные)"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        # ключ -> (токены, время обновления)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def hit(self, key: str, capacity: int, rate: float) -> float:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = float(capacity)
+        else:
+            tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / rate
+
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_size:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+    def size(self) -> int:
+        return len(self._buckets)
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """
+    Общие для всех воркеров корзины в Redis (требуется пакет redis).
+    Проверка и списание токена - один атомарный Lua скрипт.
+    """
+
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    local retry_after = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        retry_after = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+    return tostring(retry_after)
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        import redis.asyncio as redis
+
+        self.prefix = prefix
+        self._redis = redis.from_url(url)
+        self._script = self._redis.register_script(self.SCRIPT)
+
+    async def hit(self, key: str, capacity: int, rate: float) -> float:
+        result = await self._script(keys=[self.prefix + key], args=[capacity, rate, time.time()])
+        return float(result)
+
+
+class RateLimiter:
+    """
+    Ограничение частоты запросов к дорогим маршрутам (bcrypt, SMTP).
+
+    Лимиты задаются в Settings отдельно для ключа по IP клиента и по email
+    из запроса. Проверка вызывается первой строкой обработчика - до
+    хэширования и запросов в БД.
+    """
+
+    def __init__(
+            self,
+            backend: RateLimitBackend,
+            ip_limits: Dict[str, str],
+            email_limits: Dict[str, str],
+            enabled: bool = True,
+            trust_forwarded: bool = False,
+            trusted_proxies: int = 1
+    ):
+        self.backend = backend
+        self.enabled = enabled
+        self.trust_forwarded = trust_forwarded
+        self.trusted_proxies = max(1, trusted_proxies)
+        self.ip_limits = {route: parse_limit(limit) for route, limit in ip_limits.items()}
+        self.email_limits = {route: parse_limit(limit) for route, limit in email_limits.items()}
+
+    def client_ip(self, request: Request) -> str:
+        """
+        IP клиента. За прокси - из X-Forwarded-For, считая trusted_proxies
+        адресов справа: левые записи клиент может прислать сам, а правые
+        дописывают наши прокси.
+        """
+        if self.trust_forwarded:
+            forwarded = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",")]
+            forwarded = [hop for hop in forwarded if hop]
+            if forwarded:
+                return forwarded[max(0, len(forwarded) - self.trusted_proxies)]
+        return request.client.host if request.client else "unknown"
+
+    async def _check(self, route: str, kind: str, key: str, limit: Optional[Tuple[int, float]]) -> None:
+        if limit is None:
+            return
+
+        rate_limit_checks.inc(labels=(route, kind))
+        retry_after = await self.backend.hit(f"{route}:{kind}:{key}", *limit)
+        if retry_after > 0:
+            rate_limit_rejections.inc(labels=(route, kind))
+            raise RateLimitExceededError(retry_after)
+
+    async def check(self, route: str, request: Request, email: Optional[str] = None) -> None:
+        """Списывает токены по IP и (если передан) по email, при превышении - RateLimitExceededError"""
+        if not self.enabled:
+            return
+        await self._check(route, "ip", self.client_ip(request), self.ip_limits.get(route))
+        if email:
+            await self._check(route, "email", email.strip().lower(), self.email_limits.get(route))
+
+
+def retry_after_header(retry_after: float) -> str:
+    return str(max(1, math.ceil(retry_after)))
+
+
+def create_backend() -> RateLimitBackend:
+    if settings.rate_limit_backend == "redis":
+        return RedisRateLimitBackend(settings.rate_limit_redis_url)
+    return MemoryRateLimitBackend(max_size=settings.rate_limit_max_keys)
+
+
+rate_limiter = RateLimiter(
+    create_backend(),
+    ip_limits=settings.rate_limits_ip,
+    email_limits=settings.rate_limits_email,
+    enabled=settings.rate_limit_enabled,
+    trust_forwarded=settings.rate_limit_trust_forwarded,
+    trusted_proxies=settings.rate_limit_trusted_proxies
+)
@@ -0,0 +1,285 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Set
+
+import numpy as np
+
+from app.config import settings
+from app.services import recognition_model
+from app.services.metrics import recognition_batch_duration, recognition_batch_size, recognition_queue_wait
+from app.services.recognition_model import Prediction
+
+logger = logging.getLogger(__name__)
+
+
+class RecognitionOverloadedError(Exception):
+    """Очередь на распознавание переполнена - запрос нужно отклонить (503)"""
+
+
+class RecognitionUnavailableError(Exception):
+    """Распознавание выключено или сервис останавливается"""
+
+
+class _Item:
+    __slots__ = ("sequence", "future", "queued_at")
+
+    def __init__(self, sequence: np.ndarray, future: asyncio.Future):
+        self.sequence = sequence
+        self.future = future
+        self.queued_at = time.perf_counter()
+
+
+class GestureRecognizer:
+    """
+    Распознавание жестов динамическими микробатчами.
+
+    Запросы кладут последовательности в общую очередь, а один сборщик
+    формирует из них пачки: пачка уходит в пул процессов, как только
+    набралось max_batch_size последовательностей или первая из них прождала
+    max_wait. Одновременно в пуле не больше пачек, чем процессов, поэтому
+    пока все процессы заняты, очередь копится и следующая пачка получается
+    больше - под нагрузкой модель вызывается реже и на больших пачках.
+
+    Процессы пула "теплые": модель загружается инициализатором один раз,
+    а при старте каждый процесс делает пробный прогон. Очередь ограничена
+    max_queue - лишние запросы сразу отклоняются.
+    """
+
+    def __init__(
+            self,
+            model: str,
+            model_path: Optional[str],
+            workers: int,
+            max_batch_size: int,
+            max_wait: float,
+            max_queue: int,
+            sequence_length: int,
+            points: int,
+            coords: int,
+            top_k: int,
+            enabled: bool = True
+    ):
+        self.model = model
+        self.model_path = model_path
+        self.workers = workers
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.sequence_length = sequence_length
+        self.points = points
+        self.coords = coords
+        self.top_k = top_k
+        self.enabled = enabled
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._collector: Optional[asyncio.Task] = None
+        self._batches: Set[asyncio.Task] = set()
+
+        # Счетчики
+        self.recognized = 0
+        self.batches = 0
+        self.rejected = 0
+        self.errors = 0
+
+    @property
+    def running(self) -> bool:
+        return self._collector is not None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # spawn: fork процесса с работающими пулами потоков (MinIO, БД) небезопасен
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=recognition_model.init_worker,
+            initargs=(
+                self.model, self.model_path, (self.sequence_length, self.points, self.coords), self.top_k
+            )
+        )
+
+    async def start(self) -> None:
+        """Запускает процессы (модель загружается и прогревается в каждом) и сборщик пачек"""
+        if not self.enabled or self._collector is not None:
+            return
+        self._executor = self._create_executor()
+        await self._warm_up()
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.workers)
+        self._collector = asyncio.create_task(self._collect())
+
+    async def _warm_up(self) -> None:
+        loop = asyncio.get_running_loop()
+        # Одновременные задачи заставляют пул поднять все процессы сразу
+        await asyncio.gather(*(
+            loop.run_in_executor(self._executor, recognition_model.warm_up) for _ in range(self.workers)
+        ))
+
+    def to_array(self, sequence, max_frames: int) -> np.ndarray:
+        """Проверяет форму последовательности [frames, points, coords]; ValueError - не подходит"""
+        return recognition_model.landmarks_array(sequence, self.points, self.coords, max_frames)
+
+    async def recognize(self, sequences: List[np.ndarray]) -> List[Prediction]:
+        """
+        Распознает последовательности [frames, points, coords]; каждая встает
+        в общую очередь отдельно и может попасть в пачку с чужими.
+        """
+        if not self.running:
+            raise RecognitionUnavailableError("Recognition is not running")
+        if self._queue.qsize() + len(sequences) > self.max_queue:
+            self.rejected += 1
+            raise RecognitionOverloadedError("Recognition queue is full")
+
+        loop = asyncio.get_running_loop()
+        items = [_Item(sequence, loop.create_future()) for sequence in sequences]
+        for item in items:
+            self._queue.put_nowait(item)
+        try:
+            return list(await asyncio.gather(*(item.future for item in items)))
+        except asyncio.CancelledError:
+            # Клиент ушел - еще не отправленные последовательности сборщик пропустит
+            for item in items:
+                item.future.cancel()
+            raise
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            # Сначала свободный процесс, потом пачка: пока процессы заняты, очередь растет
+            await self._slots.acquire()
+            try:
+                batch = await self._next_batch(loop)
+            except BaseException:
+                self._slots.release()
+                raise
+            task = asyncio.create_task(self._run_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _next_batch(self, loop: asyncio.AbstractEventLoop) -> List[_Item]:
+        batch: List[_Item] = []
+        deadline = None
+        try:
+            while len(batch) < self.max_batch_size:
+                if self._queue.empty():
+                    if deadline is None:
+                        item = await self._queue.get()
+                    else:
+                        timeout = deadline - loop.time()
+                        if timeout <= 0:
+                            break
+                        try:
+                            item = await asyncio.wait_for(self._queue.get(), timeout)
+                        except asyncio.TimeoutError:
+                            break
+                else:
+                    item = self._queue.get_nowait()
+                if item.future.cancelled():
+                    continue
+                if deadline is None:
+                    deadline = loop.time() + self.max_wait
+                batch.append(item)
+        except asyncio.CancelledError:
+            # Остановка во время сборки: уже взятые из очереди не должны повиснуть
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(RecognitionUnavailableError("Recognition is stopping"))
+            raise
+        return batch
+
+    async def _run_batch(self, batch: List[_Item]) -> None:
+        started_at = time.perf_counter()
+        for item in batch:
+            recognition_queue_wait.observe(started_at - item.queued_at)
+        recognition_batch_size.observe(len(batch))
+        outcome = "ok"
+        executor = self._executor
+        replaced = False
+        try:
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(
+                executor, recognition_model.run_batch, [item.sequence for item in batch]
+            )
+        except Exception as e:
+            outcome = "error"
+            self.errors += 1
+            logger.warning(f"Ошибка распознавания пачки из {len(batch)}: {e!r}")
+            if isinstance(e, BrokenProcessPool) and self._executor is executor:
+                # Процесс упал (например, OOM) - пул больше не принимает задачи, создаем новый.
+                # Остальные пачки, отправленные в сломанный пул, увидят уже замененный
+                self._executor = self._create_executor()
+                executor.shutdown(wait=False)
+                replaced = True
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+        else:
+            self.batches += 1
+            self.recognized += len(batch)
+            for item, result in zip(batch, results):
+                if not item.future.done():
+                    item.future.set_result(result)
+        finally:
+            recognition_batch_duration.observe(time.perf_counter() - started_at, (outcome,))
+            try:
+                if replaced:
+                    # Как при старте: модель загружается до следующих пачек, а не в первом запросе
+                    await self._warm_up()
+            except Exception as e:
+                logger.error(f"Не удалось прогреть новый пул распознавания: {e!r}")
+            finally:
+                self._slots.release()
+
+    async def stop(self) -> None:
+        """Дожидается отправленных пачек, отклоняет оставшиеся в очереди и останавливает процессы"""
+        if self._collector is not None:
+            self._collector.cancel()
+            await asyncio.gather(self._collector, return_exceptions=True)
+            self._collector = None
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        if self._queue is not None:
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                if not item.future.done():
+                    item.future.set_exception(RecognitionUnavailableError("Recognition is stopping"))
+            self._queue = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._slots = None
+
+    def stats(self) -> dict:
+        batches = self.batches or 1
+        return {
+            "queue_depth": self.queue_depth,
+            "in_flight_batches": len(self._batches),
+            "recognized": self.recognized,
+            "batches": self.batches,
+            "avg_batch_size": self.recognized / batches,
+            "rejected": self.rejected,
+            "errors": self.errors,
+        }
+
+
+recognizer = GestureRecognizer(
+    model=settings.recognition_model,
+    model_path=settings.recognition_model_path,
+    workers=settings.recognition_workers,
+    max_batch_size=settings.recognition_max_batch_size,
+    max_wait=settings.recognition_max_wait_ms / 1000,
+    max_queue=settings.recognition_max_queue,
+    sequence_length=settings.recognition_sequence_length,
+    points=settings.recognition_points,
+    coords=settings.recognition_coords,
+    top_k=settings.recognition_top_k,
+    enabled=settings.recognition_enabled
+)
@@ -0,0 +1,145 @@
+"""
+Код, который выполняется в процессах распознавания: предобработка
+последовательностей точек кисти и модель.
+
+Модель подключается настройкой recognition_model ("модуль:класс") и
+загружается один раз при старте процесса (init_worker), дальше процесс
+только принимает пачки. Модель должна наследовать GestureModel.
+"""
+import importlib
+from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# (метка, вероятность) по убыванию вероятности
+Prediction = List[Tuple[str, float]]
+
+
+class GestureModel(ABC):
+    """
+    Модель распознавания: на входе массив [batch, sequence_length, points, coords]
+    после preprocess, на выходе вероятности классов [batch, len(labels)].
+    """
+
+    labels: Sequence[str] = ()
+
+    def __init__(self, path: Optional[str], input_shape: Tuple[int, int, int]):
+        self.path = path
+        self.input_shape = input_shape
+
+    @abstractmethod
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+
+class DummyModel(GestureModel):
+    """
+    Заглушка для разработки и бенчмарков: случайная (но фиксированная)
+    линейная проекция признаков на классы и softmax. По стоимости похожа
+    на небольшую настоящую модель - одно матричное умножение на пачку.
+    """
+
+    CLASSES = 100
+    SEED = 0
+
+    def __init__(self, path: Optional[str], input_shape: Tuple[int, int, int]):
+        super().__init__(path, input_shape)
+        self.labels = [f"gesture_{i}" for i in range(self.CLASSES)]
+        dim = int(np.prod(input_shape))
+        rng = np.random.default_rng(self.SEED)
+        self.weights = (rng.standard_normal((dim, self.CLASSES)) / np.sqrt(dim)).astype(np.float32)
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        logits = features.reshape(len(features), -1) @ self.weights
+        logits -= logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+
+def load_model(spec: str, path: Optional[str], input_shape: Tuple[int, int, int]) -> GestureModel:
+    """Создает модель по строке "модуль:класс" """
+    module_name, _, class_name = spec.partition(":")
+    model_class = getattr(importlib.import_module(module_name), class_name)
+    return model_class(path, input_shape)
+
+
+def landmarks_array(sequence, points: int, coords: int, max_frames: int) -> np.ndarray:
+    """Последовательность из запроса -> float32 [frames, points, coords]; ValueError - не та форма"""
+    array = np.asarray(sequence, dtype=np.float32)
+    if array.ndim != 3 or array.shape[1:] != (points, coords):
+        raise ValueError(f"Expected frames of {points} points with {coords} coordinates each")
+    if not 1 <= len(array) <= max_frames:
+        raise ValueError(f"Sequence must have from 1 to {max_frames} frames")
+    if not np.isfinite(array).all():
+        raise ValueError("Coordinates must be finite numbers")
+    return array
+
+
+def preprocess(sequences: List[np.ndarray], sequence_length: int) -> np.ndarray:
+    """
+    Приводит последовательности разной длины к [batch, sequence_length, points, coords].
+
+    Ресемплинг - линейная интерполяция между соседними кадрами сразу для
+    всей пачки (индексы и веса считаются массивами, без цикла по кадрам).
+    Нормализация - начало координат в запястье (точка 0), масштаб -
+    наибольшее расстояние от запястья в кадре: признаки не зависят от
+    положения руки в кадре и расстояния до камеры.
+    """
+    lengths = np.fromiter((len(s) for s in sequences), dtype=np.intp, count=len(sequences))
+    points, coords = sequences[0].shape[1:]
+    padded = np.zeros((len(sequences), lengths.max(), points, coords), dtype=np.float32)
+    for i, sequence in enumerate(sequences):
+        padded[i, :len(sequence)] = sequence
+
+    last = (lengths - 1)[:, None]
+    positions = np.linspace(0.0, 1.0, sequence_length)[None, :] * last
+    left = np.floor(positions).astype(np.intp)
+    right = np.minimum(left + 1, last)
+    weight = (positions - left).astype(np.float32)[:, :, None, None]
+    rows = np.arange(len(sequences))[:, None]
+    frames = padded[rows, left] * (1 - weight) + padded[rows, right] * weight
+
+    frames -= frames[:, :, :1, :]
+    scale = np.linalg.norm(frames, axis=-1).max(axis=-1)[:, :, None, None]
+    frames /= np.maximum(scale, 1e-6)
+    return frames
+
+
+def top_k(probabilities: np.ndarray, labels: Sequence[str], k: int) -> List[Prediction]:
+    k = min(k, probabilities.shape[1])
+    best = np.argpartition(-probabilities, k - 1, axis=1)[:, :k]
+    scores = np.take_along_axis(probabilities, best, axis=1)
+    order = np.argsort(-scores, axis=1)
+    best = np.take_along_axis(best, order, axis=1)
+    scores = np.take_along_axis(scores, order, axis=1)
+    return [
+        [(labels[index], float(score)) for index, score in zip(row_best, row_scores)]
+        for row_best, row_scores in zip(best.tolist(), scores.tolist())
+    ]
+
+
+# Состояние процесса распознавания (заполняется init_worker)
+_model: Optional[GestureModel] = None
+_sequence_length = 0
+_top_k = 0
+
+
+def init_worker(spec: str, path: Optional[str], input_shape: Tuple[int, int, int], k: int) -> None:
+    """Инициализатор процесса пула: модель загружается один раз"""
+    global _model, _sequence_length, _top_k
+    _model = load_model(spec, path, input_shape)
+    _sequence_length = input_shape[0]
+    _top_k = k
+
+
+def run_batch(sequences: List[np.ndarray]) -> List[Prediction]:
+    """Предобработка и модель для одной пачки; по результату на последовательность"""
+    features = preprocess(sequences, _sequence_length)
+    return top_k(_model.predict(features), _model.labels, _top_k)
+
+
+def warm_up() -> None:
+    """Прогон пустой пачки: импорт и первые вызовы numpy/модели до первого запроса"""
+    points, coords = _model.input_shape[1:]
+    run_batch([np.zeros((2, points, coords), dtype=np.float32)])
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+
+import numpy as np
+
+from app.services.metrics import recognition_stream_frames, recognition_stream_lag
+from app.services.recognition import GestureRecognizer, RecognitionOverloadedError
+
+logger = logging.getLogger(__name__)
+
+
+class RecognitionStream:
+    """
+    Состояние одного потока распознавания (WebSocket соединения).
+
+    Кадры складываются в скользящее окно фиксированной длины (deque с
+    maxlen), а отдельная задача распознает окно каждые stride новых кадров.
+    Прием кадров никогда не ждет распознавания: если клиент присылает кадры
+    быстрее, чем сервер распознает, старые кадры просто вытесняются из окна,
+    и следующее распознавание берет самое свежее окно. Кадры, которые ушли
+    из окна, не попав ни в одно распознавание, считаются отброшенными.
+
+    Задержка (lag) - от приема последнего кадра окна до отправки результата.
+    """
+
+    def __init__(
+            self,
+            recognizer: GestureRecognizer,
+            window: int,
+            stride: int,
+            min_frames: int,
+            max_message_frames: int
+    ):
+        self.recognizer = recognizer
+        self.stride = stride
+        self.min_frames = min_frames
+        self.max_message_frames = max_message_frames
+        self.points = recognizer.points
+        self.coords = recognizer.coords
+
+        self._window: deque = deque(maxlen=window)
+        self._ready = asyncio.Event()
+        self._last_frame_at = 0.0
+        self._covered = 0  # кадров до конца последнего распознанного окна
+
+        # Счетчики соединения
+        self.received = 0
+        self.dropped = 0
+        self.results = 0
+        self.overloaded = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+
+    def parse(self, message: dict) -> np.ndarray:
+        """
+        Кадры из сообщения WebSocket: бинарное - подряд идущие float32 (little-endian)
+        [frames, points, coords]; текстовое - JSON {"frames": [...]} или {"frame": [...]}.
+        ValueError - сообщение не подходит.
+        """
+        data = message.get("bytes")
+        if data is not None:
+            frame_size = self.points * self.coords * 4
+            if not data or len(data) % frame_size:
+                raise ValueError(f"Binary message must contain whole frames of {frame_size} bytes")
+            frames = np.frombuffer(data, dtype="<f4").reshape(-1, self.points, self.coords)
+        else:
+            try:
+                payload = json.loads(message.get("text") or "")
+            except json.JSONDecodeError:
+                raise ValueError("Message must be JSON or binary float32 frames")
+            if not isinstance(payload, dict):
+                raise ValueError('Expected {"frames": [...]} or {"frame": [...]}')
+            if "frame" in payload:
+                payload = {"frames": [payload["frame"]]}
+            try:
+                frames = np.asarray(payload.get("frames"), dtype=np.float32)
+            except (TypeError, ValueError):
+                # Объекты, строки и списки разной длины вместо чисел
+                frames = None
+            if frames is None or frames.ndim != 3 or frames.shape[1:] != (self.points, self.coords):
+                raise ValueError(f"Expected frames of {self.points} points with {self.coords} coordinates each")
+
+        if len(frames) > self.max_message_frames:
+            raise ValueError(f"At most {self.max_message_frames} frames per message")
+        if not np.isfinite(frames).all():
+            raise ValueError("Coordinates must be finite numbers")
+        return frames
+
+    def add(self, frames: np.ndarray) -> None:
+        self._window.extend(frames)
+        self.received += len(frames)
+        self._last_frame_at = time.perf_counter()
+        recognition_stream_frames.inc(len(frames), ("received",))
+        if len(self._window) >= self.min_frames and self.received - self._covered >= self.stride:
+            self._ready.set()
+
+    async def _next_window(self):
+        await self._ready.wait()
+        self._ready.clear()
+        end = self.received
+        start = end - len(self._window)
+        if start > self._covered:
+            dropped = start - self._covered
+            self.dropped += dropped
+            recognition_stream_frames.inc(dropped, ("dropped",))
+        self._covered = end
+        return np.stack(self._window), end, self._last_frame_at
+
+    async def recognize_loop(self, send_json) -> None:
+        """Распознает свежие окна и отправляет результаты, пока задачу не отменят"""
+        while True:
+            window, end, last_frame_at = await self._next_window()
+            try:
+                top = (await self.recognizer.recognize([window]))[0]
+            except RecognitionOverloadedError:
+                # Окно пропускается, следующее будет свежее
+                self.overloaded += 1
+                continue
+
+            lag = time.perf_counter() - last_frame_at
+            self.results += 1
+            self.total_lag += lag
+            self.max_lag = max(self.max_lag, lag)
+            recognition_stream_lag.observe(lag)
+            await send_json({
+                "type": "result",
+                "frame": end,
+                "label": top[0][0],
+                "score": top[0][1],
+                "top": [{"label": label, "score": score} for label, score in top],
+                "lag_ms": lag * 1000,
+                "frames_dropped": self.dropped,
+            })
+
+    def stats(self) -> dict:
+        results = self.results or 1
+        return {
+            "frames_received": self.received,
+            "frames_dropped": self.dropped,
+            "results": self.results,
+            "overloaded": self.overloaded,
+            "avg_lag_ms": self.total_lag / results * 1000,
+            "max_lag_ms": self.max_lag * 1000,
+        }
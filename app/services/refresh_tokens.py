@@ -0,0 +1,143 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import and_, or_, select
+
+from app import models
+from app.config import settings
+from app.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class RevocationList:
+    """
+    In-process список отозванных refresh токенов (по хэшу).
+
+    Проверка при обновлении токена не ходит в БД. Список пополняется
+    сразу при отзыве в этом воркере и инкрементально синхронизируется
+    с таблицей refresh_tokens по revoked_at, чтобы видеть отзывы, сделанные
+    другими воркерами. Истекшие токены из списка выбрасываются.
+    """
+
+    # Перекрытие окна синхронизации: транзакции, закоммиченные с опозданием
+    SYNC_OVERLAP = timedelta(seconds=5)
+
+    def __init__(self, sync_batch_size: int = 10000):
+        self.sync_batch_size = sync_batch_size
+        self._revoked: Dict[str, datetime] = {}
+        self._watermark: Optional[datetime] = None
+        self.synced_at: Optional[datetime] = None
+
+    def is_revoked(self, token_hash: str) -> bool:
+        return token_hash in self._revoked
+
+    def add(self, items: Iterable[Tuple[str, datetime]]) -> None:
+        for token_hash, expires_at in items:
+            self._revoked[token_hash] = expires_at
+
+    async def sync(self) -> int:
+        """
+        Подтягивает новые отзывы из БД, возвращает количество загруженных.
+
+        Пачки идут по ключу (revoked_at, token_hash): массовый отзыв дает
+        тысячи строк с одинаковым revoked_at, и курсор только по времени
+        возвращал бы одну и ту же пачку. Перекрытие SYNC_OVERLAP применяется
+        только к первому запросу.
+        """
+        loaded = 0
+        cursor: Optional[Tuple[datetime, str]] = None
+        async with AsyncSessionLocal() as db:
+            while True:
+                query = select(
+                    models.RefreshToken.token_hash,
+                    models.RefreshToken.expires_at,
+                    models.RefreshToken.revoked_at
+                ).where(
+                    models.RefreshToken.is_revoked.is_(True),
+                    models.RefreshToken.expires_at > datetime.utcnow()
+                )
+                if cursor is not None:
+                    cursor_revoked_at, cursor_hash = cursor
+                    query = query.where(or_(
+                        models.RefreshToken.revoked_at > cursor_revoked_at,
+                        and_(
+                            models.RefreshToken.revoked_at == cursor_revoked_at,
+                            models.RefreshToken.token_hash > cursor_hash
+                        )
+                    ))
+                elif self._watermark is not None:
+                    query = query.where(
+                        models.RefreshToken.revoked_at > self._watermark - self.SYNC_OVERLAP
+                    )
+                result = await db.execute(
+                    query.order_by(
+                        models.RefreshToken.revoked_at,
+                        models.RefreshToken.token_hash
+                    ).limit(self.sync_batch_size)
+                )
+                rows = result.all()
+
+                for token_hash, expires_at, revoked_at in rows:
+                    self._revoked[token_hash] = expires_at
+                    if self._watermark is None or revoked_at > self._watermark:
+                        self._watermark = revoked_at
+                loaded += len(rows)
+                if len(rows) < self.sync_batch_size:
+                    break
+                cursor = (rows[-1].revoked_at, rows[-1].token_hash)
+
+        now = datetime.utcnow()
+        for token_hash in [h for h, expires_at in self._revoked.items() if expires_at <= now]:
+            del self._revoked[token_hash]
+
+        self.synced_at = now
+        return loaded
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._revoked),
+            "synced_at": self.synced_at.isoformat() if self.synced_at else None,
+        }
+
+
+class RefreshTokenMaintenance:
+    """
+    Фоновая синхронизация списка отзыва.
+    Истекшие токены удаляет из БД services.token_sweeper.
+    """
+
+    def __init__(self, revocations: RevocationList, sync_interval: float):
+        self.revocations = revocations
+        self.sync_interval = sync_interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.revocations.sync()
+            except Exception as e:
+                logger.exception(f"Ошибка обслуживания refresh токенов: {e}")
+            await asyncio.sleep(self.sync_interval)
+
+
+revocation_list = RevocationList()
+refresh_token_maintenance = RefreshTokenMaintenance(
+    revocation_list,
+    sync_interval=settings.refresh_token_sync_interval
+)
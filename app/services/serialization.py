@@ -0,0 +1,100 @@
+import json
+from operator import itemgetter
+from typing import Any, Iterable, List, Optional, Type
+
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy.engine import Row
+from starlette.responses import Response
+
+from app import schemas
+from app.config import settings
+
+try:
+    import orjson
+except ImportError:  # orjson не обязателен - без него используется pydantic
+    orjson = None
+
+
+class FastJSONResponse(Response):
+    """JSON ответ из уже сериализованных байтов или из dict через orjson"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+class Serializer:
+    """
+    Быстрая сериализация доверенных данных (ORM объекты, строки запросов)
+    в JSON по полям схемы.
+
+    Данные из БД уже имеют нужные типы, поэтому вместо model_validate +
+    model_dump_json для каждого ответа атрибуты просто собираются в dict
+    и отдаются orjson. Без orjson используется заранее созданный TypeAdapter
+    схемы (валидация from_attributes + dump_json).
+    """
+
+    def __init__(self, schema: Type[BaseModel]):
+        self.schema = schema
+        self.fields = tuple(schema.model_fields)
+        self.adapter = TypeAdapter(schema)
+
+    def to_dict(self, obj: Any) -> dict:
+        if isinstance(obj, dict):
+            return {field: obj.get(field) for field in self.fields}
+        return {field: getattr(obj, field, None) for field in self.fields}
+
+    def dump_json(self, obj: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(self.to_dict(obj), option=orjson.OPT_UTC_Z)
+        return self.adapter.dump_json(self.adapter.validate_python(obj, from_attributes=True))
+
+    def rows_to_dicts(self, rows: List[Any]) -> List[dict]:
+        """
+        Строки выборки (Row) - кортежи с одинаковыми колонками: позиции полей
+        схемы находятся один раз на страницу, дальше - индексация кортежа
+        вместо медленного доступа к атрибутам Row.
+        """
+        if not rows or not isinstance(rows[0], Row):
+            return [self.to_dict(row) for row in rows]
+        columns = rows[0]._fields
+        if len(self.fields) < 2 or not set(self.fields) <= set(columns):
+            return [self.to_dict(row) for row in rows]
+        getter = itemgetter(*(columns.index(field) for field in self.fields))
+        fields = self.fields
+        return [dict(zip(fields, getter(row))) for row in rows]
+
+    def dump_page(self, items: Iterable[Any], next_cursor: Optional[str]) -> bytes:
+        """Страница каталога: {"items": [...], "next_cursor": ...}"""
+        if orjson is not None:
+            page = {"items": self.rows_to_dicts(list(items)), "next_cursor": next_cursor}
+            return orjson.dumps(page, option=orjson.OPT_UTC_Z)
+        page = {
+            "items": [
+                self.adapter.dump_python(self.adapter.validate_python(item, from_attributes=True), mode="json")
+                for item in items
+            ],
+            "next_cursor": next_cursor,
+        }
+        return json.dumps(page, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+user_serializer = Serializer(schemas.UserResponse)
+token_serializer = Serializer(schemas.Token)
+video_file_serializer = Serializer(schemas.VideoFileResponse)
+video_catalog_serializer = Serializer(schemas.VideoCatalogItem)
+
+
+def fast_response(serializer: Serializer, obj: Any, status_code: int = 200):
+    """
+    В режиме fast_json_responses - готовый ответ (FastAPI не валидирует
+    его повторно по response_model), иначе - сам объект для обычного пути.
+    """
+    if not settings.fast_json_responses:
+        return obj
+    return FastJSONResponse(serializer.dump_json(obj), status_code=status_code)
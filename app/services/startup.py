@@ -0,0 +1,34 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StartupReport:
+    """Время каждой фазы запуска приложения (схема БД, шаблоны, хранилище...)"""
+
+    def __init__(self):
+        self.phases: List[Tuple[str, float]] = []
+        self._started_at = time.perf_counter()
+        self.total = 0.0
+
+    @contextmanager
+    def phase(self, name: str):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started_at))
+
+    def finish(self) -> None:
+        self.total = time.perf_counter() - self._started_at
+        phases = ", ".join(f"{name} {elapsed * 1000:.1f} мс" for name, elapsed in self.phases)
+        logger.info(f"Запуск за {self.total * 1000:.1f} мс: {phases}")
+
+    def as_dict(self) -> dict:
+        return {
+            "total_ms": self.total * 1000,
+            "phases": {name: elapsed * 1000 for name, elapsed in self.phases},
+        }
@@ -1,14 +1,239 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import AsyncIterator, Dict, List, Optional
+
+import certifi
+import urllib3
 from minio import Minio
+from minio.datatypes import Part
+from urllib3.util import Retry, Timeout
+
 from app.config import settings
+from app.services.metrics import storage_operation_duration
+
+logger = logging.getLogger(__name__)
+
+
+class StorageService:
+    """
+    Доступ к MinIO без блокировки event loop.
+
+    Создается один раз в lifespan приложения. Держит настраиваемый пул
+    соединений urllib3 (размер, таймауты, повторы), выполняет синхронный
+    клиент minio на своих пулах потоков (отдельный пул для частей загрузок,
+    чтобы большие загрузки не задерживали короткие запросы) и собирает
+    статистику задержек по операциям.
+    """
+
+    def __init__(
+            self,
+            endpoint: str,
+            access_key: str,
+            secret_key: str,
+            secure: bool,
+            bucket: str,
+            pool_size: int,
+            connect_timeout: float,
+            read_timeout: float,
+            retries: int,
+            workers: int,
+            upload_workers: int
+    ):
+        self.bucket = bucket
+        self.pool_size = pool_size
+        self.http = urllib3.PoolManager(
+            maxsize=pool_size,
+            timeout=Timeout(connect=connect_timeout, read=read_timeout),
+            cert_reqs="CERT_REQUIRED",
+            ca_certs=certifi.where(),
+            retries=Retry(
+                total=retries,
+                backoff_factor=0.2,
+                status_forcelist=[500, 502, 503, 504]
+            )
+        )
+        self.client = Minio(
+            endpoint,
+            access_key=access_key,
+            secret_key=secret_key,
+            secure=secure,
+            http_client=self.http
+        )
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="minio")
+        self._upload_executor = ThreadPoolExecutor(
+            max_workers=upload_workers, thread_name_prefix="minio-upload"
+        )
+        # операция -> [количество, ошибки, суммарное время, максимальное время]
+        self._op_stats: Dict[str, List[float]] = {}
+
+    async def _run(self, op: str, func, *args, executor: Optional[ThreadPoolExecutor] = None):
+        loop = asyncio.get_running_loop()
+        started_at = time.perf_counter()
+        failed = False
+        try:
+            return await loop.run_in_executor(executor or self._executor, func, *args)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started_at
+            stats = self._op_stats.setdefault(op, [0, 0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += failed
+            stats[2] += elapsed
+            stats[3] = max(stats[3], elapsed)
+            storage_operation_duration.observe(elapsed, (op, "error" if failed else "ok"))
+
+    async def ensure_bucket(self) -> None:
+        if not await self._run("bucket_exists", self.client.bucket_exists, self.bucket):
+            await self._run("make_bucket", self.client.make_bucket, self.bucket)
+
+    async def stat_object(self, object_name: str):
+        return await self._run("stat_object", self.client.stat_object, self.bucket, object_name)
+
+    async def remove_object(self, object_name: str) -> None:
+        await self._run("remove_object", self.client.remove_object, self.bucket, object_name)
+
+    async def presigned_get_object(self, object_name: str, expires: timedelta) -> str:
+        return await self._run(
+            "presigned_get_object", self.client.presigned_get_object,
+            self.bucket, object_name, expires
+        )
+
+    async def iter_object(
+            self, object_name: str, offset: int = 0, length: int = 0, chunk_size: int = 256 * 1024
+    ) -> AsyncIterator[bytes]:
+        """Читает диапазон объекта кусками; length=0 - до конца объекта"""
+        response = await self._run(
+            "get_object", self.client.get_object, self.bucket, object_name, offset, length
+        )
+        loop = asyncio.get_running_loop()
+        stream = response.stream(chunk_size)
+        try:
+            while True:
+                chunk = await loop.run_in_executor(self._executor, next, stream, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            response.close()
+            # Возвращаем соединение в пул для повторного использования
+            response.release_conn()
+
+    async def read_range(self, object_name: str, offset: int, length: int) -> bytes:
+        """Читает небольшой диапазон объекта целиком"""
+        def read() -> bytes:
+            response = self.client.get_object(self.bucket, object_name, offset, length)
+            try:
+                return response.read()
+            finally:
+                response.close()
+                response.release_conn()
+
+        return await self._run("get_object", read)
+
+    # Multipart upload - части идут через отдельный пул потоков
+    async def create_multipart_upload(self, object_name: str, content_type: str) -> str:
+        return await self._run(
+            "create_multipart_upload", self.client._create_multipart_upload,
+            self.bucket, object_name, {"Content-Type": content_type}
+        )
+
+    async def upload_part(self, object_name: str, upload_id: str, part_number: int, data: bytes) -> Part:
+        etag = await self._run(
+            "upload_part", self.client._upload_part,
+            self.bucket, object_name, data, None, upload_id, part_number,
+            executor=self._upload_executor
+        )
+        return Part(part_number, etag)
+
+    async def complete_multipart_upload(self, object_name: str, upload_id: str, parts: List[Part]) -> str:
+        result = await self._run(
+            "complete_multipart_upload", self.client._complete_multipart_upload,
+            self.bucket, object_name, upload_id, parts
+        )
+        return result.etag
+
+    async def abort_multipart_upload(self, object_name: str, upload_id: str) -> None:
+        await self._run(
+            "abort_multipart_upload", self.client._abort_multipart_upload,
+            self.bucket, object_name, upload_id
+        )
+
+    def stats(self) -> dict:
+        operations = {
+            op: {
+                "count": count,
+                "errors": errors,
+                "avg_ms": total / count * 1000 if count else 0.0,
+                "max_ms": max_time * 1000,
+            }
+            for op, (count, errors, total, max_time) in self._op_stats.items()
+        }
+
+        pools = {}
+        for key in list(self.http.pools.keys()):
+            pool = self.http.pools.get(key)
+            if pool is None:
+                continue
+            idle = pool.pool.qsize() if pool.pool is not None else 0
+            pools[f"{key.key_host}:{key.key_port}"] = {
+                "maxsize": self.pool_size,
+                "in_use": self.pool_size - idle,
+                "connections_created": pool.num_connections,
+                "requests": pool.num_requests,
+            }
+
+        return {"operations": operations, "pools": pools}
+
+    def close(self) -> None:
+        self._upload_executor.shutdown(wait=True)
+        self._executor.shutdown(wait=True)
+        self.http.clear()
+
+
+_storage: Optional[StorageService] = None
+
+
+def init_storage() -> StorageService:
+    """Создает сервис хранилища (вызывается из lifespan)"""
+    global _storage
+    _storage = StorageService(
+        settings.minio_endpoint,
+        access_key=settings.minio_access_key,
+        secret_key=settings.minio_secret_key,
+        secure=settings.minio_secure,
+        bucket=settings.minio_bucket,
+        pool_size=settings.minio_pool_size,
+        connect_timeout=settings.minio_connect_timeout,
+        read_timeout=settings.minio_read_timeout,
+        retries=settings.minio_retries,
+        workers=settings.minio_workers,
+        upload_workers=settings.video_upload_threads
+    )
+    return _storage
+
+
+async def check_bucket(storage: StorageService) -> None:
+    """Проверяет бакет при старте, не блокируя запуск, если MinIO недоступен"""
+    try:
+        await asyncio.wait_for(storage.ensure_bucket(), timeout=settings.minio_startup_timeout)
+    except Exception as e:
+        logger.warning(f"Не удалось проверить бакет {storage.bucket} в MinIO: {e!r}")
+
 
-client = Minio(
-    settings.minio_endpoint,
-    access_key=settings.minio_access_key,
-    secret_key=settings.minio_secret_key,
-    secure=settings.minio_secure
-)
+def close_storage() -> None:
+    global _storage
+    if _storage is not None:
+        _storage.close()
+        _storage = None
 
-bucket = settings.minio_bucket
 
-if not client.bucket_exists(bucket):
-    client.make_bucket(bucket)
+def get_storage() -> StorageService:
+    """Dependency: сервис хранилища, созданный в lifespan"""
+    if _storage is None:
+        raise RuntimeError("Storage service is not initialized")
+    return _storage
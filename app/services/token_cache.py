@@ -0,0 +1,80 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.config import settings
+
+
+class TokenCache:
+    """
+    Кэш результатов проверки access токенов.
+
+    Один и тот же токен приходит сотни раз за время жизни, поэтому
+    после первой полной проверки (подпись + claims) результат хранится
+    по sha256 токена до его exp. Хранится только то, что нужно
+    verify_token (public_id и iat), сам токен в памяти не остается.
+    Размер ограничен (LRU). Отзыв токенов кэш не затрагивает: его проверяет
+    get_current_user по iat и users.tokens_valid_after.
+    """
+
+    def __init__(self, max_size: int, enabled: bool = True):
+        self.max_size = max_size
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # digest -> (exp в unix-времени, public_id, iat)
+        self._data: "OrderedDict[bytes, Tuple[float, str, Optional[float]]]" = OrderedDict()
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, digest: bytes) -> Optional[Tuple[str, Optional[float]]]:
+        if not self.enabled:
+            return None
+
+        item = self._data.get(digest)
+        if item is None:
+            self.misses += 1
+            return None
+
+        expires_at, public_id, issued_at = item
+        if expires_at <= time.time():
+            del self._data[digest]
+            self.evictions += 1
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(digest)
+        self.hits += 1
+        return public_id, issued_at
+
+    def set(self, digest: bytes, expires_at: float, public_id: str, issued_at: Optional[float]) -> None:
+        if not self.enabled:
+            return
+
+        self._data[digest] = (expires_at, public_id, issued_at)
+        self._data.move_to_end(digest)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+token_cache = TokenCache(
+    max_size=settings.token_cache_max_size,
+    enabled=settings.token_cache_enabled
+)
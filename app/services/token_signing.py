@@ -0,0 +1,146 @@
+import glob
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+
+from app.config import settings
+
+
+class InvalidTokenError(Exception):
+    """Подпись или claims токена не прошли проверку"""
+
+
+class KeyRing:
+    """
+    Ключи для асимметричных алгоритмов (RS256, ES256, EdDSA...).
+
+    Ключи лежат в keys_dir: <kid>.pem - закрытый, <kid>.pub.pem - открытый.
+    Токены подписываются ключом signing_kid, а проверяются любым известным
+    открытым ключом по kid из заголовка - так старые токены остаются
+    валидными после ротации ключа, пока его .pub.pem не удален.
+    """
+
+    def __init__(self, keys_dir: str, signing_kid: str):
+        self.signing_kid = signing_kid
+        with open(os.path.join(keys_dir, f"{signing_kid}.pem"), "r") as f:
+            self.signing_key = f.read()
+
+        self.public_keys: Dict[str, str] = {}
+        for path in glob.glob(os.path.join(keys_dir, "*.pub.pem")):
+            kid = os.path.basename(path)[:-len(".pub.pem")]
+            with open(path, "r") as f:
+                self.public_keys[kid] = f.read()
+
+    def public_key(self, kid: Optional[str]) -> str:
+        key = self.public_keys.get(kid) if kid else None
+        if key is None:
+            raise InvalidTokenError(f"Unknown key id: {kid}")
+        return key
+
+
+class SigningBackend(ABC):
+    """Подпись и проверка JWT. Симметричные алгоритмы используют secret_key"""
+
+    def __init__(self, algorithm: str, secret_key: str, keyring: Optional[KeyRing] = None):
+        self.algorithm = algorithm
+        self.secret_key = secret_key
+        self.keyring = keyring
+        self.symmetric = algorithm.startswith("HS")
+        if not self.symmetric and keyring is None:
+            raise ValueError(f"Algorithm {algorithm} requires jwt_keys_dir and jwt_signing_kid")
+
+    @abstractmethod
+    def encode(self, claims: dict) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def decode(self, token: str) -> dict:
+        raise NotImplementedError
+
+
+class JoseBackend(SigningBackend):
+    """python-jose (используется по умолчанию)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        from jose import jwt, JWTError
+
+        self._jwt = jwt
+        self._error = JWTError
+
+    def encode(self, claims: dict) -> str:
+        if self.symmetric:
+            return self._jwt.encode(claims, self.secret_key, algorithm=self.algorithm)
+        return self._jwt.encode(
+            claims, self.keyring.signing_key, algorithm=self.algorithm,
+            headers={"kid": self.keyring.signing_kid}
+        )
+
+    def decode(self, token: str) -> dict:
+        try:
+            if self.symmetric:
+                key = self.secret_key
+            else:
+                key = self.keyring.public_key(self._jwt.get_unverified_header(token).get("kid"))
+            return self._jwt.decode(token, key, algorithms=[self.algorithm])
+        except self._error as e:
+            raise InvalidTokenError(str(e))
+
+
+class PyJWTBackend(SigningBackend):
+    """PyJWT + cryptography (требуется пакет PyJWT[crypto])"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        import jwt
+
+        self._jwt = jwt
+        # Ключи разбираются один раз, а не на каждый токен
+        if not self.symmetric:
+            from jwt.algorithms import get_default_algorithms
+
+            algorithm = get_default_algorithms()[self.algorithm]
+            self._signing_key = algorithm.prepare_key(self.keyring.signing_key)
+            self._public_keys = {
+                kid: algorithm.prepare_key(pem) for kid, pem in self.keyring.public_keys.items()
+            }
+
+    def encode(self, claims: dict) -> str:
+        if self.symmetric:
+            return self._jwt.encode(claims, self.secret_key, algorithm=self.algorithm)
+        return self._jwt.encode(
+            claims, self._signing_key, algorithm=self.algorithm,
+            headers={"kid": self.keyring.signing_kid}
+        )
+
+    def decode(self, token: str) -> dict:
+        try:
+            if self.symmetric:
+                key = self.secret_key
+            else:
+                kid = self._jwt.get_unverified_header(token).get("kid")
+                key = self._public_keys.get(kid)
+                if key is None:
+                    raise InvalidTokenError(f"Unknown key id: {kid}")
+            return self._jwt.decode(token, key, algorithms=[self.algorithm])
+        except self._jwt.PyJWTError as e:
+            raise InvalidTokenError(str(e))
+
+
+BACKENDS = {
+    "jose": JoseBackend,
+    "pyjwt": PyJWTBackend,
+}
+
+
+def create_backend(
+        backend: str = settings.jwt_backend,
+        algorithm: str = settings.algorithm
+) -> SigningBackend:
+    keyring = None
+    if settings.jwt_keys_dir and settings.jwt_signing_kid:
+        keyring = KeyRing(settings.jwt_keys_dir, settings.jwt_signing_kid)
+    return BACKENDS[backend](algorithm, settings.secret_key, keyring)
+
+
+signer = create_backend()
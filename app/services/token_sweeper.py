@@ -0,0 +1,139 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import select, update, delete
+
+from app import models
+from app.config import settings
+from app.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class TokenSweeper:
+    """
+    Периодическая очистка просроченных токенов.
+
+    - email_verifications и refresh_tokens: просроченные строки удаляются;
+    - users.verification_token / users.reset_token: просроченные токены
+      обнуляются (строка пользователя остается).
+
+    Работа идет небольшими пачками по id (keyset), каждая пачка - отдельная
+    короткая транзакция, чтобы не держать блокировки. Кандидаты ищутся по
+    индексам на колонках срока действия (для users - частичным).
+    """
+
+    def __init__(self, interval: float, batch_size: int):
+        self.interval = interval
+        self.batch_size = batch_size
+        # Сколько строк освобождено за последний запуск и всего
+        self.last_run: Dict[str, int] = {}
+        self.last_run_at: Optional[datetime] = None
+        self.totals: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.exception(f"Ошибка очистки просроченных токенов: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def sweep(self) -> Dict[str, int]:
+        """Один проход по всем таблицам, возвращает количество строк по таблицам"""
+        now = datetime.utcnow()
+        reclaimed = {
+            "email_verifications": await self._delete_expired(
+                models.EmailVerification, models.EmailVerification.expires_at < now
+            ),
+            "refresh_tokens": await self._delete_expired(
+                models.RefreshToken, models.RefreshToken.expires_at < now
+            ),
+            "users.verification_token": await self._clear_expired(
+                models.User.verification_token.is_not(None),
+                models.User.verification_token_expires < now,
+                values={"verification_token": None, "verification_token_expires": None}
+            ),
+            "users.reset_token": await self._clear_expired(
+                models.User.reset_token.is_not(None),
+                models.User.reset_token_expires < now,
+                values={"reset_token": None, "reset_token_expires": None}
+            ),
+        }
+
+        self.last_run = reclaimed
+        self.last_run_at = now
+        for name, count in reclaimed.items():
+            self.totals[name] = self.totals.get(name, 0) + count
+        logger.info(f"Очистка просроченных токенов: {reclaimed}")
+        return reclaimed
+
+    async def _batches(self, model, *conditions):
+        """id просроченных строк пачками по batch_size (keyset по id)"""
+        last_id = 0
+        async with AsyncSessionLocal() as db:
+            while True:
+                result = await db.execute(
+                    select(model.id)
+                    .where(*conditions, model.id > last_id)
+                    .order_by(model.id)
+                    .limit(self.batch_size)
+                )
+                ids = result.scalars().all()
+                if not ids:
+                    return
+                yield db, ids
+                last_id = ids[-1]
+                if len(ids) < self.batch_size:
+                    return
+
+    async def _delete_expired(self, model, *conditions) -> int:
+        total = 0
+        async for db, ids in self._batches(model, *conditions):
+            result = await db.execute(delete(model).where(model.id.in_(ids)))
+            await db.commit()
+            total += result.rowcount
+        return total
+
+    async def _clear_expired(self, *conditions, values: dict) -> int:
+        total = 0
+        async for db, ids in self._batches(models.User, *conditions):
+            # Условия повторяются: токен мог быть перевыпущен между SELECT и UPDATE
+            result = await db.execute(
+                update(models.User)
+                .where(models.User.id.in_(ids), *conditions)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            total += result.rowcount
+        return total
+
+    def stats(self) -> dict:
+        return {
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_run": self.last_run,
+            "totals": self.totals,
+        }
+
+
+token_sweeper = TokenSweeper(
+    interval=settings.token_sweep_interval,
+    batch_size=settings.token_sweep_batch_size
+)
@@ -0,0 +1,189 @@
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Optional, Tuple, Union
+
+from app import models
+from app.config import settings
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """
+    Снимок пользователя из кэша - только для чтения. Это не ORM объект:
+    его нельзя передать в db.add/db.merge, у него нет связей. Чтобы изменить
+    пользователя, загрузите строку из БД по id (как crud.update_user_profile).
+    Хэш пароля и одноразовые токены не кэшируются.
+    """
+    id: int
+    public_id: str
+    email: str
+    username: str
+    is_active: bool
+    is_verified: bool
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    tokens_valid_after: Optional[datetime]
+    full_name: Optional[str]
+    avatar_url: Optional[str]
+
+
+# Поля, которые попадают в кэш
+SNAPSHOT_FIELDS = tuple(field.name for field in fields(CachedUser))
+DATETIME_FIELDS = ("created_at", "updated_at", "tokens_valid_after")
+
+# Текущий пользователь: строка из БД при промахе кэша или снимок при попадании
+AnyUser = Union[models.User, CachedUser]
+
+
+class UserCacheBackend(ABC):
+    """Хранилище снимков пользователей. Ключ - public_id, значение - dict полей"""
+
+    evictions = 0
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set(self, key: str, value: dict) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def size(self) -> int:
+        return -1
+
+
+class MemoryUserCacheBackend(UserCacheBackend):
+    """In-process кэш с TTL и вытеснением давно не используемых записей (LRU)"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.evictions = 0
+        self._data: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[dict]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.evictions += 1
+            return None
+
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: dict) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def size(self) -> int:
+        return len(self._data)
+
+
+class RedisUserCacheBackend(UserCacheBackend):
+    """
+    Общий для всех воркеров кэш в Redis (требуется пакет redis).
+    Инвалидация в одном воркере сразу видна остальным.
+    """
+
+    def __init__(self, url: str, ttl: float, prefix: str = "user:"):
+        import redis.asyncio as redis
+
+        self.ttl = ttl
+        self.prefix = prefix
+        self._redis = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[dict]:
+        raw = await self._redis.get(self.prefix + key)
+        if raw is None:
+            return None
+        value = json.loads(raw)
+        for field in DATETIME_FIELDS:
+            if value.get(field):
+                value[field] = datetime.fromisoformat(value[field])
+        return value
+
+    async def set(self, key: str, value: dict) -> None:
+        raw = json.dumps(value, default=lambda v: v.isoformat())
+        await self._redis.set(self.prefix + key, raw, px=int(self.ttl * 1000))
+
+    async def delete(self, key: str) -> None:
+        await self._redis.delete(self.prefix + key)
+
+
+class UserCache:
+    """
+    Кэш аутентифицированных пользователей для get_current_user.
+
+    Хранит снимки строк users по public_id и возвращает их как CachedUser
+    (только чтение). Любое изменение пользователя должно сопровождаться
+    invalidate(public_id).
+    """
+
+    def __init__(self, backend: UserCacheBackend, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get(self, public_id: str) -> Optional[CachedUser]:
+        if not self.enabled:
+            return None
+
+        snapshot = await self.backend.get(public_id)
+        if snapshot is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return CachedUser(**snapshot)
+
+    async def set(self, user: models.User) -> None:
+        if not self.enabled:
+            return
+        snapshot = {field: getattr(user, field) for field in SNAPSHOT_FIELDS}
+        await self.backend.set(user.public_id, snapshot)
+
+    async def invalidate(self, public_id: Optional[str]) -> None:
+        if not self.enabled or public_id is None:
+            return
+        self.invalidations += 1
+        await self.backend.delete(public_id)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.backend.evictions,
+            "invalidations": self.invalidations,
+            "size": self.backend.size(),
+        }
+
+
+def create_backend() -> UserCacheBackend:
+    if settings.user_cache_backend == "redis":
+        return RedisUserCacheBackend(settings.user_cache_redis_url, settings.user_cache_ttl)
+    return MemoryUserCacheBackend(settings.user_cache_max_size, settings.user_cache_ttl)
+
+
+user_cache = UserCache(create_backend(), enabled=settings.user_cache_enabled)
@@ -0,0 +1,113 @@
+import re
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Awaitable, Callable, Optional, Tuple
+
+from app.config import settings
+
+
+class RangeNotSatisfiableError(Exception):
+    """Запрошенный диапазон лежит за пределами файла (416)"""
+
+
+# Элемент списка If-None-Match: * или ETag, слабый (W/"...") либо сильный ("...")
+ETAG_RE = re.compile(r'\*|(?:W/)?"[^"]*"')
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Совпадает ли ETag с If-None-Match: заголовок - список через запятую
+    или *, сравнение слабое (префикс W/ не учитывается), как требует RFC 9110.
+    """
+    if not if_none_match:
+        return False
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in ETAG_RE.findall(if_none_match):
+        if candidate == "*" or (candidate[2:] if candidate.startswith("W/") else candidate) == opaque:
+            return True
+    return False
+
+
+def parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Разбирает заголовок Range. Возвращает (start, end) включительно или None,
+    если заголовок нужно проигнорировать и отдать файл целиком
+    (другая единица измерения, несколько диапазонов, синтаксическая ошибка).
+    """
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+
+    start_str, sep, end_str = ranges.strip().partition("-")
+    if not sep:
+        return None
+
+    try:
+        if start_str == "":
+            # bytes=-500 - последние 500 байт
+            suffix = int(end_str)
+            if suffix <= 0:
+                raise RangeNotSatisfiableError()
+            start, end = max(size - suffix, 0), size - 1
+        else:
+            start = int(start_str)
+            end = int(end_str) if end_str else size - 1
+    except ValueError:
+        return None
+
+    if start >= size:
+        raise RangeNotSatisfiableError()
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+class PresignedUrlCache:
+    """
+    Кэш presigned GET ссылок на объекты MinIO.
+
+    Ссылка переиспользуется, пока до ее истечения остается больше
+    refresh_margin секунд, после чего генерируется новая. Так клиенты
+    получают одинаковые URL (и кэшируют видео в браузере), а подпись
+    не считается на каждый запрос.
+    """
+
+    def __init__(self, ttl: int, refresh_margin: int, max_size: int = 10000):
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.max_size = max_size
+        self._data: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(
+            self,
+            object_name: str,
+            generate: Callable[[str, timedelta], Awaitable[str]]
+    ) -> Tuple[str, float]:
+        """Возвращает (url, время истечения в unix time)"""
+        now = time.time()
+        item = self._data.get(object_name)
+        if item is not None and item[0] - self.refresh_margin > now:
+            self.hits += 1
+            self._data.move_to_end(object_name)
+            return item[1], item[0]
+
+        self.misses += 1
+        url = await generate(object_name, timedelta(seconds=self.ttl))
+        expires_at = now + self.ttl
+        self._data[object_name] = (expires_at, url)
+        self._data.move_to_end(object_name)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+        return url, expires_at
+
+    def invalidate(self, object_name: str) -> None:
+        self._data.pop(object_name, None)
+
+
+presigned_urls = PresignedUrlCache(
+    ttl=settings.video_presigned_url_ttl,
+    refresh_margin=settings.video_presigned_url_refresh_margin
+)
@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Set
+
+from sqlalchemy import select
+
+from app import crud, models
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.services import media_probe
+from app.services.media_probe import ProbeError, ProbeResult
+from app.services.metrics import video_probe_duration
+from app.services.storage import StorageService
+
+logger = logging.getLogger(__name__)
+
+# Сколько раз можно дочитать диапазон для одного файла (moov в середине и т.п.)
+MAX_READ_ROUNDS = 6
+
+
+class VideoProber:
+    """
+    Разбор заголовков загруженных видео: длительность, разрешение, частота
+    кадров и кодеки.
+
+    Из MinIO читаются только начало и конец объекта (плюс диапазоны, которые
+    попросит парсер), сам разбор идет в пуле процессов, чтобы не занимать
+    event loop. Результат пишется в колонки VideoFile; видео, которые не
+    успели разобрать (остановка сервера, недоступен MinIO), остаются
+    в статусе pending и подбираются командой python -m app.probe_videos.
+    """
+
+    def __init__(self, workers: int, concurrency: int, head_size: int, tail_size: int, enabled: bool = True):
+        self.workers = workers
+        self.concurrency = concurrency
+        self.head_size = head_size
+        self.tail_size = tail_size
+        self.enabled = enabled
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+        # Счетчики
+        self.probed = 0
+        self.failed = 0
+        self.errors = 0
+        self.bytes_read = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: fork процесса с работающими пулами потоков (MinIO, БД) небезопасен
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def _read(self, storage: StorageService, object_name: str, offset: int, length: int) -> bytes:
+        data = await storage.read_range(object_name, offset, length)
+        self.bytes_read += len(data)
+        return data
+
+    async def probe_object(self, storage: StorageService, object_name: str, size: int) -> ProbeResult:
+        """Разбирает заголовки объекта; ProbeError - формат не поддерживается или файл поврежден"""
+        if not size:
+            raise ProbeError("Empty object")
+
+        if size <= self.head_size + self.tail_size:
+            chunks: Dict[int, bytes] = {0: await self._read(storage, object_name, 0, size)}
+        else:
+            tail_offset = size - self.tail_size
+            head, tail = await asyncio.gather(
+                self._read(storage, object_name, 0, self.head_size),
+                self._read(storage, object_name, tail_offset, self.tail_size)
+            )
+            chunks = {0: head, tail_offset: tail}
+
+        loop = asyncio.get_running_loop()
+        for _ in range(MAX_READ_ROUNDS):
+            result = await loop.run_in_executor(self._get_executor(), media_probe.probe, chunks, size)
+            if isinstance(result, ProbeResult):
+                return result
+            offset, length = result
+            chunks[offset] = await self._read(storage, object_name, offset, length)
+        raise ProbeError(f"Headers not found after {MAX_READ_ROUNDS} range reads")
+
+    async def probe_video(
+            self, storage: StorageService, video_id: int, object_name: str, size: Optional[int]
+    ) -> Optional[str]:
+        """Разбирает одно видео и сохраняет результат; возвращает новый статус или None при сбое"""
+        async with self._get_semaphore():
+            started_at = time.perf_counter()
+            try:
+                if size is None:
+                    size = (await storage.stat_object(object_name)).size
+                result = await self.probe_object(storage, object_name, size)
+            except ProbeError as e:
+                self.failed += 1
+                video_probe_duration.observe(time.perf_counter() - started_at, ("failed",))
+                logger.info(f"Видео {video_id}: заголовки не разобраны: {e}")
+                status, metadata = "failed", None
+            except Exception as e:
+                # MinIO недоступен и т.п. - остается pending до следующей попытки
+                self.errors += 1
+                video_probe_duration.observe(time.perf_counter() - started_at, ("error",))
+                logger.warning(f"Видео {video_id}: ошибка разбора заголовков: {e!r}")
+                return None
+            else:
+                self.probed += 1
+                video_probe_duration.observe(time.perf_counter() - started_at, ("ok",))
+                status, metadata = "ok", result.as_dict()
+
+        try:
+            async with AsyncSessionLocal() as db:
+                await crud.save_video_probe(db, video_id, status, metadata)
+        except Exception as e:
+            # Результат не сохранен - видео остается pending до следующей попытки
+            self.errors += 1
+            logger.warning(f"Видео {video_id}: не удалось сохранить результат разбора: {e!r}")
+            return None
+        return status
+
+    def submit(self, storage: StorageService, video: models.VideoFile) -> None:
+        """Запускает разбор только что загруженного видео в фоне"""
+        if not self.enabled:
+            return
+        task = asyncio.create_task(self.probe_video(storage, video.id, video.object_name, video.size))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def backfill(self, storage: StorageService, batch_size: int = 100, retry_failed: bool = False) -> Dict[str, int]:
+        """
+        Разбирает все видео в статусе pending (и failed при retry_failed).
+        Пачки по id (keyset), внутри пачки - параллельно в пределах concurrency.
+        """
+        statuses = ["pending", "failed"] if retry_failed else ["pending"]
+        totals: Dict[str, int] = {"ok": 0, "failed": 0, "error": 0}
+        last_id = 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(models.VideoFile.id, models.VideoFile.object_name, models.VideoFile.size)
+                    .where(models.VideoFile.probe_status.in_(statuses), models.VideoFile.id > last_id)
+                    .order_by(models.VideoFile.id)
+                    .limit(batch_size)
+                )
+                rows = result.all()
+            if not rows:
+                return totals
+
+            # Сбой одного видео не должен останавливать весь проход
+            outcomes = await asyncio.gather(*(
+                self.probe_video(storage, row.id, row.object_name, row.size) for row in rows
+            ), return_exceptions=True)
+            for row, outcome in zip(rows, outcomes):
+                if isinstance(outcome, BaseException):
+                    logger.error(f"Видео {row.id}: сбой разбора заголовков: {outcome!r}")
+                    outcome = None
+                totals[outcome or "error"] += 1
+            last_id = rows[-1].id
+            logger.info(f"Разбор заголовков: до id {last_id}, {totals}")
+
+    async def stop(self) -> None:
+        """Дожидается начатых разборов и останавливает пул процессов"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._semaphore = None
+
+    def stats(self) -> dict:
+        return {
+            "in_progress": len(self._tasks),
+            "probed": self.probed,
+            "failed": self.failed,
+            "errors": self.errors,
+            "bytes_read": self.bytes_read,
+        }
+
+
+video_prober = VideoProber(
+    workers=settings.video_probe_workers,
+    concurrency=settings.video_probe_concurrency,
+    head_size=settings.video_probe_head_size,
+    tail_size=settings.video_probe_tail_size,
+    enabled=settings.video_probe_enabled
+)
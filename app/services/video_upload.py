@@ -0,0 +1,132 @@
+import asyncio
+import hashlib
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+
+from minio.datatypes import Part
+
+from app.services.storage import StorageService
+
+
+class UploadTooLargeError(Exception):
+    """Размер загружаемого файла превышает video_max_size"""
+
+
+class EmptyUploadError(Exception):
+    """Тело запроса пустое"""
+
+
+class ContentHashMismatchError(Exception):
+    """SHA-256 загруженных байтов не совпал с заявленным клиентом"""
+
+
+class DuplicateContentError(Exception):
+    """Такое содержимое уже сохранено - multipart upload отменен, объект не создан"""
+
+    def __init__(self, sha256: str, size: int):
+        super().__init__(f"Content {sha256} is already stored")
+        self.sha256 = sha256
+        self.size = size
+
+
+class StreamingUploader:
+    """
+    Потоковая загрузка в MinIO через multipart upload.
+
+    Тело запроса режется на части по part_size и отправляется в MinIO
+    параллельно (клиент minio синхронный, поэтому части уходят через
+    ограниченный пул потоков StorageService). Памяти на одну загрузку нужно не больше
+    max_memory: текущий буфер + части, которые сейчас отправляются.
+    Объект появляется в бакете только после complete; при любой ошибке
+    multipart upload отменяется. По ходу чтения считается SHA-256 содержимого
+    (для дедупликации); если клиент заранее сообщил хэш, он проверяется
+    до complete - при несовпадении объект не создается. Так же до complete
+    вызывается is_stored(sha256): если содержимое уже есть, загрузка
+    отменяется и второй объект в MinIO не появляется.
+    """
+
+    def __init__(
+            self,
+            storage: StorageService,
+            part_size: int,
+            concurrency: int,
+            max_memory: int,
+            max_size: int
+    ):
+        self.storage = storage
+        self.part_size = part_size
+        self.max_size = max_size
+        # Один part_size всегда занят буфером, остальное - части в полете
+        self.max_in_flight = max(1, min(concurrency, max_memory // part_size - 1))
+
+    async def upload(
+            self,
+            stream: AsyncIterator[bytes],
+            object_name: str,
+            content_type: str,
+            expected_sha256: Optional[str] = None,
+            is_stored: Optional[Callable[[str], Awaitable[bool]]] = None
+    ) -> Tuple[int, str, str]:
+        """Загружает поток в объект object_name, возвращает размер в байтах, ETag и SHA-256"""
+        upload_id = await self.storage.create_multipart_upload(object_name, content_type)
+
+        slots = asyncio.Semaphore(self.max_in_flight)
+        tasks: List[asyncio.Task] = []
+        part_number = 0
+        size = 0
+        digest = hashlib.sha256()
+
+        async def upload_part(data: bytes, number: int) -> Part:
+            try:
+                return await self.storage.upload_part(object_name, upload_id, number, data)
+            finally:
+                slots.release()
+
+        async def submit(data: bytes) -> None:
+            nonlocal part_number
+            # Ждем, пока освободится место - так ограничивается память
+            await slots.acquire()
+            for task in tasks:
+                # Ошибку уже отправленной части поднимаем сразу, не дочитывая тело
+                if task.done() and task.exception() is not None:
+                    slots.release()
+                    raise task.exception()
+            part_number += 1
+            tasks.append(asyncio.create_task(upload_part(data, part_number)))
+
+        try:
+            buffer = bytearray()
+            async for chunk in stream:
+                size += len(chunk)
+                if size > self.max_size:
+                    raise UploadTooLargeError(f"File is larger than {self.max_size} bytes")
+
+                digest.update(chunk)
+                buffer += chunk
+                while len(buffer) >= self.part_size:
+                    await submit(bytes(buffer[:self.part_size]))
+                    del buffer[:self.part_size]
+
+            if size == 0:
+                raise EmptyUploadError("Empty file")
+
+            sha256 = digest.hexdigest()
+            if expected_sha256 is not None and sha256 != expected_sha256:
+                raise ContentHashMismatchError(f"Content SHA-256 is {sha256}, expected {expected_sha256}")
+            if is_stored is not None and await is_stored(sha256):
+                raise DuplicateContentError(sha256, size)
+
+            # Последняя часть может быть меньше part_size
+            if buffer:
+                await submit(bytes(buffer))
+                buffer = bytearray()
+
+            parts = await asyncio.gather(*tasks)
+            etag = await self.storage.complete_multipart_upload(object_name, upload_id, list(parts))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.storage.abort_multipart_upload(object_name, upload_id)
+            raise
+
+        return size, etag, sha256
@@ -0,0 +1,299 @@
+"""
+Нагрузочный бенчмарк API: приложение целиком (middleware, зависимости,
+фоновые задачи из lifespan) через httpx.AsyncClient + ASGITransport,
+база - временный SQLite (aiosqlite), MinIO и SMTP - заглушки из stubs.py.
+
+Для каждого сценария печатаются пропускная способность и p50/p95/p99.
+С --save-baseline результаты сохраняются в baseline.json (лежит в репозитории,
+снят на машине, указанной в поле machine), без него - сравниваются с ним: если p95 вырос или пропускная способность
+упала больше чем на --max-regression, скрипт завершается с кодом 1.
+
+    python benchmarks/bench_api.py --save-baseline
+    python benchmarks/bench_api.py --max-regression 0.2
+    python benchmarks/bench_api.py --scenarios users_me,refresh -n 2000 -c 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict, List
+
+import common
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="bench-api-"), "bench.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+# Фоновые задачи пишут в ту же базу: ждать блокировку SQLite, а не падать через 5 с
+os.environ.setdefault("DATABASE_URL_ASYNC", f"sqlite+aiosqlite:///{DB_PATH}?timeout=30")
+os.environ.setdefault("DB_SCHEMA_CHECK", "false")
+# Файлы индекса жестов - рядом с базой, а не в текущем каталоге
+os.environ.setdefault("GESTURE_INDEX_DIR", os.path.join(os.path.dirname(DB_PATH), "gesture_index"))
+os.environ.setdefault("SMTP_USE_TLS", "false")
+# Бенчмарк сам создает всплеск регистраций и логинов с одного IP
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+common.setup_env()
+
+import httpx  # noqa: E402
+from sqlalchemy import update  # noqa: E402
+
+import stubs  # noqa: E402
+
+stubs.install()
+
+from app import models  # noqa: E402
+from app.database import Base, AsyncSessionLocal, get_sync_engine, dispose_sync_engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+PASSWORD = "Bench12345"
+VIDEO_SIZE = 256 * 1024
+
+# Сценарий: (client, номер запроса, состояние воркера) -> ответ
+RequestFunc = Callable[[httpx.AsyncClient, int, dict], Awaitable[httpx.Response]]
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(
+        client: httpx.AsyncClient,
+        request: RequestFunc,
+        total: int,
+        concurrency: int,
+        expected_status: int,
+        worker_states: List[dict]
+) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker(state: dict) -> None:
+        nonlocal errors
+        for i in counter:
+            started_at = time.perf_counter()
+            response = await request(client, i, state)
+            latencies.append(time.perf_counter() - started_at)
+            if response.status_code != expected_status:
+                errors += 1
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker(worker_states[w]) for w in range(concurrency)))
+    elapsed = time.perf_counter() - started_at
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "rps": total / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+async def create_users(client: httpx.AsyncClient, prefix: str, count: int) -> List[dict]:
+    """Регистрирует и подтверждает пользователей, возвращает их токены"""
+    users = []
+    for i in range(count):
+        email = f"{prefix}{i}@example.com"
+        response = await client.post(
+            "/auth/register", json={"email": email, "username": f"{prefix}{i}", "password": PASSWORD}
+        )
+        response.raise_for_status()
+        users.append({"email": email})
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(models.User)
+            .where(models.User.email.in_([u["email"] for u in users]))
+            .values(is_verified=True)
+        )
+        await db.commit()
+
+    for user in users:
+        response = await client.post("/auth/login", data={"username": user["email"], "password": PASSWORD})
+        response.raise_for_status()
+        tokens = response.json()
+        user["access_token"] = tokens["access_token"]
+        user["refresh_token"] = tokens["refresh_token"]
+        user["headers"] = {"Authorization": f"Bearer {tokens['access_token']}"}
+    return users
+
+
+# Сценарии
+async def register(client, i, state):
+    return await client.post("/auth/register", json={
+        "email": f"reg{i}@example.com", "username": f"reg{i}", "password": PASSWORD
+    })
+
+
+async def login(client, i, state):
+    return await client.post("/auth/login", data={"username": state["email"], "password": PASSWORD})
+
+
+async def refresh(client, i, state):
+    # Ротация: каждый воркер обновляет свою цепочку токенов
+    response = await client.post("/auth/refresh", params={"refresh_token": state["refresh_token"]})
+    if response.status_code == 200:
+        state["refresh_token"] = response.json()["refresh_token"]
+    return response
+
+
+async def users_me(client, i, state):
+    return await client.get("/users/me", headers=state["headers"])
+
+
+async def video_upload(client, i, state):
+    # Уникальное содержимое: одинаковые файлы сохраняются один раз (дедупликация)
+    return await client.post(
+        "/videos/upload",
+        params={"filename": f"bench{i}.mp4"},
+        content=os.urandom(16) + state["video"][16:],
+        headers={**state["headers"], "Content-Type": "video/mp4"}
+    )
+
+
+async def video_upload_duplicate(client, i, state):
+    # Копия уже загруженного файла: только запись в БД, объект в MinIO не создается
+    return await client.post(
+        "/videos/upload",
+        params={"filename": f"copy{i}.mp4"},
+        content=state["video"],
+        headers={**state["headers"], "Content-Type": "video/mp4"}
+    )
+
+
+async def video_catalog(client, i, state):
+    return await client.get("/videos", params={"limit": 50}, headers=state["headers"])
+
+
+async def video_stream(client, i, state):
+    return await client.get(
+        f"/videos/{state['video_id']}/stream",
+        headers={**state["headers"], "Range": "bytes=0-65535"}
+    )
+
+
+async def video_download(client, i, state):
+    return await client.get(
+        f"/videos/{state['video_id']}/download", params={"redirect": "false"}, headers=state["headers"]
+    )
+
+
+# имя -> (функция, ожидаемый статус, множитель количества запросов)
+# register/login упираются в bcrypt, поэтому для них запросов меньше
+SCENARIOS: Dict[str, tuple] = {
+    "register": (register, 200, 0.1),
+    "login": (login, 200, 0.1),
+    "refresh": (refresh, 200, 1),
+    "users_me": (users_me, 200, 1),
+    "video_upload": (video_upload, 201, 0.25),
+    "video_upload_duplicate": (video_upload_duplicate, 201, 0.25),
+    "video_catalog": (video_catalog, 200, 1),
+    "video_stream": (video_stream, 206, 1),
+    "video_download": (video_download, 200, 1),
+}
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], max_regression: float) -> List[str]:
+    failures = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result["p95_ms"] > base["p95_ms"] * (1 + max_regression):
+            failures.append(f"{name}: p95 {result['p95_ms']:.2f} мс > базовых {base['p95_ms']:.2f} мс")
+        if result["rps"] < base["rps"] * (1 - max_regression):
+            failures.append(f"{name}: {result['rps']:.0f} rps < базовых {base['rps']:.0f} rps")
+    return failures
+
+
+async def main(args) -> int:
+    Base.metadata.create_all(bind=get_sync_engine())
+    dispose_sync_engine()
+
+    names = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+    results: Dict[str, dict] = {}
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            users = await create_users(client, "bench", args.concurrency)
+
+            video = os.urandom(VIDEO_SIZE)
+            response = await client.post(
+                "/videos/upload", params={"filename": "seed.mp4"}, content=video,
+                headers={**users[0]["headers"], "Content-Type": "video/mp4"}
+            )
+            response.raise_for_status()
+            for user in users:
+                user["video"] = video
+                user["video_id"] = response.json()["id"]
+
+            for name in names:
+                request, expected_status, share = SCENARIOS[name]
+                total = max(args.concurrency, int(args.requests * share))
+                results[name] = await run_scenario(
+                    client, request, total, args.concurrency, expected_status, users
+                )
+                r = results[name]
+                print(
+                    f"{name:<16} {r['requests']:>6} запр. {r['rps']:>8.0f} rps  "
+                    f"p50 {r['p50_ms']:>7.2f}  p95 {r['p95_ms']:>7.2f}  p99 {r['p99_ms']:>7.2f} мс"
+                    + (f"  ошибок: {r['errors']}" if r["errors"] else "")
+                )
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPU",
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "scenarios": results,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"базовые результаты сохранены в {BASELINE_PATH}")
+        return 0
+
+    if not os.path.exists(BASELINE_PATH):
+        print("baseline.json нет - сравнение пропущено (запустите с --save-baseline)")
+        return 0
+
+    with open(BASELINE_PATH) as f:
+        baseline = json.load(f)
+    if (baseline["requests"], baseline["concurrency"]) != (args.requests, args.concurrency):
+        print(
+            f"базовые результаты сняты с -n {baseline['requests']} -c {baseline['concurrency']}, "
+            f"сравнение с другими параметрами неточно"
+        )
+    failures = compare(results, baseline["scenarios"], args.max_regression)
+    failures += [f"{name}: ошибок {r['errors']}" for name, r in results.items() if r["errors"]]
+    for failure in failures:
+        print(f"РЕГРЕССИЯ {failure}")
+    return 1 if failures else 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--requests", type=int, default=1000, help="запросов на сценарий")
+    parser.add_argument("-c", "--concurrency", type=int, default=16, help="одновременных клиентов")
+    parser.add_argument("--scenarios", help=f"через запятую, из: {','.join(SCENARIOS)}")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="допустимое ухудшение, доля")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    try:
+        code = asyncio.run(main(parse_args()))
+    finally:
+        shutil.rmtree(os.path.dirname(DB_PATH), ignore_errors=True)
+    sys.exit(code)
@@ -0,0 +1,48 @@
+"""
+Стоимость рендеринга письма: чтение файла + компиляция шаблона на каждое
+письмо (как было) против заранее скомпилированного реестра.
+
+    python benchmarks/bench_email_templates.py
+"""
+import os
+
+from common import setup_env, timeit, report
+
+setup_env()
+
+from jinja2 import Template  # noqa: E402
+
+from app.services.email_templates import TEMPLATES_DIR, EmailTemplateRegistry  # noqa: E402
+
+ITERATIONS = 2000
+CONTEXT = {
+    "verification_url": "http://localhost:5173/verify-email/7d3f0c2e-2f7c-4a55-9a43-1f1b8a3f0a11",
+    "frontend_url": "http://localhost:5173",
+}
+
+
+def render_per_email() -> str:
+    with open(os.path.join(TEMPLATES_DIR, "ru", "verification_email.html"), encoding="utf-8") as f:
+        template = Template(f.read())
+    return template.render(**CONTEXT)
+
+
+def main() -> None:
+    registry = EmailTemplateRegistry(TEMPLATES_DIR, ["ru", "en"], "ru")
+    registry.load()
+
+    reload_registry = EmailTemplateRegistry(TEMPLATES_DIR, ["ru", "en"], "ru", auto_reload=True)
+    reload_registry.load()
+
+    before = timeit(render_per_email, ITERATIONS)
+    after = timeit(lambda: registry.render("verification_email.html", "ru", **CONTEXT), ITERATIONS)
+    debug = timeit(lambda: reload_registry.render("verification_email.html", "ru", **CONTEXT), ITERATIONS)
+
+    report("open + Template() + render (до)", before)
+    report("реестр, render (после)", after)
+    report("реестр с auto_reload (debug)", debug)
+    print(f"ускорение: x{before / after:.1f}")
+
+
+if __name__ == "__main__":
+    main()
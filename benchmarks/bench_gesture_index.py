@@ -0,0 +1,100 @@
+"""
+Задержка поиска похожих жестов (app.services.gesture_index) для индексов
+от 1 тыс. до 100 тыс. эталонов: top-k по косинусу и top-k с пересчетом
+shortlist через DTW. Для сравнения - тот же поиск циклом по эталонам
+в Python (как если бы каждый запрос сравнивал жест со всем каталогом).
+
+Эталоны - случайные последовательности; индекс собирается во временном
+каталоге через GestureIndex.append, как при инкрементальном пополнении.
+
+    python benchmarks/bench_gesture_index.py
+    python benchmarks/bench_gesture_index.py --sizes 1000,10000 --shortlist 200
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+from common import setup_env, timeit, report
+
+setup_env()
+
+import numpy as np  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.services.gesture_index import GestureIndex, banded_dtw, embed  # noqa: E402
+from app.services.recognition_model import preprocess  # noqa: E402
+
+BUILD_BATCH = 5000
+LOOP_MAX_SIZE = 10000  # дальше цикл в Python слишком долгий
+
+
+def random_sequences(rng: np.random.Generator, count: int):
+    shape = (settings.recognition_points, settings.recognition_coords)
+    return [rng.standard_normal((int(rng.integers(30, 90)), *shape)).astype(np.float32) for _ in range(count)]
+
+
+def build(index: GestureIndex, size: int, rng: np.random.Generator) -> float:
+    started_at = time.perf_counter()
+    for start in range(0, size, BUILD_BATCH):
+        count = min(BUILD_BATCH, size - start)
+        index.append(list(zip(range(start + 1, start + count + 1), random_sequences(rng, count))))
+    return time.perf_counter() - started_at
+
+
+def python_loop_search(index: GestureIndex, query: np.ndarray, k: int):
+    """Базовый вариант: эмбеддинг каждого эталона сравнивается с запросом по одному"""
+    _, meta, embeddings, _, ids, _ = index._refresh()
+    vector = embed(preprocess([query], index.sequence_length))[0]
+    scores = []
+    for i in range(meta["count"]):
+        scores.append((float(np.dot(embeddings[i], vector)), int(ids[i])))
+    scores.sort(reverse=True)
+    return scores[:k]
+
+
+def main(args) -> None:
+    rng = np.random.default_rng(0)
+    query = random_sequences(rng, 1)[0]
+
+    frames = preprocess([query], settings.gesture_index_sequence_length).reshape(1, settings.gesture_index_sequence_length, -1)
+    candidates = np.repeat(frames, args.shortlist, axis=0)
+    report(f"DTW (полоса {settings.gesture_index_dtw_band}) для {args.shortlist} кандидатов",
+           timeit(lambda: banded_dtw(frames[0], candidates, settings.gesture_index_dtw_band), 20))
+
+    for size in (int(value) for value in args.sizes.split(",")):
+        directory = tempfile.mkdtemp(prefix="bench-gesture-index-")
+        try:
+            index = GestureIndex(
+                index_dir=directory,
+                sequence_length=settings.gesture_index_sequence_length,
+                points=settings.recognition_points,
+                coords=settings.recognition_coords,
+                shortlist=args.shortlist,
+                dtw_band=settings.gesture_index_dtw_band,
+                chunk_rows=settings.gesture_index_chunk_rows,
+                threads=1,
+                sync_batch_size=BUILD_BATCH,
+                sync_overlap=settings.gesture_index_sync_overlap
+            )
+            elapsed = build(index, size, rng)
+            print(f"\n{size} эталонов: индекс собран за {elapsed:.1f} с")
+            iterations = max(5, 200000 // size)
+            report("  top-k по косинусу", timeit(lambda: index.search(query, args.k, rerank=False), iterations))
+            report(f"  top-k + DTW shortlist {args.shortlist}", timeit(lambda: index.search(query, args.k), iterations))
+            if size <= LOOP_MAX_SIZE:
+                report("  цикл в Python", timeit(lambda: python_loop_search(index, query, args.k), 3))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="размеры индекса через запятую")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--shortlist", type=int, default=settings.gesture_index_shortlist)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_args())
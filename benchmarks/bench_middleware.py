@@ -0,0 +1,127 @@
+"""
+Накладные расходы middleware на запрос: прежний стек
+(BaseHTTPMiddleware LanguageMiddleware + CORSMiddleware) против одного
+чистого ASGI LanguageMiddleware, а также стоимость MetricsMiddleware.
+Приложение вызывается напрямую через ASGI,
+без сети и HTTP клиента.
+
+    python benchmarks/bench_middleware.py
+"""
+import asyncio
+import time
+
+from common import setup_env
+
+setup_env()
+
+from starlette.applications import Starlette  # noqa: E402
+from starlette.middleware import Middleware  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+from starlette.middleware.cors import CORSMiddleware  # noqa: E402
+from starlette.responses import PlainTextResponse  # noqa: E402
+from starlette.routing import Route  # noqa: E402
+
+from app.middleware.language_middleware import LanguageMiddleware  # noqa: E402
+from app.middleware.metrics_middleware import MetricsMiddleware  # noqa: E402
+
+ITERATIONS = 5000
+ORIGINS = ["http://localhost:5173", "http://localhost:3000"]
+HEADERS = [
+    (b"host", b"localhost"),
+    (b"origin", b"http://localhost:5173"),
+    (b"accept-language", b"en-US,en;q=0.9,ru;q=0.8"),
+    (b"user-agent", b"bench"),
+]
+
+
+class OldLanguageMiddleware(BaseHTTPMiddleware):
+    """Прежняя реализация на BaseHTTPMiddleware"""
+
+    async def dispatch(self, request, call_next):
+        lang = request.cookies.get('lang')
+        if not lang:
+            accept_language = request.headers.get('accept-language', '')
+            primary_lang = accept_language.split(',')[0].split('-')[0].lower()
+            lang = primary_lang if primary_lang in ['ru', 'en'] else 'ru'
+        request.state.lang = lang
+
+        response = await call_next(request)
+        if 'lang' not in request.cookies:
+            response.set_cookie(key='lang', value=lang, max_age=365 * 24 * 60 * 60,
+                                httponly=True, samesite='lax')
+        response.headers['Content-Language'] = lang
+        return response
+
+
+async def endpoint(request):
+    return PlainTextResponse(getattr(request.state, "lang", "-"))
+
+
+def build(middleware):
+    return Starlette(routes=[Route("/", endpoint)], middleware=middleware)
+
+
+async def run(app, iterations: int) -> float:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/", "raw_path": b"/",
+        "root_path": "", "query_string": b"", "headers": HEADERS,
+        "client": ("127.0.0.1", 1234), "server": ("localhost", 80),
+    }
+
+    def make_channel():
+        # Как в httpx.ASGITransport: disconnect приходит после отправки ответа
+        request_sent = False
+        response_complete = asyncio.Event()
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await response_complete.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete.set()
+
+        return receive, send
+
+    await app(dict(scope), *make_channel())  # прогрев
+    started_at = time.perf_counter()
+    for _ in range(iterations):
+        await app(dict(scope), *make_channel())
+    return (time.perf_counter() - started_at) / iterations * 1e6
+
+
+async def main() -> None:
+    bare = build([])
+    old = build([
+        Middleware(CORSMiddleware, allow_origins=ORIGINS, allow_credentials=True,
+                   allow_methods=["*"], allow_headers=["*"]),
+        Middleware(OldLanguageMiddleware),
+    ])
+    new = build([
+        Middleware(LanguageMiddleware, allow_origins=ORIGINS, allow_credentials=True,
+                   allow_methods=["*"], allow_headers=["*"]),
+    ])
+    with_metrics = build([
+        Middleware(MetricsMiddleware),
+        Middleware(LanguageMiddleware, allow_origins=ORIGINS, allow_credentials=True,
+                   allow_methods=["*"], allow_headers=["*"]),
+    ])
+
+    base = await run(bare, ITERATIONS)
+    old_time = await run(old, ITERATIONS)
+    new_time = await run(new, ITERATIONS)
+    metrics_time = await run(with_metrics, ITERATIONS)
+
+    print(f"{'без middleware':<45} {base:>8.1f} us")
+    print(f"{'BaseHTTPMiddleware + CORSMiddleware':<45} {old_time:>8.1f} us (+{old_time - base:.1f})")
+    print(f"{'ASGI LanguageMiddleware':<45} {new_time:>8.1f} us (+{new_time - base:.1f})")
+    print(f"{'+ MetricsMiddleware':<45} {metrics_time:>8.1f} us (+{metrics_time - new_time:.1f})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
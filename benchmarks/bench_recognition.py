@@ -0,0 +1,140 @@
+"""
+Пропускная способность распознавания жестов при разных настройках
+микробатчей (app.services.recognition): модель-заглушка DummyModel,
+пул процессов, --concurrency клиентов, каждый шлет по одной
+последовательности и ждет ответа.
+
+Сначала - стоимость одной пачки прямо в процессе (предобработка + модель)
+для разных размеров пачки, затем сквозные замеры для каждой пары
+max_batch_size/max_wait: rps, p50/p95 задержки и средний размер пачки.
+
+    python benchmarks/bench_recognition.py
+    python benchmarks/bench_recognition.py -n 5000 -c 128 --workers 4
+    python benchmarks/bench_recognition.py --settings 1:0,16:2,64:5
+"""
+import argparse
+import asyncio
+import time
+from typing import List, Tuple
+
+from common import setup_env, timeit, report
+
+setup_env()
+
+import numpy as np  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.services import recognition_model  # noqa: E402
+from app.services.recognition import GestureRecognizer  # noqa: E402
+
+DIRECT_BATCH_SIZES = (1, 8, 32, 128)
+DEFAULT_SETTINGS = "1:0,8:1,32:2,32:5,128:10"
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def make_sequences(count: int, rng: np.random.Generator) -> List[np.ndarray]:
+    """Последовательности разной длины, как от клиента (1-3 секунды при 30 кадрах/с)"""
+    shape = (settings.recognition_points, settings.recognition_coords)
+    return [
+        rng.standard_normal((int(rng.integers(30, 90)), *shape)).astype(np.float32)
+        for _ in range(count)
+    ]
+
+
+def bench_direct(sequences: List[np.ndarray]) -> None:
+    input_shape = (settings.recognition_sequence_length, settings.recognition_points, settings.recognition_coords)
+    recognition_model.init_worker(settings.recognition_model, None, input_shape, settings.recognition_top_k)
+    print("Одна пачка в процессе (предобработка + модель):")
+    for size in DIRECT_BATCH_SIZES:
+        batch = sequences[:size]
+        micros = timeit(lambda: recognition_model.run_batch(batch), max(10, 2000 // size))
+        report(f"  batch {size:>4}: на пачку", micros)
+        report(f"  batch {size:>4}: на последовательность", micros / size)
+
+
+async def bench_batcher(
+        sequences: List[np.ndarray],
+        total: int,
+        concurrency: int,
+        workers: int,
+        max_batch_size: int,
+        max_wait_ms: float
+) -> dict:
+    recognizer = GestureRecognizer(
+        model=settings.recognition_model,
+        model_path=None,
+        workers=workers,
+        max_batch_size=max_batch_size,
+        max_wait=max_wait_ms / 1000,
+        max_queue=total,
+        sequence_length=settings.recognition_sequence_length,
+        points=settings.recognition_points,
+        coords=settings.recognition_coords,
+        top_k=settings.recognition_top_k
+    )
+    await recognizer.start()
+    latencies: List[float] = []
+    counter = iter(range(total))
+
+    async def client() -> None:
+        for i in counter:
+            started_at = time.perf_counter()
+            await recognizer.recognize([sequences[i % len(sequences)]])
+            latencies.append(time.perf_counter() - started_at)
+
+    try:
+        started_at = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started_at
+    finally:
+        await recognizer.stop()
+
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "avg_batch_size": recognizer.stats()["avg_batch_size"],
+    }
+
+
+def parse_settings(value: str) -> List[Tuple[int, float]]:
+    pairs = []
+    for item in value.split(","):
+        size, wait = item.split(":")
+        pairs.append((int(size), float(wait)))
+    return pairs
+
+
+async def main(args) -> None:
+    sequences = make_sequences(max(DIRECT_BATCH_SIZES), np.random.default_rng(0))
+    bench_direct(sequences)
+
+    print(f"\nМикробатчи: {args.requests} запр., {args.concurrency} клиентов, {args.workers} процессов")
+    for max_batch_size, max_wait_ms in parse_settings(args.settings):
+        r = await bench_batcher(
+            sequences, args.requests, args.concurrency, args.workers, max_batch_size, max_wait_ms
+        )
+        print(
+            f"  batch <= {max_batch_size:>4}, wait {max_wait_ms:>5.1f} мс: {r['rps']:>8.0f} rps  "
+            f"p50 {r['p50_ms']:>7.2f}  p95 {r['p95_ms']:>7.2f} мс  средняя пачка {r['avg_batch_size']:.1f}"
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--requests", type=int, default=3000, help="последовательностей на настройку")
+    parser.add_argument("-c", "--concurrency", type=int, default=64, help="одновременных клиентов")
+    parser.add_argument("--workers", type=int, default=settings.recognition_workers, help="процессов модели")
+    parser.add_argument(
+        "--settings", default=DEFAULT_SETTINGS, help="пары max_batch_size:max_wait_ms через запятую"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
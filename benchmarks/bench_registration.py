@@ -0,0 +1,107 @@
+"""
+Пропускная способность регистрации (путь в БД без bcrypt): предварительные
+SELECT по email и username + две транзакции (как было) против одной
+транзакции с INSERT ... RETURNING и проверкой уникальности индексами.
+
+bcrypt подменен готовым хэшем - он одинаков в обоих вариантах и
+заглушил бы разницу. Считаются и SQL-запросы на одну регистрацию.
+
+    python benchmarks/bench_registration.py
+"""
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from common import setup_env
+
+setup_env()
+
+from sqlalchemy import event, select, delete  # noqa: E402
+
+from app import crud, models, schemas  # noqa: E402
+from app.database import Base, async_engine, get_sync_engine, AsyncSessionLocal  # noqa: E402
+from app.services.hashing import hasher  # noqa: E402
+
+REGISTRATIONS = 500
+HASHED_PASSWORD = "$2b$12$" + "x" * 53
+
+
+async def fake_hash(password: str) -> str:
+    return HASHED_PASSWORD
+
+
+async def register_before(db, user_data: schemas.UserCreate) -> None:
+    """Прежний путь: crud.create_user + crud.create_email_verification + outbox"""
+    if (await db.execute(select(models.User).where(models.User.email == user_data.email))).scalar_one_or_none():
+        raise ValueError("email")
+    if (await db.execute(select(models.User).where(models.User.username == user_data.username))).scalar_one_or_none():
+        raise ValueError("username")
+
+    user = models.User(
+        email=user_data.email,
+        username=user_data.username,
+        hashed_password=await hasher.hash(user_data.password),
+        verification_token=str(uuid.uuid4()),
+        verification_token_expires=datetime.utcnow() + timedelta(hours=24)
+    )
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+
+    await db.execute(delete(models.EmailVerification).where(models.EmailVerification.email == user.email))
+    verification = models.EmailVerification.create_for_email(user.email)
+    db.add(verification)
+    await db.commit()
+    await db.refresh(verification)
+
+    await crud.enqueue_email(db, user.email, "subject", verification.token)
+
+
+async def register_after(db, user_data: schemas.UserCreate) -> None:
+    """Текущий путь из роутера /auth/register"""
+    user = await crud.create_user(db, user_data)
+    verification = await crud.add_email_verification(db, user.email)
+    await crud.enqueue_email(db, user.email, "subject", verification.token)
+
+
+async def run(name: str, register) -> None:
+    Base.metadata.drop_all(bind=get_sync_engine())
+    Base.metadata.create_all(bind=get_sync_engine())
+
+    statements = 0
+
+    def count(*args):
+        nonlocal statements
+        statements += 1
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    started_at = time.perf_counter()
+    for i in range(REGISTRATIONS):
+        user_data = schemas.UserCreate(
+            email=f"{name}{i}@example.com", username=f"{name}{i}", password="Secret123"
+        )
+        async with AsyncSessionLocal() as db:
+            await register(db, user_data)
+    elapsed = time.perf_counter() - started_at
+    event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+
+    print(
+        f"{name:<8} {REGISTRATIONS / elapsed:>8.0f} рег/с  "
+        f"{elapsed / REGISTRATIONS * 1000:>6.2f} мс  "
+        f"{statements / REGISTRATIONS:.1f} SQL на регистрацию"
+    )
+
+
+async def main() -> None:
+    hasher.hash = fake_hash
+    await run("before", register_before)
+    await run("after", register_after)
+    await async_engine.dispose()
+    if os.path.exists("bench.db"):
+        os.remove("bench.db")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,128 @@
+"""
+Стоимость сериализации одного ответа: путь FastAPI по умолчанию
+(валидация по response_model + jsonable_encoder + json.dumps в JSONResponse)
+против быстрого режима FAST_JSON_RESPONSES (app.services.serialization).
+
+Объекты - такие же, как в обработчиках: ORM User для /users/me,
+Token для /auth/login и строки выборки каталога для страниц /videos
+разного размера.
+
+    python benchmarks/bench_serialization.py
+"""
+import json
+from datetime import datetime, timedelta
+
+from common import setup_env, timeit, report
+
+setup_env()
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+from sqlalchemy import create_engine, insert, select  # noqa: E402
+
+from app import crud, models, schemas  # noqa: E402
+from app.services import serialization  # noqa: E402
+from app.services.serialization import (  # noqa: E402
+    FastJSONResponse, token_serializer, user_serializer, video_catalog_serializer
+)
+
+ITERATIONS = 5000
+PAGE_SIZES = (50, 200, 1000)
+
+
+def run_sync(coro):
+    """serialize_response для обработчиков async def ничего не ждет - выполняем без цикла событий"""
+    try:
+        coro.send(None)
+    except StopIteration as e:
+        return e.value
+    raise RuntimeError("serialize_response неожиданно ушел в ожидание")
+
+
+def default_path(schema):
+    """Как FastAPI обрабатывает возвращенный объект при response_model=schema"""
+    field = create_response_field(name=f"Response_{schema.__name__}", type_=schema)
+
+    def render(obj) -> bytes:
+        content = run_sync(serialize_response(field=field, response_content=obj, is_coroutine=True))
+        return JSONResponse(content).body
+    return render
+
+
+def catalog_default(rows, next_cursor) -> bytes:
+    """Текущий путь list_videos: VideoCatalogPage + model_dump_json"""
+    page = schemas.VideoCatalogPage(
+        items=[schemas.VideoCatalogItem.model_validate(row) for row in rows],
+        next_cursor=next_cursor
+    )
+    return page.model_dump_json().encode()
+
+
+def catalog_rows(count: int):
+    """Настоящие Row из выборки crud.CATALOG_COLUMNS (SQLite в памяти)"""
+    engine = create_engine("sqlite://")
+    models.VideoFile.__table__.create(engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(models.VideoFile), [
+            {
+                "filename": f"video_{i}.mp4",
+                "description": f"Жест номер {i}" if i % 2 else None,
+                "object_name": f"{i:08d}.mp4",
+                "content_type": "video/mp4",
+                "size": 1_000_000 + i,
+                "etag": f"{i:032x}",
+                "created_at": now - timedelta(seconds=i),
+            }
+            for i in range(count)
+        ])
+        rows = list(conn.execute(select(*crud.CATALOG_COLUMNS)).all())
+    engine.dispose()
+    return rows
+
+
+def check_same(name: str, default: bytes, fast: bytes) -> None:
+    if json.loads(default) != json.loads(fast):
+        raise SystemExit(f"{name}: ответы двух путей различаются")
+
+
+def main() -> None:
+    print(f"orjson: {'есть' if serialization.orjson is not None else 'нет (быстрый путь на TypeAdapter)'}")
+
+    user = models.User(
+        id=1, public_id="3b7c1a52-0f7e-4a8c-9d1e-5a6b7c8d9e0f", email="user@example.com",
+        username="bench_user", hashed_password="x", is_active=True, is_verified=True,
+        created_at=datetime.utcnow()
+    )
+    token = schemas.Token(access_token="a" * 180, refresh_token="r" * 180, token_type="bearer")
+
+    single = (
+        ("UserResponse", schemas.UserResponse, user_serializer, user),
+        ("Token", schemas.Token, token_serializer, token),
+    )
+    for name, schema, serializer, obj in single:
+        default = default_path(schema)
+        fast = lambda: FastJSONResponse(serializer.dump_json(obj)).body  # noqa: E731
+        check_same(name, default(obj), fast())
+        default_us = timeit(lambda: default(obj), ITERATIONS)
+        fast_us = timeit(fast, ITERATIONS)
+        report(f"{name}: response_model", default_us)
+        report(f"{name}: fast", fast_us)
+        print(f"ускорение: x{default_us / fast_us:.1f}")
+        print()
+
+    for size in PAGE_SIZES:
+        rows = catalog_rows(size)
+        iterations = max(20, ITERATIONS * 10 // size)
+        check_same(f"page {size}", catalog_default(rows, "cursor"), video_catalog_serializer.dump_page(rows, "cursor"))
+        default_us = timeit(lambda: catalog_default(rows, "cursor"), iterations)
+        fast_us = timeit(lambda: video_catalog_serializer.dump_page(rows, "cursor"), iterations)
+        report(f"каталог {size} шт.: VideoCatalogPage", default_us)
+        report(f"каталог {size} шт.: fast", fast_us)
+        print(f"ускорение: x{default_us / fast_us:.1f}, {fast_us / size:.2f} us на элемент")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Стоимость аутентификации одного запроса в auth.verify_token:
+полная проверка подписи на каждый запрос против кэша проверенных токенов,
+плюс сравнение бэкендов подписи (python-jose и PyJWT, HS256 и RS256).
+
+    python benchmarks/bench_token_verify.py
+"""
+import os
+import tempfile
+import time
+
+from common import setup_env, timeit, report
+
+setup_env()
+
+from app import auth  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.services.token_cache import token_cache  # noqa: E402
+from app.services.token_signing import BACKENDS, KeyRing  # noqa: E402
+
+ITERATIONS = 5000
+CLAIMS = {"sub": "3b7c1a52-0f7e-4a8c-9d1e-5a6b7c8d9e0f", "type": "access"}
+
+
+def write_rsa_keys(keys_dir: str, kid: str) -> None:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    with open(os.path.join(keys_dir, f"{kid}.pem"), "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        ))
+    with open(os.path.join(keys_dir, f"{kid}.pub.pem"), "wb") as f:
+        f.write(key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo
+        ))
+
+
+def bench_backends() -> None:
+    claims = dict(CLAIMS, exp=int(time.time()) + 1800)
+
+    keyring = None
+    try:
+        keys_dir = tempfile.mkdtemp()
+        write_rsa_keys(keys_dir, "bench")
+        keyring = KeyRing(keys_dir, "bench")
+    except ImportError:
+        print("cryptography не установлен - RS256 пропущен")
+
+    for name, backend_cls in BACKENDS.items():
+        for algorithm in ("HS256", "RS256"):
+            if algorithm == "RS256" and keyring is None:
+                continue
+            try:
+                backend = backend_cls(algorithm, settings.secret_key, keyring)
+                token = backend.encode(claims)
+                micros = timeit(lambda: backend.decode(token), ITERATIONS)
+            except ImportError:
+                print(f"{name}: пакет не установлен - пропущен")
+                break
+            report(f"{name} {algorithm} decode", micros)
+
+
+def main() -> None:
+    token = auth.create_access_token(dict(CLAIMS))
+
+    token_cache.enabled = False
+    uncached = timeit(lambda: auth.verify_token(token), ITERATIONS)
+
+    token_cache.enabled = True
+    token_cache.clear()
+    cached = timeit(lambda: auth.verify_token(token), ITERATIONS)
+
+    report(f"verify_token без кэша ({settings.jwt_backend} {settings.algorithm})", uncached)
+    report("verify_token с кэшем", cached)
+    print(f"ускорение: x{uncached / cached:.1f}")
+    print()
+    bench_backends()
+
+
+if __name__ == "__main__":
+    main()
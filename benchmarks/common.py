@@ -0,0 +1,41 @@
+"""Общие утилиты для бенчмарков: окружение и замер времени"""
+import os
+import sys
+import time
+from typing import Callable
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def setup_env() -> None:
+    """Заполняет обязательные настройки, чтобы app.config импортировался без .env"""
+    defaults = {
+        "DATABASE_URL": "sqlite:///./bench.db",
+        "DATABASE_URL_ASYNC": "sqlite+aiosqlite:///./bench.db",
+        "SECRET_KEY": "bench-secret-key-0123456789abcdef0123",
+        "SMTP_HOST": "localhost",
+        "SMTP_PORT": "1025",
+        "SMTP_USER": "",
+        "SMTP_PASSWORD": "",
+        "EMAIL_FROM": "bench@example.com",
+        "MINIO_ENDPOINT": "localhost:9000",
+        "MINIO_ACCESS_KEY": "minioadmin",
+        "MINIO_SECRET_KEY": "minioadmin",
+    }
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+
+
+def timeit(func: Callable, iterations: int) -> float:
+    """Среднее время одного вызова в микросекундах"""
+    func()  # прогрев
+    started_at = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started_at) / iterations * 1e6
+
+
+def report(name: str, micros: float) -> None:
+    print(f"{name:<50} {micros:>10.1f} us")
@@ -0,0 +1,182 @@
+"""
+Нагрузочный генератор для WebSocket /recognize/stream: --streams одновременных
+потоков, каждый --duration секунд шлет бинарные кадры float32 с частотой
+--fps (по --frames-per-message кадров в сообщении) и читает результаты.
+
+Итог: сколько потоков подключилось, результатов в секунду, задержка от
+отправки последнего кадра окна до получения результата (p50/p95/p99),
+задержка, которую сообщает сервер (lag_ms), и доля отброшенных кадров.
+
+Без --url сервер (uvicorn) поднимается в этом же процессе с окружением
+bench_api.py: SQLite, заглушки MinIO и SMTP, пользователь создается сам.
+Клиенты и сервер тогда делят один CPU - для честных цифр запускайте
+против отдельного сервера:
+
+    python benchmarks/load_recognition_stream.py --streams 200 --duration 20
+    python benchmarks/load_recognition_stream.py --url ws://localhost:8000 --token <access token> --streams 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import time
+from typing import List, Optional
+
+import numpy as np
+import websockets
+
+POINTS = 21
+COORDS = 3
+SEQUENCE_FRAMES = 90
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class StreamResult:
+    def __init__(self):
+        self.connected = False
+        self.error: Optional[str] = None
+        self.frames_sent = 0
+        self.results = 0
+        self.latencies: List[float] = []
+        self.server_lags: List[float] = []
+        self.frames_dropped = 0
+
+
+async def run_stream(url: str, token: str, args, seed: int) -> StreamResult:
+    result = StreamResult()
+    rng = np.random.default_rng(seed)
+    frames = rng.standard_normal((SEQUENCE_FRAMES, POINTS, COORDS)).astype("<f4")
+    loop = asyncio.get_running_loop()
+    # Номер кадра, которым закончилось сообщение -> время отправки
+    sent_at = {}
+
+    try:
+        async with websockets.connect(f"{url}/recognize/stream", subprotocols=["bearer", token]) as ws:
+            result.connected = True
+
+            async def receive() -> None:
+                async for raw in ws:
+                    message = json.loads(raw)
+                    if message.get("type") != "result":
+                        continue
+                    result.results += 1
+                    started_at = sent_at.pop(message["frame"], None)
+                    if started_at is not None:
+                        result.latencies.append(time.perf_counter() - started_at)
+                    result.server_lags.append(message["lag_ms"] / 1000)
+                    result.frames_dropped = message["frames_dropped"]
+
+            receiver = asyncio.create_task(receive())
+            interval = args.frames_per_message / args.fps
+            # Потоки стартуют вразнобой, как настоящие камеры
+            next_at = loop.time() + rng.uniform(0, interval)
+            finish_at = loop.time() + args.duration
+            while next_at < finish_at:
+                await asyncio.sleep(max(0.0, next_at - loop.time()))
+                start = result.frames_sent % SEQUENCE_FRAMES
+                chunk = np.take(frames, range(start, start + args.frames_per_message), axis=0, mode="wrap")
+                await ws.send(chunk.tobytes())
+                result.frames_sent += args.frames_per_message
+                sent_at[result.frames_sent] = time.perf_counter()
+                next_at += interval
+
+            # Ждем результат по последним кадрам
+            await asyncio.sleep(0.5)
+            receiver.cancel()
+            await asyncio.gather(receiver, return_exceptions=True)
+    except Exception as e:
+        result.error = repr(e)
+    return result
+
+
+def summarize(results: List[StreamResult], duration: float) -> None:
+    connected = [r for r in results if r.connected]
+    errors = [r.error for r in results if r.error]
+    latencies = sorted(latency for r in connected for latency in r.latencies)
+    server_lags = sorted(lag for r in connected for lag in r.server_lags)
+    sent = sum(r.frames_sent for r in connected)
+    dropped = sum(r.frames_dropped for r in connected)
+    total_results = sum(r.results for r in connected)
+
+    print(f"потоков: {len(results)}, подключилось: {len(connected)}, ошибок: {len(errors)}")
+    if errors:
+        print(f"  например: {errors[0]}")
+    print(f"кадров отправлено: {sent}, отброшено сервером: {dropped} ({dropped / (sent or 1):.1%})")
+    print(f"результатов: {total_results} ({total_results / duration:.0f}/с, "
+          f"{total_results / (len(connected) or 1) / duration:.1f}/с на поток)")
+    print(f"задержка клиента:  p50 {percentile(latencies, 50) * 1000:7.1f}  "
+          f"p95 {percentile(latencies, 95) * 1000:7.1f}  p99 {percentile(latencies, 99) * 1000:7.1f} мс")
+    print(f"lag сервера:       p50 {percentile(server_lags, 50) * 1000:7.1f}  "
+          f"p95 {percentile(server_lags, 95) * 1000:7.1f}  p99 {percentile(server_lags, 99) * 1000:7.1f} мс")
+    worst = max(connected, key=lambda r: percentile(sorted(r.latencies), 95), default=None)
+    if worst is not None and worst.latencies:
+        print(f"худший поток: p95 {percentile(sorted(worst.latencies), 95) * 1000:.1f} мс, "
+              f"отброшено {worst.frames_dropped} из {worst.frames_sent} кадров")
+
+
+async def run_load(url: str, token: str, args) -> None:
+    started_at = time.perf_counter()
+    results = await asyncio.gather(*(run_stream(url, token, args, seed) for seed in range(args.streams)))
+    summarize(results, time.perf_counter() - started_at)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_local(args) -> None:
+    """Сервер в этом же процессе, окружение и пользователь - как в bench_api.py"""
+    import bench_api
+    import httpx
+    import uvicorn
+    from app.database import Base, get_sync_engine, dispose_sync_engine
+
+    Base.metadata.create_all(bind=get_sync_engine())
+    dispose_sync_engine()
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(
+        bench_api.app, host="127.0.0.1", port=port, loop="asyncio", log_level="warning"
+    ))
+    serve_task = asyncio.create_task(server.serve())
+    try:
+        while not server.started:
+            await asyncio.sleep(0.05)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+            user = (await bench_api.create_users(client, "stream", 1))[0]
+        await run_load(f"ws://127.0.0.1:{port}", user["access_token"], args)
+    finally:
+        server.should_exit = True
+        await serve_task
+        shutil.rmtree(os.path.dirname(bench_api.DB_PATH), ignore_errors=True)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=200, help="одновременных потоков")
+    parser.add_argument("--duration", type=float, default=10.0, help="секунд на поток")
+    parser.add_argument("--fps", type=float, default=30.0, help="кадров в секунду на поток")
+    parser.add_argument("--frames-per-message", type=int, default=1)
+    parser.add_argument("--url", help="ws://host:port уже запущенного сервера")
+    parser.add_argument("--token", help="access токен для --url")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    if arguments.url:
+        if not arguments.token:
+            raise SystemExit("--url требует --token")
+        asyncio.run(run_load(arguments.url, arguments.token, arguments))
+    else:
+        asyncio.run(run_local(arguments))
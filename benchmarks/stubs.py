@@ -0,0 +1,111 @@
+"""
+Заглушки внешних сервисов для бенчмарков: MinIO (в памяти) и SMTP.
+Подставляются вместо minio.Minio и smtplib.SMTP до старта приложения.
+"""
+import hashlib
+import threading
+from datetime import datetime
+from types import SimpleNamespace
+
+
+class StubObjectResponse:
+    """Ответ get_object: отдает байты кусками, как urllib3 HTTPResponse"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def stream(self, amt: int):
+        for i in range(0, len(self.data), amt):
+            yield self.data[i:i + amt]
+
+    def read(self) -> bytes:
+        return self.data
+
+    def close(self) -> None:
+        pass
+
+    def release_conn(self) -> None:
+        pass
+
+
+class StubMinio:
+    """Минимальный in-memory MinIO: только методы, которые вызывает StorageService"""
+
+    def __init__(self, endpoint: str, **kwargs):
+        self.endpoint = endpoint
+        self.buckets = set()
+        self.objects = {}
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def bucket_exists(self, bucket: str) -> bool:
+        return bucket in self.buckets
+
+    def make_bucket(self, bucket: str) -> None:
+        self.buckets.add(bucket)
+
+    def stat_object(self, bucket: str, object_name: str):
+        data = self.objects[object_name]
+        return SimpleNamespace(
+            size=len(data),
+            etag=hashlib.md5(data).hexdigest(),
+            content_type="application/octet-stream",
+            last_modified=datetime.utcnow()
+        )
+
+    def remove_object(self, bucket: str, object_name: str) -> None:
+        self.objects.pop(object_name, None)
+
+    def presigned_get_object(self, bucket: str, object_name: str, expires) -> str:
+        return f"http://{self.endpoint}/{bucket}/{object_name}?X-Amz-Expires={int(expires.total_seconds())}"
+
+    def get_object(self, bucket: str, object_name: str, offset: int = 0, length: int = 0):
+        data = self.objects[object_name]
+        return StubObjectResponse(data[offset:offset + length] if length else data[offset:])
+
+    def _create_multipart_upload(self, bucket: str, object_name: str, headers: dict) -> str:
+        with self._lock:
+            upload_id = f"upload-{len(self._uploads)}-{object_name}"
+            self._uploads[upload_id] = {}
+        return upload_id
+
+    def _upload_part(self, bucket, object_name, data, headers, upload_id, part_number) -> str:
+        self._uploads[upload_id][part_number] = data
+        return hashlib.md5(data).hexdigest()
+
+    def _complete_multipart_upload(self, bucket, object_name, upload_id, parts):
+        parts_data = self._uploads.pop(upload_id)
+        self.objects[object_name] = b"".join(parts_data[p.part_number] for p in parts)
+        return SimpleNamespace(etag=f"{hashlib.md5(self.objects[object_name]).hexdigest()}-{len(parts)}")
+
+    def _abort_multipart_upload(self, bucket, object_name, upload_id) -> None:
+        self._uploads.pop(upload_id, None)
+
+
+class StubSMTP:
+    """smtplib.SMTP, который только считает письма"""
+
+    sent = 0
+
+    def __init__(self, host: str = "", port: int = 0, timeout: float = None):
+        pass
+
+    def starttls(self) -> None:
+        pass
+
+    def login(self, user: str, password: str) -> None:
+        pass
+
+    def send_message(self, msg) -> None:
+        StubSMTP.sent += 1
+
+    def quit(self) -> None:
+        pass
+
+
+def install() -> None:
+    """Подменяет клиентов MinIO и SMTP в модулях приложения"""
+    from app.services import email_dispatcher, storage
+
+    storage.Minio = StubMinio
+    email_dispatcher.smtplib.SMTP = StubSMTP